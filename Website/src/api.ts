@@ -1,4 +1,4 @@
-import { LoginResponse, ApiError } from './types';
+import { LoginResponse, MatchesResponse, ApiError } from './types';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL;
 
@@ -33,4 +33,34 @@ export class ApiService {
       throw error;
     }
   }
-}
\ No newline at end of file
+
+  /**
+   * Récupère les matchs du jour 1 et du jour 2.
+   * Le navigateur revalide avec l'ETag : une réponse 304 réutilise le cache HTTP.
+   */
+  static async getMatches(userId: string, token: string): Promise<MatchesResponse> {
+    try {
+      const response = await fetch(`${API_BASE_URL}/matches/${encodeURIComponent(userId)}`, {
+        headers: { Authorization: `Bearer ${token}` },
+      });
+
+      if (!response.ok) {
+        const text = await response.text();
+        throw {
+          status: response.status,
+          message: text || `Erreur ${response.status}`,
+        } as ApiError;
+      }
+
+      return (await response.json()) as MatchesResponse;
+    } catch (error) {
+      if (error instanceof Error) {
+        throw {
+          status: 0,
+          message: error.message,
+        } as ApiError;
+      }
+      throw error;
+    }
+  }
+}
@@ -1,4 +1,4 @@
-import { User } from './types';
+import { LoginResponse, User } from './types';
 
 const USER_STORAGE_KEY = 'user';
 
@@ -28,6 +28,14 @@ export class StorageService {
     }
   }
 
+  /**
+   * Récupère le jeton de session renvoyé par /login
+   */
+  static getToken(): string | null {
+    const user = this.getUser() as Partial<LoginResponse> | null;
+    return user?.token ?? null;
+  }
+
   /**
    * Supprime l'utilisateur connecté
    */
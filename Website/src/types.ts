@@ -9,7 +9,26 @@ export interface User {
   currentClass: string;
 }
 
-export interface LoginResponse extends User {}
+export interface LoginResponse extends User {
+  token: string;  // Jeton de session signé, à renvoyer dans l'en-tête Authorization
+}
+
+/**
+ * Partenaire attribué pour une journée
+ */
+export interface MatchPartner {
+  id: string;
+  first_name: string;
+  last_name: string;
+  currentClass: string;
+}
+
+export interface MatchesResponse {
+  id: string;
+  day1: MatchPartner | null;
+  day2: MatchPartner | null;
+  rounds: (MatchPartner | null)[] | null;
+}
 
 export interface ApiError {
   status: number;
@@ -1,78 +1,173 @@
-# python
+"""Offline import of the converter output (xlsxToJson.py) with bulk access-code issuing.
+
+    python GeneratePasswords.py [input.json|input.ndjson] [--sqlite saintvalentin.db] [--length 8]
+
+Reads a JSON list (or ``{"users": [...]}``) or NDJSON, one user per line.
+Users are upserted and every user without a code gets one, generated in
+memory so no INSERT can collide. ``--replace`` clears users and codes
+first, like a non-incremental import.
+
+With ``--sqlite`` rows go to SQLite (WAL journal) in transactions of
+``--batch`` users. Otherwise they go to the PostgreSQL database configured
+like the API (DATABASE_URL / DB_*) in a single transaction holding the
+import lock, like an API import: logins never see emptied tables and an API
+import running meanwhile waits for it.
+
+The running API needs no restart: the passwords/users triggers bump
+code_version, so its workers stop trusting their login filter and index
+(codes are looked up in the DB) until their background refresh rebuilt them.
+"""
+
 from pathlib import Path
+import argparse
+import os
 import sqlite3
-import json
-import random
-import string
+import sys
+import time
 
-def generate_password(length: int = 6) -> str:
-    chars = string.ascii_lowercase + string.digits
-    return ''.join(random.choice(chars) for _ in range(length))
+from answers import ANSWER_COLUMNS, pack_answers
+from codes import IMPORT_LOCK_KEY, generate_codes
+from survey import ParseDiagnostics, entry_to_record, load_entries
 
-def import_users_from_json(json_path: str | None = None, passwd_len: int = 6):
-    """
-    Read JSON (list or dict) and import users into `users` table.
-    For each user insert a generated unique password into `passwords`.
-    Uses the existing `cursor` and `db` sqlite objects from the module.
+USER_COLUMNS = ["id", "first_name", "last_name", "email", "currentClass", *ANSWER_COLUMNS, "answers_packed",
+                "source_hash"]
+
+SQLITE_SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS users
+        (
+            id TEXT PRIMARY KEY,
+            first_name TEXT,
+            last_name TEXT,
+            email TEXT,
+            currentClass TEXT,
+            {", ".join(f"{col} INTEGER" for col in ANSWER_COLUMNS)},
+            answers_packed INTEGER,
+            source_hash TEXT
+        )""",
+    """CREATE TABLE IF NOT EXISTS passwords
+       (
+           password TEXT PRIMARY KEY,
+           user_id INTEGER
+       )""",
+]
+
+
+def user_row(record: dict) -> tuple:
+    answers = record["answers"]
+    return (record["id"], record["first_name"], record["last_name"], record["email"], record["currentClass"],
+            *(answers.get(col) for col in ANSWER_COLUMNS), pack_answers(answers), record["source_hash"])
+
+
+def upsert_users_sql(placeholder: str) -> str:
+    return (f"INSERT INTO users ({', '.join(USER_COLUMNS)}) VALUES ({', '.join([placeholder] * len(USER_COLUMNS))}) "
+            "ON CONFLICT (id) DO UPDATE SET "
+            + ", ".join(f"{col} = EXCLUDED.{col}" for col in USER_COLUMNS[1:]))
+
+
+def connect_sqlite(path: str):
+    db = sqlite3.connect(path)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    for statement in SQLITE_SCHEMA:
+        db.execute(statement)
+    db.commit()
+    return db
+
+
+def connect_postgres():
+    import psycopg
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    database_url = os.getenv('DATABASE_URL')
+    if database_url:
+        return psycopg.connect(database_url)
+    return psycopg.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=int(os.getenv('DB_PORT', '5432')),
+        dbname=os.getenv('DB_NAME', 'saintvalentin'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+def issue_codes(db, records: list, passwd_len: int = 8, batch: int = 5000, replace: bool = False,
+                placeholder: str = "%s", lock_key: int | None = None) -> dict:
+    """Upsert ``records`` and give a new code to every user without one, ``batch`` users per statement.
+
+    With ``lock_key`` (PostgreSQL) everything is one transaction holding
+    ``pg_advisory_xact_lock(lock_key)``; otherwise every batch is committed.
     """
-    path = Path(json_path) if json_path else Path(__file__).resolve().parent / "input.json"
+    cursor = db.cursor()
+    if lock_key is not None:
+        # Taken before reading the existing codes, which a concurrent import could change
+        cursor.execute(f"SELECT pg_advisory_xact_lock({placeholder})", (lock_key,))
+    if replace:
+        cursor.execute("DELETE FROM passwords")
+        cursor.execute("DELETE FROM users")
+    cursor.execute("SELECT password, user_id FROM passwords")
+    issued = cursor.fetchall()
+    taken = {code for code, _ in issued}
+    users_with_code = {str(user_id) for _, user_id in issued}
+
+    # When an ID appears twice the last entry wins
+    records = list({record["id"]: record for record in records}.values())
+    needs_code = [record["id"] for record in records if record["id"] not in users_with_code]
+    new_codes = dict(zip(needs_code, generate_codes(len(needs_code), passwd_len, taken)))
+
+    user_sql = upsert_users_sql(placeholder)
+    password_sql = f"INSERT INTO passwords (password, user_id) VALUES ({placeholder}, {placeholder})"
+    for start in range(0, len(records), batch):
+        chunk = records[start:start + batch]
+        cursor.executemany(user_sql, [user_row(record) for record in chunk])
+        cursor.executemany(password_sql, [(new_codes[record["id"]], int(record["id"]))
+                                          for record in chunk if record["id"] in new_codes])
+        if lock_key is None:
+            db.commit()
+    db.commit()
+    cursor.close()
+    return {"users": len(records), "codes_generated": len(new_codes), "password_length": passwd_len}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import users from the converter output and issue access codes.")
+    parser.add_argument("input", nargs="?", default=str(Path(__file__).resolve().parent / "input.json"),
+                        help="JSON or NDJSON file (default: input.json next to this script)")
+    parser.add_argument("--sqlite", metavar="PATH", help="write to this SQLite database instead of PostgreSQL")
+    parser.add_argument("--length", type=int, default=8, help="code length (default: 8)")
+    parser.add_argument("--batch", type=int, default=5000,
+                        help="users per statement, and per transaction with --sqlite (default: 5000)")
+    parser.add_argument("--replace", action="store_true", help="delete existing users and codes first")
+    args = parser.parse_args(argv)
+
+    path = Path(args.input)
     if not path.exists():
         print(f"File not found: {path}")
-        return
-
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
+        sys.exit(1)
 
-    # normalize to a list of user dicts
-    if isinstance(data, dict):
-        # common shapes: { "users": [...] } or single user object
-        users = data.get("users") or data.get("data") or [data]
-    elif isinstance(data, list):
-        users = data
+    start = time.perf_counter()
+    diagnostics = ParseDiagnostics()
+    records = []
+    for entry in load_entries(path):
+        record = entry_to_record(entry, diagnostics)
+        if record is not None:
+            records.append(record)
+    if args.sqlite:
+        db, placeholder, lock_key = connect_sqlite(args.sqlite), "?", None
     else:
-        print("Unsupported JSON format")
-        return
-
-    inserted = 0
-    for u in users:
-        uid = u.get("id") or u.get("ID") or u.get("user_id") or u.get("uid")
-        if not uid:
-            # skip entries without id
-            continue
-
-        first_name = u.get("first_name") or u.get("firstName") or u.get("firstname") or ""
-        last_name = u.get("last_name") or u.get("lastName") or u.get("lastname") or ""
-        email = u.get("email") or ""
-        currentClass = u.get("currentClass") or u.get("current_class") or ""
-
-        # insert or replace user (keeps table consistent)
-        cursor.execute(
-            "INSERT OR REPLACE INTO users (id, first_name, last_name, email, currentClass) VALUES (?, ?, ?, ?, ?)",
-            (str(uid), first_name, last_name, email, currentClass)
-        )
-
-        # generate a unique password (avoid collisions with existing codes)
-        for _ in range(100):  # retry up to 100 times
-            code = generate_password(passwd_len)
-            try:
-                cursor.execute(
-                    "INSERT INTO passwords (password, user_id) VALUES (?, ?)",
-                    (code, str(uid))
-                )
-                break
-            except sqlite3.IntegrityError:
-                # collision on password primary key; try again
-                continue
-        else:
-            # if no unique code found after retries, skip this user
-            print(f"Failed to generate unique password for user {uid}")
-            continue
-
-        inserted += 1
+        db, placeholder, lock_key = connect_postgres(), "%s", IMPORT_LOCK_KEY
+    try:
+        result = issue_codes(db, records, args.length, args.batch, args.replace, placeholder, lock_key)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    print(f"Imported {result['users']} users, created {result['codes_generated']} codes "
+          f"(length={args.length}, {diagnostics.unmapped_count} unmapped answers) in {time.perf_counter() - start:.2f}s.")
+    for item in diagnostics.summary(limit=10)["unmapped"]:
+        print(f"  {item['column']} {item['value']!r}: {item['count']}x (e.g. ids {', '.join(item['sample_ids'])})")
 
-    db.commit()
-    print(f"Imported {inserted} users and created passwords (length={passwd_len}).")
 
 if __name__ == "__main__":
-    # default: read `input.json` located next to `backend/main.py`, generate 6\-char passwords
-    import_users_from_json(None, passwd_len=6)
+    main()
@@ -0,0 +1,49 @@
+"""Packed storage for the q3-q17 answers.
+
+Every answer is a value from 1 to 4, or missing. Each question gets a 3-bit
+lane (0 = no answer), so the 15 answers of a user fit in 45 bits and are
+stored in a single BIGINT column (``users.answers_packed``) next to the
+``q3``...``q17`` columns.
+"""
+
+ANSWER_COLUMNS = [f"q{i}" for i in range(3, 18)]
+
+LANE_BITS = 3
+LANE_MASK = (1 << LANE_BITS) - 1
+
+
+def pack_answers(answers: dict) -> int:
+    """Pack a ``{"q3": 1, ...}`` dict into a single integer.
+
+    Missing keys, ``None`` and values outside 1-4 are stored as "no answer".
+    """
+    packed = 0
+    for lane, column in enumerate(ANSWER_COLUMNS):
+        value = answers.get(column)
+        if value is not None and 1 <= value <= 4:
+            packed |= int(value) << (lane * LANE_BITS)
+    return packed
+
+
+def unpack_answers(packed: int | None) -> dict:
+    """Inverse of :func:`pack_answers`: missing answers come back as ``None``."""
+    packed = packed or 0
+    answers = {}
+    for lane, column in enumerate(ANSWER_COLUMNS):
+        value = (packed >> (lane * LANE_BITS)) & LANE_MASK
+        answers[column] = value or None
+    return answers
+
+
+def packed_sql_expression() -> str:
+    """SQL expression computing ``answers_packed`` from the q3-q17 columns.
+
+    Used to backfill rows written before the packed column existed.
+    """
+    lanes = []
+    for lane, column in enumerate(ANSWER_COLUMNS):
+        term = f"COALESCE({column}, 0)::BIGINT"
+        if lane:
+            term = f"({term} << {lane * LANE_BITS})"
+        lanes.append(term)
+    return " | ".join(lanes)
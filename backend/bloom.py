@@ -0,0 +1,62 @@
+"""Bloom filter used to reject invalid login codes without a DB query."""
+
+import hashlib
+import math
+
+# More hash rounds barely lower the false-positive rate but cost a blake2b-derived probe each
+MAX_HASHES = 16
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    ``item in bloom`` is never False for an added item; it may be True for an
+    item that was not added, with probability close to ``fp_rate``.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = 0.01, bits: int | None = None):
+        capacity = max(1, capacity)
+        if bits is None:
+            bits = math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        self.bits = max(8, bits)
+        self.hashes = max(1, min(MAX_HASHES, round(self.bits / capacity * math.log(2))))
+        self.fp_rate = fp_rate
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    @classmethod
+    def from_items(cls, items, fp_rate: float = 0.01, bits: int | None = None) -> "BloomFilter":
+        items = list(items)
+        bloom = cls(len(items), fp_rate, bits)
+        for item in items:
+            bloom.add(item)
+        return bloom
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def estimated_fp_rate(self) -> float:
+        """Expected false-positive rate for the items actually added."""
+        return (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+
+    def stats(self) -> dict:
+        return {
+            "items": self.count,
+            "bits": self.bits,
+            "hashes": self.hashes,
+            "size_bytes": len(self._array),
+            "target_fp_rate": self.fp_rate,
+            "estimated_fp_rate": round(self.estimated_fp_rate(), 6),
+        }
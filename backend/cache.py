@@ -0,0 +1,100 @@
+"""Small in-process cache used by the read endpoints."""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds.
+
+    Every worker process keeps its own copy; :class:`VersionCheck` clears it
+    when another worker's ``/createMatches`` changed the data.
+    """
+
+    def __init__(self, ttl: float = 60.0, maxsize: int = 10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < self.clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class VersionCheck:
+    """Clears caches when a version number stored in the DB changes.
+
+    ``read_version()`` is called at most every ``interval`` seconds, so a
+    worker serves data from before another worker's ``/createMatches`` for
+    at most ``interval`` seconds instead of a whole TTL.
+    """
+
+    def __init__(self, read_version, caches: list, interval: float = 2.0, clock=time.monotonic):
+        self.read_version = read_version
+        self.caches = caches
+        self.interval = interval
+        self.clock = clock
+        self.version = None
+        self.checked_at = None
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Current version; clears the caches first when it changed since the last check."""
+        now = self.clock()
+        if self.checked_at is not None and now - self.checked_at < self.interval:
+            return self.version
+        # One request reads the version; the others keep the last known one meanwhile
+        if not self._lock.acquire(blocking=self.checked_at is None):
+            return self.version
+        try:
+            version = self.read_version()
+            if version != self.version:
+                for cache in self.caches:
+                    cache.clear()
+                self.version = version
+            self.checked_at = now
+        finally:
+            self._lock.release()
+        return self.version
+
+    def set(self, version):
+        """Record a version written by this worker (its caches are already up to date)."""
+        with self._lock:
+            self.version = version
+            self.checked_at = self.clock()
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """True if the If-None-Match header covers ``etag``."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
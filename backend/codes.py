@@ -0,0 +1,57 @@
+"""Access codes handed out to users (the ``passwords`` table)."""
+
+import secrets
+import string
+
+CODE_CHARS = string.ascii_lowercase + string.digits
+
+# pg_advisory_xact_lock key serializing imports (API workers and GeneratePasswords.py)
+IMPORT_LOCK_KEY = 0x53564950
+
+# Random bytes below _LIMIT map uniformly onto CODE_CHARS (b % 36); the others are dropped
+_LIMIT = 256 - 256 % len(CODE_CHARS)
+_TABLE = bytes(ord(CODE_CHARS[b % len(CODE_CHARS)]) if b < _LIMIT else 0 for b in range(256))
+_REJECTED = bytes(range(_LIMIT, 256))
+
+
+def generate_codes(count: int, length: int, taken: set) -> list:
+    """``count`` random codes absent from ``taken`` (which is updated in place)."""
+    if count > len(CODE_CHARS) ** length - len(taken):
+        raise RuntimeError(f"Not enough {length}-character codes left for {count} users")
+    codes = []
+    while len(codes) < count:
+        # One batch of random characters for all the missing codes (plus rejected bytes)
+        missing = count - len(codes)
+        chars = secrets.token_bytes(missing * length + missing * length // 8 + length) \
+            .translate(_TABLE, _REJECTED).decode("ascii")
+        for start in range(0, len(chars) - length + 1, length):
+            code = chars[start:start + length]
+            if code in taken:
+                continue
+            taken.add(code)
+            codes.append(code)
+            if len(codes) == count:
+                break
+    return codes
+
+
+def plan_import(records: dict, existing_hashes: dict, issued: list, length: int) -> dict:
+    """What an import writes, from the parsed ``records`` (id -> record) and the rows already in the DB.
+
+    ``existing_hashes`` maps the IDs of the existing users to their ``source_hash``
+    and ``issued`` holds the existing ``(password, user_id)`` rows (both empty
+    when the tables are cleared first). Users absent from ``records`` are left
+    alone and existing codes are kept.
+
+    Returns ``changed`` (records to upsert: new IDs or a different
+    ``source_hash``), ``new`` (how many of them are new users), ``unchanged``
+    and ``codes``: ``(code, user_id)`` rows for the users without a code.
+    """
+    changed = [record for record in records.values() if existing_hashes.get(record["id"]) != record["source_hash"]]
+    taken = {code for code, _ in issued}
+    users_with_code = {str(user_id) for _, user_id in issued}
+    needs_code = [user_id for user_id in records if user_id not in users_with_code]
+    codes = generate_codes(len(needs_code), length, taken)
+    return {"changed": changed, "new": sum(1 for record in changed if record["id"] not in existing_hashes),
+            "unchanged": len(records) - len(changed),
+            "codes": [(code, int(user_id)) for code, user_id in zip(codes, needs_code)]}
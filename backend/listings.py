@@ -0,0 +1,85 @@
+"""Keyset-paginated admin listings (SQL building only, no DB access).
+
+Pages are read with ``WHERE id > <last id of the previous page> ORDER BY id
+LIMIT n``, never ``OFFSET``, so every page is an index range scan whatever
+its position. Filters by level or class use the ``(level, id)`` and
+``(currentClass, id)`` indexes created by main.py.
+"""
+
+from answers import ANSWER_COLUMNS
+
+# Same expression as the users level index (level_of() in SQL)
+LEVEL_SQL = "split_part(btrim({table}.currentClass), ' ', 1)"
+MAX_PAGE_SIZE = 500
+
+USER_COLUMNS = ["id", "first_name", "last_name", "email", "currentClass", "answered", "day1", "day2"]
+MATCH_COLUMNS = ["id", "first_name", "last_name", "currentClass",
+                 "day1", "day1_first_name", "day1_last_name",
+                 "day2", "day2_first_name", "day2_last_name"]
+
+
+def _filters(after, level, class_name) -> tuple[list, list]:
+    # Keyset and filters all on users: (level, id) and (currentClass, id) ranges
+    conditions, params = [], []
+    if after is not None:
+        conditions.append("u.id > %s")
+        params.append(after)
+    if level:
+        conditions.append(f"{LEVEL_SQL.format(table='u')} = %s")
+        params.append(level)
+    if class_name:
+        conditions.append("u.currentClass = %s")
+        params.append(class_name)
+    return conditions, params
+
+
+def _where(conditions: list) -> str:
+    return "WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def users_page_query(limit: int, after: str | None = None, level: str | None = None,
+                     class_name: str | None = None, matched: bool | None = None) -> tuple[str, list]:
+    """Users after ``after`` with answer completeness and day-1/day-2 partners.
+
+    ``matched``: only users with (True) or without (False) a day-1 partner.
+    One extra row is fetched to tell whether a next page exists (see :func:`page`).
+    """
+    conditions, params = _filters(after, level, class_name)
+    if matched is not None:
+        conditions.append("m.day1 IS NOT NULL" if matched else "m.day1 IS NULL")
+    sql = f"""SELECT u.id, u.first_name, u.last_name, u.email, u.currentClass,
+                     num_nonnulls({', '.join(f'u.{col}' for col in ANSWER_COLUMNS)}),
+                     m.day1, m.day2
+              FROM users u
+                       LEFT JOIN matches m ON m.id = u.id
+              {_where(conditions)}
+              ORDER BY u.id
+              LIMIT %s"""
+    return sql, params + [limit + 1]
+
+
+def matches_page_query(limit: int, after: str | None = None, level: str | None = None,
+                       class_name: str | None = None) -> tuple[str, list]:
+    """Match assignments after ``after`` with the names of both partners.
+
+    The keyset is on ``u.id`` (equal to ``m.id``) so filtered pages use the users indexes.
+    """
+    conditions, params = _filters(after, level, class_name)
+    sql = f"""SELECT u.id, u.first_name, u.last_name, u.currentClass,
+                     m.day1, d1.first_name, d1.last_name,
+                     m.day2, d2.first_name, d2.last_name
+              FROM matches m
+                       JOIN users u ON u.id = m.id
+                       LEFT JOIN users d1 ON d1.id = m.day1
+                       LEFT JOIN users d2 ON d2.id = m.day2
+              {_where(conditions)}
+              ORDER BY u.id
+              LIMIT %s"""
+    return sql, params + [limit + 1]
+
+
+def page(rows: list, limit: int, columns: list) -> dict:
+    """``{"items", "next_after"}``: pass ``next_after`` as ``after`` to get the next page (None on the last)."""
+    items = [dict(zip(columns, row)) for row in rows[:limit]]
+    next_after = items[-1]["id"] if len(rows) > limit else None
+    return {"items": items, "next_after": next_after}
@@ -0,0 +1,168 @@
+"""Read-only login index shared by all worker processes through ``mmap``.
+
+File layout (little-endian)::
+
+    header   magic "SVLI", version u16, key width u16, count u32, blob offset u64, stamp u64
+    records  count x (code padded with NUL to key width, profile offset u32, profile length u32)
+             sorted by code
+    blob     UTF-8 JSON profiles
+
+Lookups binary-search the fixed-width records directly in the mapped file,
+so every worker shares the same page-cached copy. The file is written to a
+temporary name and moved into place with ``os.replace``: readers see either
+the old or the new index, never a partial one.
+
+The stamp records the data version the index was written from (main.py
+uses code_version), so readers can ignore an index older than the DB.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+MAGIC = b"SVLI"
+VERSION = 2
+HEADER = struct.Struct("<4sHHIQQ")
+POINTER = struct.Struct("<II")
+
+
+def write_index(path: str, entries, stamp: int = 0) -> dict:
+    """Atomically write ``entries`` (an iterable of ``(code, profile dict)``) to ``path``."""
+    records = sorted((code.encode("utf-8"), json.dumps(profile, ensure_ascii=False).encode("utf-8"))
+                     for code, profile in entries)
+    key_width = max((len(code) for code, _ in records), default=1)
+    record_size = key_width + POINTER.size
+    blob_offset = HEADER.size + record_size * len(records)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".login_index.", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, key_width, len(records), blob_offset, stamp))
+            offset = 0
+            for code, profile in records:
+                f.write(code.ljust(key_width, b"\0"))
+                f.write(POINTER.pack(offset, len(profile)))
+                offset += len(profile)
+            for _, profile in records:
+                f.write(profile)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return {"path": path, "entries": len(records), "size_bytes": blob_offset + offset, "stamp": stamp}
+
+
+class LoginIndex:
+    """Binary-search reader over a file written by :func:`write_index`.
+
+    The file is re-opened when it has been replaced, checked at most once
+    every ``check_interval`` seconds. A file that cannot be read (truncated,
+    other format) is logged and ignored: lookups miss until it is replaced.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # (mmap, key width, count, blob offset, stamp), swapped as a whole on reload
+        self._view = None
+        self._identity = None
+        self._checked_at = 0.0
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._view is not None and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._close()
+                return
+            identity = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if identity == self._identity:
+                return
+            try:
+                self._view = self._open()
+            except (OSError, ValueError, struct.error) as e:
+                logging.error(f"Index de login illisible, ignoré: {e}")
+                self._view = None
+            self._identity = identity
+
+    def _open(self) -> tuple:
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, key_width, count, blob_offset, stamp = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{self.path} is not a login index (version {version})")
+            if blob_offset != HEADER.size + count * (key_width + POINTER.size) or len(mm) < blob_offset:
+                raise ValueError(f"{self.path} is truncated")
+        except BaseException:
+            mm.close()
+            raise
+        return mm, key_width, count, blob_offset, stamp
+
+    def _close(self):
+        # Dropping the reference is enough: a lookup running in another thread
+        # keeps the old mapping alive until it finishes, then it is unmapped.
+        self._view = None
+        self._identity = None
+
+    def lookup(self, code: str) -> dict | None:
+        """Profile stored for ``code``, or None if the code is absent (or no index exists)."""
+        return self.find(code)[0]
+
+    def find(self, code: str) -> tuple[dict | None, int | None]:
+        """``(profile or None, stamp of the index it was read from)``; the stamp is None without index."""
+        self._refresh()
+        view = self._view
+        if view is None:
+            return None, None
+        mm, key_width, count, blob_offset, stamp = view
+        key = code.encode("utf-8")
+        if len(key) > key_width:
+            return None, stamp
+        key = key.ljust(key_width, b"\0")
+        record_size = key_width + POINTER.size
+
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = HEADER.size + mid * record_size
+            current = mm[start:start + key_width]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                offset, length = POINTER.unpack_from(mm, start + key_width)
+                start = blob_offset + offset
+                try:
+                    return json.loads(mm[start:start + length]), stamp
+                except ValueError as e:
+                    logging.error(f"Index de login illisible, ignoré: {e}")
+                    self._view = None
+                    return None, None
+        return None, stamp
+
+    def stamp(self) -> int | None:
+        """Stamp of the current index, None when there is no readable index."""
+        self._refresh()
+        view = self._view
+        return view[4] if view is not None else None
+
+    def stats(self) -> dict:
+        self._refresh()
+        view = self._view
+        return {"path": self.path, "loaded": view is not None, "entries": view[2] if view else 0,
+                "stamp": view[4] if view else None}
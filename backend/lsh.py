@@ -0,0 +1,143 @@
+"""Approximate candidate graph for very large levels (locality-sensitive hashing).
+
+Users giving the same answers to a random subset of ``band`` questions land
+in the same bucket; each of the ``tables`` hash tables uses another subset.
+Pairs are only scored inside buckets and every user keeps the ``k`` best
+partners found, so time and memory grow with ``n * bucket size`` instead of
+``n ** 2``. More tables or smaller bands find more of the true best partners
+(higher recall) at the cost of more scored pairs; :func:`recall_report`
+measures it against exact scoring on a sample of users.
+"""
+
+import numpy as np
+
+from scoring import CHOICES
+
+# Candidate edges buffered before being merged into the top-k arrays
+MERGE_EVERY = 2_000_000
+
+
+def merge_top_k(neighbours: np.ndarray, neighbour_scores: np.ndarray, i, j, values):
+    """Merge the directed edges ``i[t] -> j[t]`` into the per-user top-k arrays, in place.
+
+    Rows stay sorted best first, ties by partner index; duplicate edges are ignored.
+    """
+    n, k = neighbours.shape
+    if k == 0 or len(i) == 0:
+        return
+    # Edges below the current k-th best of their user cannot enter the top-k
+    i, j, values = np.asarray(i, dtype=np.int64), np.asarray(j, dtype=np.int64), np.asarray(values, dtype=np.float64)
+    useful = values >= neighbour_scores[i, k - 1]
+    if not useful.any():
+        return
+    i, j, values = i[useful], j[useful], values[useful]
+    current = neighbours.ravel() >= 0
+    all_i = np.concatenate([np.repeat(np.arange(n, dtype=np.int64), k)[current], i])
+    all_j = np.concatenate([neighbours.ravel()[current], j])
+    all_s = np.concatenate([neighbour_scores.ravel()[current], values])
+
+    _, first = np.unique(all_i * n + all_j, return_index=True)
+    all_i, all_j, all_s = all_i[first], all_j[first], all_s[first]
+    order = np.lexsort((all_j, -all_s, all_i))
+    all_i, all_j, all_s = all_i[order], all_j[order], all_s[order]
+    rank = np.arange(len(all_i)) - np.searchsorted(all_i, all_i, side="left")
+    keep = rank < k
+
+    neighbours.fill(-1)
+    neighbour_scores.fill(-np.inf)
+    neighbours[all_i[keep], rank[keep]] = all_j[keep]
+    neighbour_scores[all_i[keep], rank[keep]] = all_s[keep]
+
+
+def lsh_neighbours(scorer, codes: np.ndarray, k: int, tables: int = 8, band: int = 5,
+                   max_bucket: int = 256, seed: int = 0) -> tuple[np.ndarray, np.ndarray, dict]:
+    """Approximate top-``k`` partners of every user.
+
+    - scorer: :class:`scoring.LevelScorer` of the level
+    - codes: ``(n, 15)`` answer values from :func:`scoring.answer_codes`
+    - max_bucket: larger buckets (e.g. many identical answers) are split at random
+
+    Returns ``(neighbours, neighbour_scores, stats)``; empty slots hold ``-1`` / ``-inf``.
+    """
+    n = scorer.n
+    k = max(0, min(k, n - 1))
+    band = max(1, min(band, codes.shape[1]))
+    neighbours = np.full((n, k), -1, dtype=np.int64)
+    neighbour_scores = np.full((n, k), -np.inf)
+    rng = np.random.default_rng(seed)
+    place = (CHOICES + 1) ** np.arange(band, dtype=np.int64)
+
+    scored = 0
+    pending_i, pending_j, pending_s, pending = [], [], [], 0
+    for _ in range(tables if k else 0):
+        columns = rng.choice(codes.shape[1], size=band, replace=False)
+        keys = codes[:, columns].astype(np.int64) @ place
+        order = np.argsort(keys, kind="stable")
+        for bucket in np.split(order, np.flatnonzero(np.diff(keys[order])) + 1):
+            if len(bucket) < 2:
+                continue
+            if len(bucket) > max_bucket:
+                bucket = rng.permutation(bucket)
+            for start in range(0, len(bucket), max_bucket):
+                chunk = np.sort(bucket[start:start + max_bucket])
+                m = len(chunk)
+                if m < 2:
+                    continue
+                block = scorer.block(chunk, chunk).astype(np.float64)
+                np.fill_diagonal(block, -np.inf)
+                # Only each row's k best (ties by index) can reach the top-k
+                cols = np.argsort(-block, axis=1, kind="stable")[:, :min(k, m - 1)]
+                rows = np.repeat(np.arange(m), cols.shape[1])
+                cols = cols.ravel()
+                pending_i.append(chunk[rows])
+                pending_j.append(chunk[cols])
+                pending_s.append(block[rows, cols])
+                pending += len(rows)
+                scored += m * (m - 1) // 2
+            if pending >= MERGE_EVERY:
+                merge_top_k(neighbours, neighbour_scores, np.concatenate(pending_i), np.concatenate(pending_j),
+                            np.concatenate(pending_s))
+                pending_i, pending_j, pending_s, pending = [], [], [], 0
+    if pending:
+        merge_top_k(neighbours, neighbour_scores, np.concatenate(pending_i), np.concatenate(pending_j),
+                    np.concatenate(pending_s))
+
+    stats = {
+        "tables": tables,
+        "band": band,
+        "max_bucket": max_bucket,
+        "k": k,
+        "pairs_scored": scored,
+        "pairs_exact": n * (n - 1) // 2,
+        "users_without_candidates": int((neighbours[:, 0] < 0).sum()) if k else n,
+    }
+    return neighbours, neighbour_scores, stats
+
+
+def recall_report(scorer, neighbours: np.ndarray, neighbour_scores: np.ndarray,
+                  sample: int = 200, seed: int = 0) -> dict:
+    """Compare an approximate candidate graph with exact scoring for ``sample`` random users.
+
+    ``recall_at_k`` is the share of the exact top-k found (a candidate tied
+    with the exact k-th best score counts as found); ``best_partner_found``
+    the share of users whose best exact score is reached by their best candidate.
+    """
+    n, k = neighbours.shape
+    if k == 0 or n < 2:
+        return {"sample": 0, "k": k}
+    rng = np.random.default_rng(seed)
+    users = np.sort(rng.choice(n, size=min(sample, n), replace=False))
+    exact = scorer.block(users).astype(np.float64)
+    exact[np.arange(len(users)), users] = -np.inf
+    kth_best = -np.partition(-exact, k - 1, axis=1)[:, k - 1]
+    found = neighbour_scores[users]
+    best_exact = exact.max(axis=1)
+    best_found = np.where(np.isfinite(found[:, 0]), found[:, 0], 0.0)
+    return {
+        "sample": len(users),
+        "k": k,
+        "recall_at_k": round(float(((found >= kth_best[:, None]).sum(axis=1) / k).mean()), 4),
+        "best_partner_found": round(float((best_found >= best_exact).mean()), 4),
+        "mean_best_score_exact": round(float(best_exact.mean()), 4),
+        "mean_best_score_approx": round(float(best_found.mean()), 4),
+    }
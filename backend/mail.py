@@ -1,6 +1,9 @@
 import smtplib
 import logging
 import os
+import sys
+import argparse
+import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
@@ -15,6 +18,20 @@ logger = logging.getLogger(__name__)
 
 executor = ThreadPoolExecutor(max_workers=10)  # 10 at the same time (can go to 30)
 
+SITE_URL = os.getenv("SITE_URL", "https://url.com")
+
+# Match reveal notifications (python mail.py schedule / python mail.py notify).
+# REVEAL_DAY1_AT / REVEAL_DAY2_AT: ISO date-times (local time when no offset given).
+# Sends of one reveal are spread over NOTIFY_WINDOW seconds, and never faster
+# than NOTIFY_MAX_PER_MINUTE, to stay under the SMTP provider limits.
+REVEAL_TIMES = {1: os.getenv("REVEAL_DAY1_AT"), 2: os.getenv("REVEAL_DAY2_AT")}
+DAY_COLUMNS = {1: "day1", 2: "day2"}
+NOTIFY_BATCH = int(os.getenv("NOTIFY_BATCH", "500"))
+NOTIFY_WINDOW = float(os.getenv("NOTIFY_WINDOW", "3600"))
+NOTIFY_MAX_PER_MINUTE = int(os.getenv("NOTIFY_MAX_PER_MINUTE", "30"))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+NOTIFY_RETRY_DELAY = float(os.getenv("NOTIFY_RETRY_DELAY", "300"))
+
 
 def get_db_connection():
     database_url = os.getenv('DATABASE_URL')
@@ -30,6 +47,13 @@ def get_db_connection():
     )
 
 
+def smtp_connect(expediteur: str, mot_de_passe: str) -> smtplib.SMTP:
+    server = smtplib.SMTP("smtp.office365.com", 587, timeout=10)
+    server.starttls()
+    server.login(expediteur, mot_de_passe)
+    return server
+
+
 def send_email_blocking(destinataire: str, code: str) -> tuple:
     expediteur = os.getenv('EMAIL')
     mot_de_passe = os.getenv('PASSWORD')
@@ -42,14 +66,12 @@ def send_email_blocking(destinataire: str, code: str) -> tuple:
     message["To"] = destinataire
     message["Subject"] = "Ton code pour acceder a l'évènement de la Saint Valentin"
 
-    corps = f"Voici ton code d'accès : {code}\n\nConnecte ici : https://url.com"
+    corps = f"Voici ton code d'accès : {code}\n\nConnecte ici : {SITE_URL}"
     message.attach(MIMEText(corps, "plain"))
 
     try:
         # Connexion SMTP
-        server = smtplib.SMTP("smtp.office365.com", 587, timeout=10)
-        server.starttls()
-        server.login(expediteur, mot_de_passe)
+        server = smtp_connect(expediteur, mot_de_passe)
         server.send_message(message)
         server.quit()
         return (destinataire, True, "OK")
@@ -137,5 +159,269 @@ async def send_all_emails_async():
                 pass
 
 
+def parse_reveal_time(value: str) -> datetime.datetime:
+    """ISO date-time; naive values are taken in the local time zone."""
+    moment = datetime.datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.astimezone()
+
+
+def send_offsets(total: int, window: float, max_per_minute: int) -> list:
+    """Delay in seconds of each of ``total`` sends, evenly spread over ``window``.
+
+    The window is widened when needed so sends never exceed ``max_per_minute``.
+    """
+    if total <= 0:
+        return []
+    if max_per_minute > 0:
+        window = max(window, (total - 1) * 60 / max_per_minute)
+    step = window / (total - 1) if total > 1 else 0.0
+    return [position * step for position in range(total)]
+
+
+def render_reveal(first_name: str | None, day: int, partner: tuple) -> tuple:
+    """Subject and body of the day-``day`` reveal email; ``partner`` is (first_name, last_name, class)."""
+    partner_first, partner_last, partner_class = partner
+    partner_name = " ".join(part for part in (partner_first, partner_last) if part)
+    if partner_class:
+        partner_name = f"{partner_name} ({partner_class})" if partner_name else partner_class
+    subject = f"Saint Valentin : ton match du jour {day} est là !"
+    greeting = f"Bonjour {first_name}," if first_name else "Bonjour,"
+    reveal = f"Ton match du jour {day} est {partner_name}." if partner_name else f"Ton match du jour {day} t'attend."
+    body = f"{greeting}\n\n{reveal}\n\nTous les détails sur le site : {SITE_URL}"
+    return subject, body
+
+
+class Pacer:
+    """Keeps successive sends at least ``60 / max_per_minute`` seconds apart."""
+
+    def __init__(self, max_per_minute: int, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 60 / max_per_minute if max_per_minute > 0 else 0.0
+        self.clock = clock
+        self.sleep = sleep
+        self.last = None
+
+    def wait(self):
+        now = self.clock()
+        if self.last is not None and now - self.last < self.interval:
+            self.sleep(self.interval - (now - self.last))
+            now = self.clock()
+        self.last = now
+
+
+def create_notifications_table(cursor):
+    cursor.execute("""
+                   CREATE TABLE IF NOT EXISTS notifications
+                   (
+                       user_id
+                       TEXT,
+                       day
+                       INTEGER,
+                       email
+                       TEXT,
+                       subject
+                       TEXT,
+                       body
+                       TEXT,
+                       send_after
+                       TIMESTAMPTZ,
+                       sent_at
+                       TIMESTAMPTZ,
+                       attempts
+                       INTEGER
+                       DEFAULT
+                       0,
+                       last_error
+                       TEXT,
+                       PRIMARY KEY (user_id, day)
+                   )
+                   """)
+
+
+def schedule_reveal(db, day: int, reveal_at: datetime.datetime, window: float = NOTIFY_WINDOW,
+                    max_per_minute: int = NOTIFY_MAX_PER_MINUTE, batch: int = NOTIFY_BATCH) -> int:
+    """Render the day-``day`` reveal of every matched user into ``notifications``.
+
+    ``matches`` is read in batches (keyset on the user id). Messages already
+    sent are left untouched, pending ones are re-rendered and pending ones of
+    users no longer matched (or without email, or deleted) are dropped, all
+    in one transaction, so it can be run again after matches are recomputed.
+    Returns the number of messages scheduled.
+    """
+    column = DAY_COLUMNS[day]
+    cursor = db.cursor()
+    create_notifications_table(cursor)
+    matched = f"""FROM matches m
+                           JOIN users u ON u.id = m.id
+                           JOIN users p ON p.id = m.{column}
+                  WHERE u.email IS NOT NULL"""
+    try:
+        cursor.execute(f"""DELETE
+                           FROM notifications n
+                           WHERE n.day = %s
+                             AND n.sent_at IS NULL
+                             AND NOT EXISTS (SELECT 1 {matched} AND m.id = n.user_id)""", (day,))
+        dropped = cursor.rowcount
+        cursor.execute(f"SELECT count(*) {matched}")
+        total = cursor.fetchone()[0]
+        offsets = send_offsets(total, window, max_per_minute)
+
+        position, last_id = 0, ""
+        while position < total:
+            cursor.execute(f"""SELECT m.id, u.email, u.first_name, p.first_name, p.last_name, p.currentClass
+                               {matched}
+                                 AND m.id > %s
+                               ORDER BY m.id
+                               LIMIT %s""", (last_id, batch))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            params = []
+            for user_id, email, first_name, *partner in rows:
+                subject, body = render_reveal(first_name, day, tuple(partner))
+                send_after = reveal_at + datetime.timedelta(seconds=offsets[min(position, total - 1)])
+                params.append((user_id, day, email, subject, body, send_after))
+                position += 1
+            cursor.executemany("""INSERT INTO notifications (user_id, day, email, subject, body, send_after)
+                                  VALUES (%s, %s, %s, %s, %s, %s)
+                                  ON CONFLICT (user_id, day) DO UPDATE
+                                      SET email      = EXCLUDED.email,
+                                          subject    = EXCLUDED.subject,
+                                          body       = EXCLUDED.body,
+                                          send_after = EXCLUDED.send_after,
+                                          attempts   = 0,
+                                          last_error = NULL
+                                  WHERE notifications.sent_at IS NULL""", params)
+            last_id = rows[-1][0]
+            logger.info(f"📅 Jour {day} : {position}/{total} messages préparés")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+    if dropped:
+        logger.info(f"🗑️  Jour {day} : {dropped} messages en attente annulés (plus de match)")
+    return position
+
+
+def run_notifications(db, batch: int = NOTIFY_BATCH, max_per_minute: int = NOTIFY_MAX_PER_MINUTE,
+                      max_attempts: int = NOTIFY_MAX_ATTEMPTS, retry_delay: float = NOTIFY_RETRY_DELAY,
+                      once: bool = False) -> dict:
+    """Send due notifications until none is pending (or one pass with ``once``).
+
+    Each send is committed before the next one, so a restart resumes with the
+    messages not sent yet. Failed sends are retried after ``retry_delay``
+    seconds, up to ``max_attempts`` times.
+    """
+    expediteur = os.getenv('EMAIL')
+    mot_de_passe = os.getenv('PASSWORD')
+    if not expediteur or not mot_de_passe:
+        raise RuntimeError("Config email manquante")
+
+    cursor = db.cursor()
+    create_notifications_table(cursor)
+    db.commit()
+    pacer = Pacer(max_per_minute)
+    counts = {"sent": 0, "failed": 0}
+    server = None
+    try:
+        while True:
+            cursor.execute("""SELECT user_id, day, email, subject, body
+                              FROM notifications
+                              WHERE sent_at IS NULL
+                                AND attempts < %s
+                                AND send_after <= now()
+                              ORDER BY send_after, user_id, day
+                              LIMIT %s""", (max_attempts, batch))
+            rows = cursor.fetchall()
+            if not rows:
+                cursor.execute("""SELECT min(send_after) - now()
+                                  FROM notifications
+                                  WHERE sent_at IS NULL
+                                    AND attempts < %s""", (max_attempts,))
+                next_in = cursor.fetchone()[0]
+                db.commit()
+                if once or next_in is None:
+                    break
+                time.sleep(min(max(next_in.total_seconds(), 1.0), 60.0))
+                continue
+
+            for user_id, day, email, subject, body in rows:
+                pacer.wait()
+                message = MIMEMultipart()
+                message["From"] = expediteur
+                message["To"] = email
+                message["Subject"] = subject
+                message.attach(MIMEText(body, "plain"))
+                try:
+                    if server is None:
+                        server = smtp_connect(expediteur, mot_de_passe)
+                    server.send_message(message)
+                except OSError as e:  # includes smtplib.SMTPException
+                    if isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(e, smtplib.SMTPException):
+                        server = None
+                    cursor.execute("""UPDATE notifications
+                                      SET attempts   = attempts + 1,
+                                          last_error = %s,
+                                          send_after = now() + %s * INTERVAL '1 second'
+                                      WHERE user_id = %s
+                                        AND day = %s""", (str(e)[:200], retry_delay, user_id, day))
+                    counts["failed"] += 1
+                else:
+                    cursor.execute("""UPDATE notifications
+                                      SET sent_at    = now(),
+                                          attempts   = attempts + 1,
+                                          last_error = NULL
+                                      WHERE user_id = %s
+                                        AND day = %s""", (user_id, day))
+                    counts["sent"] += 1
+                db.commit()
+            logger.info(f"📧 Envoyés : {counts['sent']}, échecs : {counts['failed']}")
+            if once:
+                break
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except smtplib.SMTPException:
+                pass
+        cursor.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Envoi des emails de l'évènement")
+    parser.add_argument("command", nargs="?", default="codes", choices=["codes", "schedule", "notify"],
+                        help="codes : codes d'accès (par défaut) ; schedule : préparer les révélations ; "
+                             "notify : envoyer les révélations à l'heure prévue")
+    parser.add_argument("--day", type=int, choices=[1, 2], action="append",
+                        help="jour à préparer (par défaut ceux dont REVEAL_DAYx_AT est défini)")
+    parser.add_argument("--once", action="store_true", help="notify : un seul passage puis arrêt")
+    args = parser.parse_args(argv)
+
+    if args.command == "codes":
+        asyncio.run(send_all_emails_async())
+        return
+
+    db = get_db_connection()
+    try:
+        if args.command == "schedule":
+            days = args.day or [day for day, value in REVEAL_TIMES.items() if value]
+            if not days:
+                logger.error("❌ REVEAL_DAY1_AT / REVEAL_DAY2_AT non définis")
+                sys.exit(1)
+            for day in days:
+                if not REVEAL_TIMES[day]:
+                    logger.error(f"❌ REVEAL_DAY{day}_AT non défini")
+                    sys.exit(1)
+                schedule_reveal(db, day, parse_reveal_time(REVEAL_TIMES[day]))
+        else:
+            counts = run_notifications(db, once=args.once)
+            logger.info(f"   Envoyés : {counts['sent']}")
+            logger.info(f"   Échoués : {counts['failed']}")
+    finally:
+        db.close()
+
+
 if __name__ == "__main__":
-    asyncio.run(send_all_emails_async())
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -1,8 +1,11 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Header, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Header, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from pathlib3 import Path
+import csv
+import io
 import json
 import datetime
 import random
@@ -11,6 +14,8 @@ import secrets
 import smtplib
 import ssl
 import logging
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
@@ -22,6 +27,22 @@ from io import BytesIO
 import socket
 import requests
 
+from answers import ANSWER_COLUMNS, pack_answers, packed_sql_expression
+from scoring import compile_scoring, load_scoring_config
+from matchengine import level_of, run_matching
+from listings import MATCH_COLUMNS, MAX_PAGE_SIZE, USER_COLUMNS, matches_page_query, page, users_page_query
+from cache import TTLCache, VersionCheck, etag_matches
+from codes import IMPORT_LOCK_KEY, generate_codes, plan_import
+from sessions import InvalidToken, issue_token, verify_token
+from ratelimit import SlidingWindowLimiter
+from replicas import ReplicaPool
+from bloom import BloomFilter
+from login_index import LoginIndex, write_index
+from metrics import Registry
+from profiling import StageTimer, start_profiler, profiler_report
+from survey import (ANSWER_MAPPINGS, QUESTION_TO_COLUMN, detect_format, parse_answer, parse_name,
+                    parse_survey_frame, read_survey_file)
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO)
@@ -34,16 +55,82 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --------------------
+# METRICS (exposed on GET /metrics)
+# --------------------
+metrics = Registry()
+http_request_seconds = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"))
+db_query_seconds = metrics.histogram(
+    "db_query_duration_seconds", "Database query latency by statement type.", ("statement",))
+db_connections_open = metrics.gauge("db_connections_open", "Open database connections.")
+db_queries_in_flight = metrics.gauge("db_queries_in_flight", "Database queries currently executing.")
+db_reads = metrics.counter("db_reads_total", "Read-only endpoint queries by target (primary or replica).", ("target",))
+login_attempts = metrics.counter("login_attempts_total", "Login attempts by outcome.", ("outcome",))
+import_rows = metrics.counter("import_rows_total", "Imported survey rows by status.", ("status",))
+import_parse_failures = metrics.counter(
+    "import_parse_failures_total", "Survey answers that could not be mapped, by column.", ("column",))
+matches_created_total = metrics.counter("matches_created_total", "Match rows written by /createMatches.")
+export_rows = metrics.counter("export_rows_total", "Rows streamed by GET /export, by format.", ("format",))
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/matches/{user_id}), not raw path, to bound cardinality
+        route = request.scope.get("route")
+        http_request_seconds.observe(time.perf_counter() - start, method=request.method,
+                                     route=getattr(route, "path", "unmatched"), status=status)
+
+
+def statement_kind(query) -> str:
+    """First SQL keyword of a query (SELECT, INSERT...), used as a metric label."""
+    words = str(query).split(None, 1)
+    return words[0].upper() if words else ""
+
+
+class TimedCursor(psycopg.Cursor):
+    """Cursor recording query latency and in-flight queries."""
+
+    def execute(self, query, params=None, **kwargs):
+        statement = statement_kind(query)
+        db_queries_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            return super().execute(query, params, **kwargs)
+        finally:
+            db_queries_in_flight.dec()
+            db_query_seconds.observe(time.perf_counter() - start, statement=statement)
+
+    def executemany(self, query, params_seq, **kwargs):
+        statement = statement_kind(query) + "_MANY"
+        db_queries_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            return super().executemany(query, params_seq, **kwargs)
+        finally:
+            db_queries_in_flight.dec()
+            db_query_seconds.observe(time.perf_counter() - start, statement=statement)
+
 
 # PostgreSQL connection configuration
-def get_db_connection():
-    """Create and return a PostgreSQL database connection."""
+def get_db_connection(dsn: str | None = None, **params):
+    """Create and return a PostgreSQL database connection (to ``dsn``, or the primary by default).
+
+    ``params`` are extra libpq parameters (e.g. ``connect_timeout``).
+    """
     # Try to get DATABASE_URL first, otherwise construct from individual components
-    database_url = os.getenv('DATABASE_URL')
+    database_url = dsn or os.getenv('DATABASE_URL')
 
     if database_url:
         # Parse DATABASE_URL if provided
-        conn = psycopg.connect(database_url)
+        conn = psycopg.connect(database_url, cursor_factory=TimedCursor, **params)
     else:
         # Construct connection from individual environment variables
         db_host = os.getenv('DB_HOST', 'localhost')
@@ -57,9 +144,12 @@ def get_db_connection():
             port=db_port,
             dbname=db_name,
             user=db_user,
-            password=db_password
+            password=db_password,
+            cursor_factory=TimedCursor,
+            **params
         )
 
+    db_connections_open.inc()
     return conn
 
 
@@ -70,6 +160,51 @@ def get_db_connection():
 db = get_db_connection()
 cursor = db.cursor()
 
+
+# Replica connections are opened on the request path (lag checks): an unreachable
+# replica must fail fast, and a stuck one must not hold a login
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "2"))
+REPLICA_STATEMENT_TIMEOUT_MS = int(os.getenv("REPLICA_STATEMENT_TIMEOUT_MS", "2000"))
+
+
+def connect_replica(dsn: str):
+    conn = get_db_connection(dsn, connect_timeout=REPLICA_CONNECT_TIMEOUT,
+                             options=f"-c statement_timeout={REPLICA_STATEMENT_TIMEOUT_MS}")
+    # Reads only: no transaction left open on the standby
+    conn.autocommit = True
+    return conn
+
+
+def close_replica(conn):
+    conn.close()
+    db_connections_open.dec()
+
+
+# Optional read replicas (comma-separated DSNs). /login lookups, match and candidate
+# lists and exports read from a replica lagging at most REPLICA_MAX_LAG seconds,
+# checked every REPLICA_CHECK_INTERVAL seconds; the primary is used otherwise.
+replicas = ReplicaPool(
+    [dsn.strip() for dsn in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if dsn.strip()],
+    connect_replica,
+    max_lag=float(os.getenv("REPLICA_MAX_LAG", "5")),
+    check_interval=float(os.getenv("REPLICA_CHECK_INTERVAL", "10")),
+    close=close_replica,
+)
+
+
+def read_query(query):
+    """Run ``query(conn)`` on a usable replica, or on the primary when there is none or it fails."""
+    conn = replicas.connection()
+    if conn is not None:
+        try:
+            result = query(conn)
+            db_reads.inc(target="replica")
+            return result
+        except psycopg.OperationalError as e:
+            replicas.mark_failed(conn, e)
+    db_reads.inc(target="primary")
+    return query(db)
+
 cursor.execute("""
                CREATE TABLE IF NOT EXISTS passwords
                (
@@ -130,6 +265,66 @@ cursor.execute("""
                )
                """)
 
+
+def has_column(table: str, column: str) -> bool:
+    """Whether ``table.column`` exists.
+
+    Checked before adding a column: ``ADD COLUMN IF NOT EXISTS`` takes an ACCESS
+    EXCLUSIVE lock even when the column is there, queuing every worker behind
+    the other workers' open transactions on the table.
+    """
+    return cursor.execute(
+        """SELECT 1 FROM information_schema.columns
+           WHERE table_name = %s AND column_name = %s""",
+        (table, column),
+    ).fetchone() is not None
+
+
+# Packed copy of q3-q17 (see answers.py), backfilled for rows imported before it existed
+if not has_column("users", "answers_packed"):
+    cursor.execute("ALTER TABLE users ADD COLUMN answers_packed BIGINT")
+# Only when needed: the UPDATE bumps code_version (trigger below) even when it changes no row
+if cursor.execute("SELECT 1 FROM users WHERE answers_packed IS NULL LIMIT 1").fetchone():
+    cursor.execute(f"UPDATE users SET answers_packed = {packed_sql_expression()} WHERE answers_packed IS NULL")
+
+# Digest of the parsed export row each user was last imported from (see import_xlsx_df)
+if not has_column("users", "source_hash"):
+    cursor.execute("ALTER TABLE users ADD COLUMN source_hash TEXT")
+
+# Bumped by any statement changing passwords or users, whoever runs it (API import,
+# GeneratePasswords.py, manual SQL): the login filter is only trusted at this version.
+# Every bump is announced on the code_version channel (delivered at commit).
+cursor.execute("""
+               CREATE TABLE IF NOT EXISTS code_version
+               (
+                   id
+                   INTEGER
+                   PRIMARY
+                   KEY,
+                   version
+                   BIGINT
+               )
+               """)
+cursor.execute("INSERT INTO code_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING")
+cursor.execute("""
+               CREATE OR REPLACE FUNCTION bump_code_version() RETURNS trigger AS
+               $$
+               BEGIN
+                   UPDATE code_version SET version = version + 1 WHERE id = 1;
+                   PERFORM pg_notify('code_version', '');
+                   RETURN NULL;
+               END;
+               $$ LANGUAGE plpgsql
+               """)
+for table in ("passwords", "users"):
+    cursor.execute(f"""
+                   CREATE OR REPLACE TRIGGER {table}_code_version
+                       AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE
+                       ON {table}
+                       FOR EACH STATEMENT
+                   EXECUTE FUNCTION bump_code_version()
+                   """)
+
 cursor.execute("""
                CREATE TABLE IF NOT EXISTS matches
                (
@@ -144,7 +339,178 @@ cursor.execute("""
                )
                """)
 
+# Partner of each user in each round (round 1..K), rebuilt by /createMatches
+cursor.execute("""
+               CREATE TABLE IF NOT EXISTS match_rounds
+               (
+                   user_id
+                   TEXT,
+                   round
+                   INTEGER,
+                   partner_id
+                   TEXT,
+                   PRIMARY KEY (user_id, round)
+               )
+               """)
+
+# Bumped by every /createMatches run; workers compare it to drop their cached views
+cursor.execute("""
+               CREATE TABLE IF NOT EXISTS match_version
+               (
+                   id
+                   INTEGER
+                   PRIMARY
+                   KEY,
+                   version
+                   BIGINT
+               )
+               """)
+cursor.execute("INSERT INTO match_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING")
+
+# Top-k most compatible peers of each user in the same level, rebuilt by /createMatches
+cursor.execute("""
+               CREATE TABLE IF NOT EXISTS candidates
+               (
+                   user_id
+                   TEXT,
+                   rank
+                   INTEGER,
+                   candidate_id
+                   TEXT,
+                   score
+                   REAL,
+                   PRIMARY KEY (user_id, rank)
+               )
+               """)
+
+# Weighted scores are fractional; tables created before SCORING_CONFIG stored integers
+if cursor.execute(
+        """SELECT data_type FROM information_schema.columns
+           WHERE table_name = 'candidates' AND column_name = 'score'"""
+).fetchone() == ("integer",):
+    cursor.execute("ALTER TABLE candidates ALTER COLUMN score TYPE REAL")
+
+# Pre-rendered JSON of each user's matches (day1/day2 + all rounds), rebuilt by /createMatches
+cursor.execute("""
+               CREATE TABLE IF NOT EXISTS match_views
+               (
+                   user_id
+                   TEXT
+                   PRIMARY
+                   KEY,
+                   body
+                   TEXT,
+                   etag
+                   TEXT
+               )
+               """)
+
+# Seek indexes of the admin listings (listings.py): level / class filters then id order
+cursor.execute("""
+               CREATE INDEX IF NOT EXISTS users_level_id_idx
+                   ON users (split_part(btrim(currentClass), ' ', 1), id)
+               """)
+cursor.execute("""
+               CREATE INDEX IF NOT EXISTS users_class_id_idx
+                   ON users (currentClass, id)
+               """)
+
 db.commit()
+# From here the shared connection only reads (/login, read_query fallback, filter and
+# index rebuilds): no idle transaction left open to hold locks other sessions wait on
+db.autocommit = True
+
+# Secret used to sign session tokens. Must be shared by all workers, otherwise a
+# token issued by one worker is rejected by the others.
+SESSION_SECRET = os.getenv("SESSION_SECRET", "").encode()
+if not SESSION_SECRET:
+    logging.warning("SESSION_SECRET non défini : secret aléatoire, les sessions ne survivront pas au redémarrage")
+    SESSION_SECRET = secrets.token_bytes(32)
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(3 * 24 * 3600)))
+
+# Optional per-question weights / partial credit for matching (see scoring.load_scoring_config).
+# Unset: plain count of identical answers with the bit-parallel kernel.
+SCORING_CONFIG = load_scoring_config(os.getenv("SCORING_CONFIG"))
+scoring_weights = compile_scoring(SCORING_CONFIG) if SCORING_CONFIG is not None else None
+
+# Number of match rounds computed by /createMatches when the request does not say
+MATCH_ROUNDS = int(os.getenv("MATCH_ROUNDS", "2"))
+
+# pg_advisory_xact_lock key serializing /createMatches runs across workers
+MATCHES_LOCK_KEY = 0x5356434D
+
+# Candidate generation of /createMatches: "exact" scores every pair of a level into
+# an n x n matrix; "blocked" scores blocks of SCORE_BLOCK_CELLS scores and keeps the
+# MATCH_GRAPH_K best partners of every user (exact, O(n * k) memory); "lsh" only
+# scores pairs sharing a bucket (see lsh.py) for levels above LSH_MIN_LEVEL users.
+# More tables / a smaller band raise recall at the cost of more scored pairs.
+MATCH_MODE = os.getenv("MATCH_MODE", "exact")
+MATCH_GRAPH_K = int(os.getenv("MATCH_GRAPH_K", "20"))
+SCORE_BLOCK_CELLS = int(os.getenv("SCORE_BLOCK_CELLS", "4000000"))
+LSH_MIN_LEVEL = int(os.getenv("LSH_MIN_LEVEL", "2000"))
+LSH_TABLES = int(os.getenv("LSH_TABLES", "8"))
+LSH_BAND = int(os.getenv("LSH_BAND", "5"))
+LSH_MAX_BUCKET = int(os.getenv("LSH_MAX_BUCKET", "256"))
+LSH_RECALL_SAMPLE = int(os.getenv("LSH_RECALL_SAMPLE", "200"))
+
+# Brute-force protection for /login: failed attempts per client IP over a sliding
+# window (run uvicorn with --proxy-headers behind a reverse proxy so the real IP is used)
+login_limiter = SlidingWindowLimiter(
+    limit=int(os.getenv("LOGIN_MAX_FAILURES", "20")),
+    window=float(os.getenv("LOGIN_FAILURE_WINDOW", "300")),
+    max_keys=int(os.getenv("LOGIN_LIMITER_MAX_CLIENTS", "10000")),
+)
+
+# Bloom filter over all issued codes: codes it rejects are answered with a 403
+# without any query. It is stamped with the code_version it was built at and
+# only used while that is still the current version, so a code issued since (by
+# another worker or GeneratePasswords.py) is looked up instead of rejected.
+# The current version is kept in memory by a thread listening on the
+# code_version channel (re-read at least every LOGIN_VERSION_POLL seconds);
+# another thread rebuilds the filter after each change, checking at least every
+# LOGIN_BLOOM_REFRESH seconds.
+LOGIN_BLOOM_ENABLED = os.getenv("LOGIN_BLOOM", "1") != "0"
+LOGIN_BLOOM_FP_RATE = float(os.getenv("LOGIN_BLOOM_FP_RATE", "0.01"))
+LOGIN_BLOOM_BITS = int(os.getenv("LOGIN_BLOOM_BITS", "0")) or None
+LOGIN_BLOOM_REFRESH = float(os.getenv("LOGIN_BLOOM_REFRESH", "60"))
+LOGIN_VERSION_POLL = float(os.getenv("LOGIN_VERSION_POLL", "5"))
+login_filter = None
+login_filter_version = None
+# Last code_version seen by code_version_loop(); None while it is not listening
+login_codes_version = None
+login_filter_lock = threading.Lock()
+login_refresh_wanted = threading.Event()
+login_refresh_stop = threading.Event()
+
+# Read-only code -> profile index mmap-ed by every worker (see login_index.py),
+# stamped with code_version: it is only trusted at the in-memory current version
+# (login_codes_version) and is rewritten by the same background thread as the
+# Bloom filter. Set
+# LOGIN_INDEX_PATH to an empty string to disable.
+LOGIN_INDEX_PATH = os.getenv("LOGIN_INDEX_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "login_index.bin"))
+login_index = LoginIndex(LOGIN_INDEX_PATH) if LOGIN_INDEX_PATH else None
+
+# Rows per chunk when an import is parsed over several processes (workers > 1)
+IMPORT_CHUNK_ROWS = int(os.getenv("IMPORT_CHUNK_ROWS", "2000"))
+
+# Rows fetched per round trip by the server-side cursor behind GET /export
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "1000"))
+
+# Per-process cache of the candidate lists served by GET /candidates/{user_id}
+candidates_cache = TTLCache(ttl=float(os.getenv("CANDIDATES_CACHE_TTL", "60")))
+
+# Per-process cache of match_views rows (user_id -> (body, etag)) served by GET /matches/{user_id}
+match_views_cache = TTLCache(
+    ttl=float(os.getenv("MATCHES_CACHE_TTL", "300")),
+    maxsize=int(os.getenv("MATCHES_CACHE_SIZE", "50000")),
+)
+
+# Both caches are cleared when match_version changed, checked at most every MATCHES_VERSION_CHECK seconds
+match_version = VersionCheck(
+    lambda: read_query(lambda conn: conn.execute("SELECT version FROM match_version WHERE id = 1").fetchone()[0]),
+    [candidates_cache, match_views_cache],
+    interval=float(os.getenv("MATCHES_VERSION_CHECK", "2")),
+)
 
 
 # Add shutdown event to close database connection
@@ -160,9 +526,28 @@ def shutdown_event():
     try:
         if db is not None:
             db.close()
+            db_connections_open.dec()
     except Exception as e:
         logging.error(f"Error closing database connection: {e}")
 
+    try:
+        replicas.close_all()
+    except Exception as e:
+        logging.error(f"Error closing replica connections: {e}")
+
+    login_refresh_stop.set()
+    login_refresh_wanted.set()
+
+
+@app.on_event("startup")
+def startup_event():
+    """Start the threads keeping the login filter and index in line with code_version."""
+    # First check right away (rewrites an index left by an older DB), then after every code change
+    login_refresh_wanted.set()
+    threading.Thread(target=login_refresh_loop, name="login-refresh", daemon=True).start()
+    if LOGIN_BLOOM_ENABLED or login_index is not None:
+        threading.Thread(target=code_version_loop, name="code-version", daemon=True).start()
+
 
 # --------------------
 # MODELS
@@ -189,357 +574,136 @@ class Person(BaseModel):
 # UTILS
 # --------------------
 
-def score(a: dict, b: dict) -> int:
-    s = 0
-    for k in a:
-        if k in b and a[k] == b[k]:
-            s += 1
-    return s
-
-
-# Answer mapping: Maps question text answers to integer values (1-4)
-ANSWER_MAPPINGS = {
-    "Quel est ton style de musique préféré ?": {
-        "Rap": 1,
-        "Pop": 2,
-        "Rock": 3,
-        "Autre": 4,
-    },
-    "Quel est pour toi le voyage idéal ?": {
-        "Voyage en famille": 1,
-        "Voyage entre amis": 2,
-        "Voyage en couple": 3,
-        "Voyage solo": 4,
-    },
-    "Quelle est ta destination de rêve ?": {
-        "Londres": 1,
-        "Séoul": 2,
-        "Marrakech": 3,
-        "Rio de Janeiro": 4,
-    },
-    "Quel est ton genre de film/série préféré ?": {
-        "Science-Fiction": 1,
-        "Drame": 2,
-        "Comédie": 3,
-        "Action": 4,
-    },
-    "Tu passes le plus de temps sur :": {
-        "Instagram": 1,
-        "Snapchat": 2,
-        "TikTok": 3,
-        "Je ne suis pas vraiment sur les réseaux": 4,
-    },
-    "A l'école tu préfères :": {
-        "Histoire-Géographie": 1,
-        "Anglais": 2,
-        "Sport": 3,
-        "Français/Philosophie": 4,
-    },
-    "Au petit-déjeuner c'est plutôt :": {
-        "Café/Thé": 1,
-        "Jus de fruit": 2,
-        "Eau": 3,
-        "Soda": 4,
-    },
-    "Au petit-déjeuner c'est plutôt :\xa0": {  # With non-breaking space
-        "Café/Thé": 1,
-        "Jus de fruit": 2,
-        "Eau": 3,
-        "Soda": 4,
-    },
-    "A Passy, le midi tu préfères être :": {
-        "Dehors": 1,
-        "Dans l'atrium": 2,
-        "Dans la cour": 3,
-        "En salle Verte/Bleue": 4,
-    },
-    "Avec 1.000.000 d'euros tu ferais plutôt :": {
-        "Un don à un association": 1,
-        "L'achat d'une maison dans le Sud": 2,
-        "Un investissement boursier": 3,
-        "Du shopping sur les Champs": 4,
-    },
-    "Comme super pouvoir, tu préfèrerais pouvoir :": {
-        "Voler": 1,
-        "Etre invisible": 2,
-        "Lire dans les pensée": 3,
-        "Remonter le temps": 4,
-    },
-    "Quelle est ta saison préférée :": {
-        "Été": 1,
-        "Automne": 2,
-        "Hiver": 3,
-        "Printemps": 4,
-    },
-    "Tu préfères lire :": {
-        "Des romans": 1,
-        "Des BD/mangas": 2,
-        "Les journaux": 3,
-        "Lire ?": 4,
-    },
-    "Tu préfères pratiquer quel sport :": {
-        "Sport de raquette": 1,
-        "Sport collectif": 2,
-        "Sport de performance (athlétisme, natation...)": 3,
-        "Sport de combat": 4,
-    },
-    "Tu préfères pratiquer quel sport :\xa0": {  # With non-breaking space
-        "Sport de raquette": 1,
-        "Sport collectif": 2,
-        "Sport de performance (athlétisme, natation...)": 3,
-        "Sport de combat": 4,
-    },
-    "Quelle est ta soirée idéale ?": {
-        "Soirée cinéma": 1,
-        "Soirée entre amis": 2,
-        "Soirée dodo": 3,
-        "Soirée gaming": 4,
-    },
-    "Si tu pouvais dîner avec une personne historique ce serait :": {
-        "Michael Jackson": 1,
-        "Jules César": 2,
-        "Pelé": 3,
-        "Pythagore (même si t'as oublié son théorème)": 4,
-    },
-}
-
-# Map question text to column names
-QUESTION_TO_COLUMN = {
-    "Quel est ton style de musique préféré ?": "q3",
-    "Quel est pour toi le voyage idéal ?": "q4",
-    "Quelle est ta destination de rêve ?": "q5",
-    "Quel est ton genre de film/série préféré ?": "q6",
-    "Tu passes le plus de temps sur :": "q7",
-    "A l'école tu préfères :": "q8",
-    "Au petit-déjeuner c'est plutôt :": "q9",
-    "Au petit-déjeuner c'est plutôt :\xa0": "q9",  # With non-breaking space
-    "A Passy, le midi tu préfères être :": "q10",
-    "Avec 1.000.000 d'euros tu ferais plutôt :": "q11",
-    "Comme super pouvoir, tu préfèrerais pouvoir :": "q12",
-    "Quelle est ta saison préférée :": "q13",
-    "Tu préfères lire :": "q14",
-    "Tu préfères pratiquer quel sport :": "q15",
-    "Tu préfères pratiquer quel sport :\xa0": "q15",  # With non-breaking space
-    "Quelle est ta soirée idéale ?": "q16",
-    "Si tu pouvais dîner avec une personne historique ce serait :": "q17",
-}
-
-
-def parse_answer(question: str, answer: str) -> int | None:
-    """Parse a text answer and convert it to integer (1-4).
-
-    Args:
-        question: The question text
-        answer: The answer text
-
-    Returns:
-        Integer value (1-4) or None if answer cannot be mapped
-    """
-    if not answer or pd.isna(answer):
-        return None
-
-    # Clean up the answer (remove extra spaces, normalize)
-    answer = str(answer).strip()
-
-    # Normalize the question (remove non-breaking spaces, extra spaces)
-    question_normalized = question.replace('\xa0', ' ').replace('  ', ' ').strip()
-
-    # Try to find the mapping for this question (try variations)
-    mapping = None
-    for q_key in ANSWER_MAPPINGS.keys():
-        q_key_normalized = q_key.replace('\xa0', ' ').replace('  ', ' ').strip()
-        if q_key_normalized == question_normalized or q_key == question:
-            mapping = ANSWER_MAPPINGS[q_key]
-            break
-
-    if mapping is None:
-        return None
-
-    # Try exact match first
-    if answer in mapping:
-        return mapping[answer]
-
-    # Try case-insensitive match
-    for key, value in mapping.items():
-        if key.lower() == answer.lower():
-            return value
-
-    # Try partial match (for typos or extra spaces)
-    for key, value in mapping.items():
-        if key.lower() in answer.lower() or answer.lower() in key.lower():
-            return value
-
-    logging.warning(f"Could not map answer '{answer}' for question '{question}'")
-    return None
+def current_session(authorization: str | None = Header(None)) -> dict:
+    """Verify the ``Authorization: Bearer <token>`` header issued by /login.
 
+    Purely in memory (HMAC check), no DB query.
+    """
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(401, "Session manquante")
+    try:
+        return verify_token(SESSION_SECRET, authorization.removeprefix("Bearer ").strip())
+    except InvalidToken:
+        raise HTTPException(401, "Session invalide ou expirée")
 
-def parse_name(full_name: str) -> dict:
-    if not full_name or pd.isna(full_name):
-        return {"first_name": "", "last_name": ""}
 
-    parts = full_name.strip().split()
+def require_admin(token: str | None, client_ip: str, action: str):
+    """Raise unless ``token`` matches ADMIN_TOKEN (constant-time comparison)."""
+    expected_token = os.getenv("ADMIN_TOKEN")
 
-    # Trouver où commence le nom (les parties en MAJUSCULES)
-    last_name_parts = []
-    first_name_parts = []
+    if not expected_token:
+        raise HTTPException(500, "Configuration serveur manquante")
 
-    # On parcourt depuis la fin pour catcher le nom en majuscules
-    i = len(parts) - 1
-    while i >= 0 and parts[i].isupper():
-        last_name_parts.insert(0, parts[i])
-        i -= 1
+    # Comparaison sécurisée contre timing attacks
+    if not token or not secrets.compare_digest(token, expected_token):
+        logging.warning(f"Tentative de {action} avec mauvais token depuis {client_ip}")
+        raise HTTPException(401, "Non autorisé")
 
-    # Le reste c'est le prénom
-    first_name_parts = parts[: i + 1]
 
-    first_name = " ".join(first_name_parts).strip()
-    # Capitaliser proprement le nom
-    last_name = " ".join(p.capitalize() for p in last_name_parts).strip()
+UPSERT_USER_SQL = (
+    f"INSERT INTO users (id, first_name, last_name, email, currentClass, {', '.join(ANSWER_COLUMNS)}, "
+    f"answers_packed, source_hash) VALUES ({', '.join(['%s'] * (len(ANSWER_COLUMNS) + 7))}) "
+    "ON CONFLICT (id) DO UPDATE SET "
+    + ", ".join(f"{col} = EXCLUDED.{col}" for col in
+                ["first_name", "last_name", "email", "currentClass", *ANSWER_COLUMNS, "answers_packed", "source_hash"])
+)
 
-    # Si on a rien trouvé en majuscules, on fait un split simple (moitié/moitié)
-    if not last_name and len(parts) >= 2:
-        first_name = parts[0]
-        last_name = " ".join(parts[1:]).capitalize()
-    elif not first_name and last_name:
-        # Tout était en majuscules, on garde juste le dernier comme nom
-        first_name = " ".join(last_name_parts[:-1])
-        last_name = last_name_parts[-1].capitalize() if last_name_parts else ""
 
-    return {"first_name": first_name, "last_name": last_name}
+def user_row_params(record: dict) -> tuple:
+    answers = record["answers"]
+    return (record["id"], record["first_name"], record["last_name"], record["email"], record["currentClass"],
+            *(answers.get(col) for col in ANSWER_COLUMNS), pack_answers(answers), record["source_hash"])
 
 
-def import_xlsx_df(df_raw: pd.DataFrame, passwd_len: int = 8) -> dict:
-    """Import a DataFrame (read from XLSX) directly into the PostgreSQL DB.
+def import_xlsx_df(df_raw: pd.DataFrame, passwd_len: int = 8, timer: StageTimer | None = None,
+                   incremental: bool = False, workers: int = 1) -> dict:
+    """Import a DataFrame (read from the survey export) directly into the PostgreSQL DB.
 
-    - df_raw: raw DataFrame loaded from the original XLSX (keeps the "Nom" column if present)
+    - df_raw: raw DataFrame loaded from the original export (keeps the "Nom" column if present)
     - passwd_len: length of generated passwords
-
-    Returns: dict with keys {imported, password_length}
+    - timer: StageTimer collecting per-stage wall time (a new one is created if omitted)
+    - incremental: keep existing users and codes, only write new or changed rows
+      (users missing from the export are kept) and only generate codes for new users
+    - workers: parse the rows in chunks over this many processes (1 = in this process)
+
+    The rows are written in a single transaction on a dedicated connection,
+    after taking an advisory lock, so concurrent imports run one after the
+    other and readers see either the previous or the new data set, never a
+    partial or empty one.
+
+    Returns: dict with keys {imported, new, updated, unchanged, skipped, codes_generated,
+    password_length, incremental, diagnostics, login_filter, login_index, stats}
+    (``diagnostics``: unmapped answers and skipped rows, see survey.ParseDiagnostics)
     """
-    # Work on a copy and drop unwanted columns (same logic as before)
-    df = df_raw.copy()
-
-    drop_exact = [
-        "Heure de début",
-        "Heure de fin",
-        "Heure de la dernière modification",
-        "Total points",
-        "Quiz feedback",
-        "Nom",
-    ]
-    drop_pattern = df.columns[
-        df.columns.str.startswith("Points - ")
-        | df.columns.str.startswith("Feedback - ")
-        ].tolist()
-    all_to_drop = drop_exact + drop_pattern
-    df = df.drop(columns=[c for c in all_to_drop if c in df.columns])
-
-    # Clear existing tables
-    cursor.execute("DELETE FROM passwords")
-    cursor.execute("DELETE FROM users")
-    db.commit()
-
-    inserted = 0
-
-    for idx, row in df.iterrows():
-        try:
-            raw_name = df_raw.at[idx, "Name"] if "Name" in df_raw.columns else None
-            name = parse_name(raw_name)
-
-            user_id = int(row["ID"]) if pd.notna(row.get("ID")) else None
-            first_name = name.get("first_name")
-            last_name = name.get("last_name")
-            email = row.get("Email")
-
-            # Build answers dict from remaining columns
-            skip_cols = ["ID", "Adresse de messagerie"]
-            answers = {}
-            for col in df.columns:
-                if col not in skip_cols:
-                    value = row[col]
-                    clean_col = str(col).replace("\xa0", " ").strip()
-                    answers[clean_col] = str(value) if pd.notna(value) else None
-
-            # Try to construct currentClass from answers if possible
-            unit = answers.get("Dans quel unité es-tu ?") or answers.get("Dans quelle unité es-tu ?") or ""
-            classe = answers.get("Dans quelle classe es-tu ?") or answers.get("Dans quelle classe es-tu ?") or ""
-            currentClass = f"{unit} {classe}".strip()
-
-            # Parse answers for questions 3-17 and convert to integers
-            parsed_answers = {}
-            for question_text, column_name in QUESTION_TO_COLUMN.items():
-                # Try to find the question in the answers dict (with possible variations)
-                answer_text = answers.get(question_text)
-                if answer_text is None:
-                    # Try variations with spaces/special chars
-                    for key in answers.keys():
-                        if key and question_text.replace(" ", "").lower() == key.replace(" ", "").lower():
-                            answer_text = answers[key]
-                            break
-
-                # Convert text answer to integer
-                if answer_text:
-                    parsed_value = parse_answer(question_text, answer_text)
-                    if parsed_value is not None:
-                        parsed_answers[column_name] = parsed_value
-                    else:
-                        logging.warning(
-                            f"Could not parse answer for user {user_id}, question: {question_text}, answer: {answer_text}")
-
-            # Insert or update user with basic info
-            cursor.execute(
-                """INSERT INTO users (id, first_name, last_name, email, currentClass)
-                   VALUES (%s, %s, %s, %s, %s) ON CONFLICT (id) DO
-                UPDATE SET
-                    first_name = EXCLUDED.first_name,
-                    last_name = EXCLUDED.last_name,
-                    email = EXCLUDED.email,
-                    currentClass = EXCLUDED.currentClass""",
-                (str(user_id), first_name, last_name, email, currentClass)
-            )
-
-            # Update user with parsed answers if we have any
-            if parsed_answers:
-                # Build dynamic UPDATE query for available answers
-                set_clauses = []
-                values = []
-                for col, val in parsed_answers.items():
-                    set_clauses.append(f"{col} = %s")
-                    values.append(val)
-
-                if set_clauses:
-                    values.append(str(user_id))
-                    update_query = f"UPDATE users SET {', '.join(set_clauses)} WHERE id = %s"
-                    cursor.execute(update_query, values)
-
-            # generate and insert a unique password
-            try_count = 0
-            while try_count < 5:
-                code = generate_unique_password(passwd_len, cursor)
-                try:
-                    cursor.execute(
-                        """INSERT INTO passwords (password, user_id)
-                           VALUES (%s, %s) ON CONFLICT (password) DO NOTHING""",
-                        (code, user_id)
-                    )
-                    # Check if the insert was successful
-                    if cursor.rowcount > 0:
-                        break
-                    # If rowcount is 0, there was a conflict, try again
-                except psycopg.IntegrityError:
-                    try_count += 1
-                    continue
-            else:
-                logging.warning(f"Failed to generate unique password for user {user_id}")
-                continue
-
-            inserted += 1
-        except Exception as e:
-            logging.exception(f"Skipping row {idx} due to error: {e}")
-            continue
-
-    db.commit()
-    return {"imported": inserted, "password_length": passwd_len}
+    timer = timer or StageTimer()
+    # More processes than cores only adds spawn overhead
+    workers = min(workers, os.cpu_count() or 1)
+    parsed = parse_survey_frame(df_raw, workers, IMPORT_CHUNK_ROWS, timer)
+    diagnostics = parsed["diagnostics"]
+    for column, count in diagnostics.by_column().items():
+        import_parse_failures.inc(count, column=column)
+    skipped = len(parsed["errors"])
+    import_rows.inc(skipped, status="failed")
+    report = diagnostics.summary()
+    # One line for the whole import instead of one per unmapped cell / skipped row
+    if skipped or diagnostics.unmapped:
+        logging.warning(f"Import : {report['unmapped_answers']} réponses non reconnues, {skipped} lignes ignorées "
+                        f"{json.dumps(report, ensure_ascii=False)}")
+
+    # When an ID appears twice the last row wins
+    records = {record["id"]: record for record in parsed["records"]}
+
+    # Staged in one transaction on a dedicated connection: /login keeps reading
+    # the previous data set until the commit publishes the new one at once
+    conn = get_db_connection()
+    try:
+        import_cursor = conn.cursor()
+        # Imports from any worker wait for each other
+        import_cursor.execute("SELECT pg_advisory_xact_lock(%s)", (IMPORT_LOCK_KEY,))
+        timer.lap("import_lock")
+
+        if incremental:
+            existing_hashes = dict(import_cursor.execute("SELECT id, source_hash FROM users").fetchall())
+            issued = import_cursor.execute("SELECT password, user_id FROM passwords").fetchall()
+            timer.lap("load_existing")
+        else:
+            # Not visible to other connections before the commit
+            import_cursor.execute("DELETE FROM passwords")
+            import_cursor.execute("DELETE FROM users")
+            existing_hashes, issued = {}, []
+            timer.lap("clear_tables")
+
+        # New or changed users, and codes for the users without one (codes.py)
+        plan = plan_import(records, existing_hashes, issued, passwd_len)
+        changed, codes = plan["changed"], plan["codes"]
+        timer.lap("diff", rows=len(records))
+
+        if changed:
+            import_cursor.executemany(UPSERT_USER_SQL, [user_row_params(r) for r in changed])
+        timer.lap("write_users", rows=len(changed))
+
+        if codes:
+            import_cursor.executemany("INSERT INTO passwords (password, user_id) VALUES (%s, %s)", codes)
+        timer.lap("write_passwords", rows=len(codes))
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        db_connections_open.dec()
+    import_rows.inc(len(changed), status="imported")
+    import_rows.inc(plan["unchanged"], status="unchanged")
+    timer.lap("commit")
+    filter_stats = rebuild_login_filter()
+    timer.lap("login_filter")
+    index_stats = write_login_index()
+    timer.lap("login_index")
+    return {"imported": len(changed), "new": plan["new"], "updated": len(changed) - plan["new"],
+            "unchanged": plan["unchanged"], "skipped": skipped, "codes_generated": len(codes),
+            "password_length": passwd_len, "incremental": incremental, "diagnostics": report,
+            "login_filter": filter_stats, "login_index": index_stats, "stats": timer.report()}
 
 
 @app.post("/import-xlsx")
@@ -547,42 +711,103 @@ async def import_xlsx(
         request: Request,
         file: UploadFile,
         passwd_len: int = 8,
+        profile: bool = False,
+        incremental: bool = False,
+        workers: int = 1,
         token: str = Form(...)
 ):
-    expected_token = os.getenv("ADMIN_TOKEN")
-    client_ip = request.client.host
+    """Import the survey export (XLSX, CSV, NDJSON or Parquet, detected from the content).
 
-    if not expected_token:
-        raise HTTPException(500, "Configuration serveur manquante")
+    ``profile=true`` adds a cProfile report to the response.
 
-    # Comparaison sécurisée contre timing attacks
-    if not secrets.compare_digest(token, expected_token):
-        logging.warning(f"Tentative d'import avec mauvais token depuis {client_ip}")
-        raise HTTPException(401, "Non autorisé")
+    ``incremental=true`` keeps existing users and their codes and only writes
+    rows that are new or changed since the previous import. ``workers=N``
+    parses large exports over N processes.
+    """
+    client_ip = request.client.host
+    require_admin(token, client_ip, "import")
 
     # Import autorisé
-    try:
-        contents = await file.read()
-        df_raw = pd.read_excel(BytesIO(contents), dtype=object)
-    except Exception as e:
-        raise HTTPException(400, f"Erreur lecture XLSX: {e}")
-    logging.info(f"Import autorisé depuis {client_ip}")
-    result = import_xlsx_df(df_raw, passwd_len)
-    return result
+    timer = StageTimer()
+    contents = await file.read()
+
+    def run_import() -> dict:
+        profiler = start_profiler() if profile else None
+        try:
+            fmt = detect_format(contents)
+            try:
+                df_raw, fmt = read_survey_file(contents, fmt)
+            except Exception as e:
+                raise HTTPException(400, f"Erreur lecture {fmt.upper()}: {e}")
+            timer.lap(f"read_{fmt}", rows=len(df_raw))
+            logging.info(f"Import autorisé depuis {client_ip}")
+            result = import_xlsx_df(df_raw, passwd_len, timer, incremental, workers)
+            if profiler is not None:
+                result["profile"] = profiler_report(profiler)
+            return result
+        finally:
+            if profiler is not None:
+                profiler.disable()
+
+    # Parsing and writing run in the threadpool so the event loop keeps serving /login
+    return await run_in_threadpool(run_import)
 
 
 @app.post("/login")
-def check_code(password: str = Form(...)):
-    row = cursor.execute(
+def check_code(request: Request, password: str = Form(...)):
+    client_ip = request.client.host
+
+    # Reject clients with too many recent failures before touching the DB
+    retry_after = login_limiter.retry_after(client_ip)
+    if retry_after > 0:
+        login_attempts.inc(outcome="rate_limited")
+        raise HTTPException(429, "Trop de tentatives, réessaie plus tard",
+                            headers={"Retry-After": str(int(retry_after) + 1)})
+
+    # Definitely-invalid codes are not looked up, provided no code was issued since the filter was built
+    version = login_codes_version
+    if login_filter is not None and password not in login_filter and version is not None \
+            and version == login_filter_version:
+        login_limiter.record(client_ip)
+        login_attempts.inc(outcome="filtered")
+        raise HTTPException(403, "Code invalide")
+
+    # Shared mmap index resolves the code without a lookup, unless codes or users changed since it was
+    # written (a deleted code must not log in); fall back to Postgres on a miss
+    profile, stamp = login_index.find(password) if login_index is not None else (None, None)
+    if profile is not None and (version is None or stamp != version):
+        profile = None
+    if profile is None:
+        profile = read_query(lambda conn: lookup_code(password, conn))
+        if profile is None and replicas:
+            # Codes issued since the replica's last replay are only on the primary
+            profile = lookup_code(password, db)
+
+    if profile is None:
+        login_limiter.record(client_ip)
+        login_attempts.inc(outcome="invalid")
+        raise HTTPException(403, "Code invalide")
+
+    login_attempts.inc(outcome="ok")
+    if "id" in profile:
+        token = issue_token(SESSION_SECRET, profile["id"], level_of(profile["currentClass"]), SESSION_TTL)
+    else:
+        token = issue_token(SESSION_SECRET, str(profile["user_id"]), "", SESSION_TTL)
+    return {**profile, "token": token}
+
+
+def lookup_code(password: str, conn) -> dict | None:
+    """Profile of the user owning ``password`` read on ``conn``, or None if the code does not exist."""
+    row = conn.execute(
         "SELECT * FROM passwords WHERE password = %s",
         (password,)
     ).fetchone()
 
     if not row:
-        raise HTTPException(403, "Code invalide")
+        return None
 
     user_id = row[1]
-    user_row = cursor.execute(
+    user_row = conn.execute(
         "SELECT id, first_name, last_name, email, currentClass FROM users WHERE id = %s",
         (str(user_id),),
     ).fetchone()
@@ -599,311 +824,472 @@ def check_code(password: str = Form(...)):
     return {"user_id": user_id}
 
 
-def generate_unique_password(length: int, cursor) -> str:
-    chars = string.ascii_lowercase + string.digits
-    for _ in range(10000):
-        code = ''.join(secrets.choice(chars) for _ in range(length))
-        if cursor.execute("SELECT 1 FROM passwords WHERE password = %s", (code,)).fetchone():
+@app.get("/login-stats")
+def login_stats(request: Request, x_admin_token: str | None = Header(None)):
+    """Counters of /login outcomes since the worker started."""
+    require_admin(x_admin_token, request.client.host, "lecture des stats de login")
+    return {
+        "ok": login_attempts.value(outcome="ok"),
+        "invalid": login_attempts.value(outcome="invalid"),
+        "filtered": login_attempts.value(outcome="filtered"),
+        "rate_limited": login_attempts.value(outcome="rate_limited"),
+        "limiter": login_limiter.stats(),
+        "filter": {**login_filter.stats(), "version": login_filter_version} if login_filter is not None else None,
+        "codes_version": login_codes_version,
+        "index": login_index.stats() if login_index is not None else None,
+        "replicas": replicas.stats(),
+    }
+
+
+def codes_version(conn=None) -> int:
+    """Current code_version, read on the primary (replicas may lag behind the change)."""
+    return (conn or db).execute("SELECT version FROM code_version WHERE id = 1").fetchone()[0]
+
+
+def code_version_loop():
+    """Background thread keeping ``login_codes_version`` in line with code_version (LISTEN, plus a poll)."""
+    global login_codes_version
+    while not login_refresh_stop.is_set():
+        conn = None
+        try:
+            conn = get_db_connection(autocommit=True)
+            conn.execute("LISTEN code_version")
+            while not login_refresh_stop.is_set():
+                # Read after LISTEN: a bump committed in between is still notified
+                version = codes_version(conn)
+                if version != login_codes_version:
+                    login_codes_version = version
+                    login_refresh_wanted.set()
+                for _ in conn.notifies(timeout=LOGIN_VERSION_POLL, stop_after=1):
+                    pass
+        except Exception as e:
+            logging.error(f"Error listening to code_version: {e}")
+        finally:
+            # Unknown version: the filter and index are not trusted until listening again
+            login_codes_version = None
+            if conn is not None:
+                conn.close()
+                db_connections_open.dec()
+        login_refresh_stop.wait(LOGIN_VERSION_POLL)
+
+
+def rebuild_login_filter(conn=None) -> dict | None:
+    """Rebuild the login Bloom filter from the passwords table and return its stats."""
+    global login_filter, login_filter_version
+    if not LOGIN_BLOOM_ENABLED:
+        return None
+    conn = conn or db
+    with login_filter_lock:
+        # Version first: codes issued meanwhile only make the filter look older than it is
+        version = codes_version(conn)
+        codes = [code for (code,) in conn.execute("SELECT password FROM passwords").fetchall()]
+        login_filter = BloomFilter.from_items(codes, LOGIN_BLOOM_FP_RATE, LOGIN_BLOOM_BITS)
+        login_filter_version = version
+    logging.info(f"Filtre de login reconstruit (version {version}): {login_filter.stats()}")
+    return login_filter.stats()
+
+
+def login_refresh_loop():
+    """Background thread rebuilding the login filter and index when code_version moved (never on the /login path)."""
+    while True:
+        login_refresh_wanted.wait(LOGIN_BLOOM_REFRESH)
+        login_refresh_wanted.clear()
+        if login_refresh_stop.is_set():
+            return
+        if not LOGIN_BLOOM_ENABLED and login_index is None:
             continue
-        return code
-    raise RuntimeError("Failed to generate a unique password after max attempts")
+        try:
+            conn = get_db_connection()
+            conn.autocommit = True
+            try:
+                version = codes_version(conn)
+                if LOGIN_BLOOM_ENABLED and version != login_filter_version:
+                    rebuild_login_filter(conn)
+                if login_index is not None and login_index.stamp() != version:
+                    write_login_index(conn)
+            finally:
+                conn.close()
+                db_connections_open.dec()
+        except Exception as e:
+            logging.error(f"Error refreshing login filter/index: {e}")
+
+
+def write_login_index(conn=None) -> dict | None:
+    """Write the shared login index from the passwords/users tables, stamped with code_version."""
+    if login_index is None:
+        return None
+    conn = conn or db
+    # Version first: changes made meanwhile only make the index look older than it is
+    version = codes_version(conn)
+    rows = conn.execute(
+        """SELECT p.password, p.user_id, u.id, u.first_name, u.last_name, u.email, u.currentClass
+           FROM passwords p
+                    LEFT JOIN users u ON u.id = p.user_id::TEXT"""
+    ).fetchall()
+    entries = (
+        (code, {"id": uid, "first_name": first_name, "last_name": last_name, "email": email,
+                "currentClass": current_class} if uid is not None else {"user_id": user_id})
+        for code, user_id, uid, first_name, last_name, email, current_class in rows
+    )
+    stats = write_index(LOGIN_INDEX_PATH, entries, version)
+    logging.info(f"Index de login écrit: {stats}")
+    return stats
 
 
 @app.post("/createMatches")
 def createMatches(
         request: Request,
-        token: str = Form(...)
+        token: str = Form(...),
+        top_k: int = Form(5),
+        rounds: int = Form(MATCH_ROUNDS),
+        mode: str = Form(MATCH_MODE),
+        profile: bool = Form(False)
 ):
-    """Create matches based on answer similarity within the same level."""
-    expected_token = os.getenv("ADMIN_TOKEN")
-    client_ip = request.client.host
+    """Create ``rounds`` rounds of matches based on answer similarity within the same level.
 
-    if not expected_token:
-        raise HTTPException(500, "Token expected")
+    Nobody meets the same partner twice across rounds (see matching.py).
+    Rounds are stored in ``match_rounds``; ``matches.day1``/``day2`` keep the
+    first two.
 
-        # Comparaison sécurisée contre timing attacks
-    if not secrets.compare_digest(token, expected_token):
-        logging.warning(f"Tentative de calcul des matchs avec mauvais token depuis {client_ip}")
-        raise HTTPException(401, "Non autorisé")
+    Also rebuilds the ``candidates`` index: the ``top_k`` most compatible
+    peers of every user, served by GET /candidates/{user_id}. The response
+    includes per-stage timings, plus a cProfile report when ``profile`` is set.
+
+    With ``mode=blocked``, matching runs on the exact top-MATCH_GRAPH_K
+    partners of every user instead of the full score matrix (same result as
+    ``exact`` when the level has at most MATCH_GRAPH_K + 1 users).
+    With ``mode=lsh``, levels above LSH_MIN_LEVEL users only score pairs found
+    by LSH bucketing (lsh.py); ``approximate`` reports, per level, the pairs
+    scored and the recall measured against exact scoring on a sample.
+
+    Runs from any worker are serialized by an advisory lock and written in a
+    single transaction, rolled back if anything fails.
+    """
+    client_ip = request.client.host
+    require_admin(token, client_ip, "calcul des matchs")
+    if rounds < 1:
+        raise HTTPException(400, "rounds doit être >= 1")
+    if mode not in ("exact", "blocked", "lsh"):
+        raise HTTPException(400, "mode doit être 'exact', 'blocked' ou 'lsh'")
+    timer = StageTimer()
+    profiler = start_profiler() if profile else None
+    # One transaction on a dedicated connection, like imports: readers keep the
+    # previous matches until the commit, and a failed run leaves the shared one clean
+    conn = get_db_connection()
     try:
-        # Fetch all users with their answers from the users table directly
-        cursor.execute("""
+        match_cursor = conn.cursor()
+        # Runs from any worker wait for each other (the tables are cleared then refilled)
+        match_cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MATCHES_LOCK_KEY,))
+        timer.lap("matches_lock")
+
+        # Fetch all users with their packed answers (one BIGINT instead of 15 columns)
+        match_cursor.execute("""
                        SELECT id,
-                              first_name,
-                              last_name,
                               currentClass,
-                              q3,
-                              q4,
-                              q5,
-                              q6,
-                              q7,
-                              q8,
-                              q9,
-                              q10,
-                              q11,
-                              q12,
-                              q13,
-                              q14,
-                              q15,
-                              q16,
-                              q17
+                              answers_packed
                        FROM users
                        WHERE q3 IS NOT NULL
                        """)
-        rows = cursor.fetchall()
+        rows = match_cursor.fetchall()
+        timer.lap("fetch_users", rows=len(rows))
 
         if not rows:
             raise HTTPException(400, "No users with answers found")
 
-        # Build a list of users with their data
-        users = []
-        for row in rows:
-            user_id = row[0]
-            first_name = row[1]
-            last_name = row[2]
-            current_class = row[3]
-            # Create answers dict from q3-q17 columns
-            answers = {
-                'q3': row[4], 'q4': row[5], 'q5': row[6], 'q6': row[7], 'q7': row[8],
-                'q8': row[9], 'q9': row[10], 'q10': row[11], 'q11': row[12], 'q12': row[13],
-                'q13': row[14], 'q14': row[15], 'q15': row[16], 'q16': row[17], 'q17': row[18]
-            }
-            # Extract level from currentClass (e.g., "Terminale F" -> "Terminale")
-            level = current_class.split()[0] if current_class and current_class.strip() else ""
-            users.append({
-                "id": user_id,
-                "first_name": first_name,
-                "last_name": last_name,
-                "level": level,
-                "answers": answers
-            })
-
-        # Group users by level
-        users_by_level = {}
-        for user in users:
-            level = user["level"]
-            if level not in users_by_level:
-                users_by_level[level] = []
-            users_by_level[level].append(user)
-
-        # Clear existing matches
-        cursor.execute("DELETE FROM matches")
-
-        # Create matches for each level
-        matches_created = 0
-        for level, level_users in users_by_level.items():
-            if not level_users:
-                continue
-
-            logging.info(f"Creating matches for level {level} with {len(level_users)} users")
-
-            # Calculate compatibility scores between all pairs
-            n = len(level_users)
-
-            # Special case: exactly 3 users
-            # For 3 users, we form a trio on both days but with different primary matches
-            if n == 3:
-                # For 3 users, arrange them in a circular pattern on each day
-                # Day 1: 0→1, 1→2, 2→0
-                # Day 2: 0→2, 2→1, 1→0 (reversed)
-                # This ensures each person has a different match on each day
-                day1_matches = {0: 1, 1: 2, 2: 0}
-                day2_matches = {0: 2, 2: 1, 1: 0}
-
-                logging.info(f"Special case - 3 users: circular matching day1=(0→1→2→0), day2=(0→2→1→0)")
-
-                # Insert matches into database
-                for idx, user in enumerate(level_users):
-                    day1_id = level_users[day1_matches[idx]]["id"]
-                    day2_id = level_users[day2_matches[idx]]["id"]
-
-                    cursor.execute(
-                        """INSERT INTO matches (id, day1, day2)
-                           VALUES (%s, %s, %s) ON CONFLICT (id) DO
-                           UPDATE
-                           SET day1 = EXCLUDED.day1, day2 = EXCLUDED.day2""",
-                        (user["id"], day1_id, day2_id)
-                    )
-                    matches_created += 1
-
-                continue  # Skip to next level
-
-            scores = {}
-            for i in range(n):
-                for j in range(i + 1, n):
-                    user_a = level_users[i]
-                    user_b = level_users[j]
-                    compatibility = score(user_a["answers"], user_b["answers"])
-                    scores[(i, j)] = compatibility
-
-            # Sort pairs by compatibility score (highest first)
-            sorted_pairs = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-
-            # Create matches ensuring each person gets 2 different matches
-            day1_matches = {}  # user_index -> matched_user_index
-            day2_matches = {}
-            day1_trio_members = set()  # Track who is in a trio on day 1
-
-            # For day 1: greedy matching
-            used = set()
-            for (i, j), score_val in sorted_pairs:
-                if i not in used and j not in used:
-                    day1_matches[i] = j
-                    day1_matches[j] = i
-                    used.add(i)
-                    used.add(j)
-
-            # Handle odd number: create a group of 3 for day 1
-            if len(used) < n:
-                unmatched = [idx for idx in range(n) if idx not in used]
-                if len(unmatched) == 1:
-                    # Find an existing pair and add this person to form a trio
-                    # The unmatched person will be matched with one person from a pair,
-                    # creating an indirect trio relationship
-                    if day1_matches:
-                        # Find the best match for the unmatched person among those already matched
-                        best_match_idx = None
-                        best_score = -1
-                        for idx in range(n):
-                            if idx in used:
-                                compatibility = score(level_users[unmatched[0]]["answers"], level_users[idx]["answers"])
-                                if compatibility > best_score:
-                                    best_score = compatibility
-                                    best_match_idx = idx
-
-                        if best_match_idx is not None:
-                            day1_matches[unmatched[0]] = best_match_idx
-                            used.add(unmatched[0])
-                            partner = day1_matches.get(best_match_idx, "unknown")
-                            # Mark all three people as being in a trio
-                            day1_trio_members.add(unmatched[0])
-                            day1_trio_members.add(best_match_idx)
-                            day1_trio_members.add(partner)
-                            logging.info(f"Formed trio on day 1: {unmatched[0]}, {best_match_idx}, {partner}")
-
-            # For day 2: match differently, being strategic about who might end up in trios
-            # If we had a trio on day 1 and will likely have one on day 2, try to ensure
-            # different people are in the day 2 trio
-            used2 = set()
-
-            # If there was a day 1 trio and we expect a day 2 trio (odd number of users)
-            # prioritize matching day 1 trio members first to avoid them being unmatched again
-            if day1_trio_members and n % 2 == 1:
-                # Sort pairs prioritizing matches involving day 1 trio members
-                pairs_with_trio = []
-                pairs_without_trio = []
-                for (i, j), score_val in sorted_pairs:
-                    if day1_matches.get(i) == j or day1_matches.get(j) == i:
-                        continue
-                    if i in day1_trio_members or j in day1_trio_members:
-                        pairs_with_trio.append(((i, j), score_val))
-                    else:
-                        pairs_without_trio.append(((i, j), score_val))
-
-                # Process trio members first
-                for (i, j), score_val in pairs_with_trio:
-                    if i not in used2 and j not in used2:
-                        day2_matches[i] = j
-                        day2_matches[j] = i
-                        used2.add(i)
-                        used2.add(j)
-
-                # Then process others
-                for (i, j), score_val in pairs_without_trio:
-                    if i not in used2 and j not in used2:
-                        day2_matches[i] = j
-                        day2_matches[j] = i
-                        used2.add(i)
-                        used2.add(j)
-            else:
-                # Normal matching for day 2
-                for (i, j), score_val in sorted_pairs:
-                    if day1_matches.get(i) == j or day1_matches.get(j) == i:
-                        continue
-                    if i not in used2 and j not in used2:
-                        day2_matches[i] = j
-                        day2_matches[j] = i
-                        used2.add(i)
-                        used2.add(j)
-
-            # Handle remaining unmatched for day 2
-            unmatched2 = [idx for idx in range(n) if idx not in used2]
-            if len(unmatched2) == 1:
-                # Add to an existing pair to form a trio
-                # IMPORTANT: Prefer matching with someone who was NOT in a trio on day 1
-                if day2_matches:
-                    # Find best match for unmatched person, avoiding day 1 trio members if possible
-                    best_match_idx = None
-                    best_score = -1
-                    best_non_trio_match_idx = None
-                    best_non_trio_score = -1
-
-                    for idx in range(n):
-                        if idx in used2:
-                            score_val = score(level_users[unmatched2[0]]["answers"], level_users[idx]["answers"])
-                            if score_val > best_score:
-                                best_score = score_val
-                                best_match_idx = idx
-                            # Track best match among non-trio members from day 1
-                            if idx not in day1_trio_members and score_val > best_non_trio_score:
-                                best_non_trio_score = score_val
-                                best_non_trio_match_idx = idx
-
-                    # If unmatched person was in day 1 trio, prioritize matching with non-trio member
-                    if unmatched2[0] in day1_trio_members and best_non_trio_match_idx is not None:
-                        day2_matches[unmatched2[0]] = best_non_trio_match_idx
-                        used2.add(unmatched2[0])
-                        partner = day2_matches.get(best_non_trio_match_idx, "unknown")
-                        logging.info(
-                            f"Formed trio on day 2: {unmatched2[0]} (was in day1 trio) matched with {best_non_trio_match_idx} (was NOT in day1 trio), who is matched with {partner}")
-                    elif best_match_idx is not None:
-                        day2_matches[unmatched2[0]] = best_match_idx
-                        used2.add(unmatched2[0])
-                        partner = day2_matches.get(best_match_idx, "unknown")
-                        logging.info(
-                            f"Formed trio on day 2: {unmatched2[0]} matched with {best_match_idx}, who is matched with {partner}")
-            elif len(unmatched2) == 2:
-                # Match the remaining two
-                day2_matches[unmatched2[0]] = unmatched2[1]
-                day2_matches[unmatched2[1]] = unmatched2[0]
-            elif len(unmatched2) == 3:
-                # Create matches for three people - each gets one match
-                # Form pairs with best compatibility among the three
-                scores_trio = [
-                    (0, 1, score(level_users[unmatched2[0]]["answers"], level_users[unmatched2[1]]["answers"])),
-                    (0, 2, score(level_users[unmatched2[0]]["answers"], level_users[unmatched2[2]]["answers"])),
-                    (1, 2, score(level_users[unmatched2[1]]["answers"], level_users[unmatched2[2]]["answers"]))
-                ]
-                scores_trio.sort(key=lambda x: x[2], reverse=True)
-                # Use the best pair and match third person with one of them
-                best_i, best_j, _ = scores_trio[0]
-                day2_matches[unmatched2[best_i]] = unmatched2[best_j]
-                day2_matches[unmatched2[best_j]] = unmatched2[best_i]
-                # Match third person with one from the pair
-                third = [x for x in [0, 1, 2] if x not in [best_i, best_j]][0]
-                day2_matches[unmatched2[third]] = unmatched2[best_i]
-
-            # Insert matches into database
-            for idx, user in enumerate(level_users):
-                day1_match_idx = day1_matches.get(idx)
-                day2_match_idx = day2_matches.get(idx)
-
-                day1_id = level_users[day1_match_idx]["id"] if day1_match_idx is not None else None
-                day2_id = level_users[day2_match_idx]["id"] if day2_match_idx is not None else None
-
-                cursor.execute(
-                    """INSERT INTO matches (id, day1, day2)
-                       VALUES (%s, %s, %s) ON CONFLICT (id) DO
-                       UPDATE
-                       SET day1 = EXCLUDED.day1, day2 = EXCLUDED.day2""",
-                    (user["id"], day1_id, day2_id)
-                )
-                matches_created += 1
-
-        db.commit()
-        logging.info(f"Created {matches_created} matches")
-        return {"created": matches_created}
+        # Scoring and rounds, level by level (matchengine.py)
+        engine = run_matching(
+            rows, rounds, top_k, mode, scoring_weights, timer, graph_k=MATCH_GRAPH_K, block_cells=SCORE_BLOCK_CELLS,
+            lsh_min_level=LSH_MIN_LEVEL, lsh_tables=LSH_TABLES, lsh_band=LSH_BAND, lsh_max_bucket=LSH_MAX_BUCKET,
+            lsh_recall_sample=LSH_RECALL_SAMPLE)
+        for level, size in engine["levels"].items():
+            logging.info(f"Created matches for level {level} with {size} users")
+        matches_created = len(engine["matches"])
+        candidates_created = len(engine["candidates"])
+        round_rows = engine["rounds"]
+        match_rows = engine["matches"]
+        approximate = engine["approximate"]
+
+        # Clear existing matches and candidate lists
+        match_cursor.execute("DELETE FROM matches")
+        match_cursor.execute("DELETE FROM match_rounds")
+        match_cursor.execute("DELETE FROM candidates")
+        timer.lap("clear_tables")
+
+        if engine["candidates"]:
+            match_cursor.executemany(
+                """INSERT INTO candidates (user_id, rank, candidate_id, score)
+                   VALUES (%s, %s, %s, %s)""",
+                engine["candidates"]
+            )
+        timer.lap("write_candidates", rows=candidates_created)
+
+        # day1/day2 keep the first two rounds for existing clients
+        match_cursor.executemany(
+            """INSERT INTO match_rounds (user_id, round, partner_id)
+               VALUES (%s, %s, %s)""",
+            round_rows
+        )
+        match_cursor.executemany(
+            """INSERT INTO matches (id, day1, day2)
+               VALUES (%s, %s, %s) ON CONFLICT (id) DO
+               UPDATE
+               SET day1 = EXCLUDED.day1, day2 = EXCLUDED.day2""",
+            match_rows
+        )
+        timer.lap("write_matches", rows=len(round_rows))
+
+        # Materialize the JSON served by GET /matches/{user_id}
+        match_cursor.execute("DELETE FROM match_views")
+        match_cursor.execute("""
+                       INSERT INTO match_views (user_id, body, etag)
+                       SELECT v.id, v.body, md5(v.body)
+                       FROM (SELECT m.id,
+                                    json_build_object(
+                                            'id', m.id,
+                                            'day1', CASE
+                                                        WHEN m.day1 IS NULL THEN NULL
+                                                        ELSE json_build_object('id', m.day1,
+                                                                               'first_name', d1.first_name,
+                                                                               'last_name', d1.last_name,
+                                                                               'currentClass', d1.currentClass) END,
+                                            'day2', CASE
+                                                        WHEN m.day2 IS NULL THEN NULL
+                                                        ELSE json_build_object('id', m.day2,
+                                                                               'first_name', d2.first_name,
+                                                                               'last_name', d2.last_name,
+                                                                               'currentClass', d2.currentClass) END,
+                                            'rounds', (SELECT json_agg(CASE
+                                                                           WHEN r.partner_id IS NULL THEN NULL
+                                                                           ELSE json_build_object('id', r.partner_id,
+                                                                                                  'first_name', p.first_name,
+                                                                                                  'last_name', p.last_name,
+                                                                                                  'currentClass', p.currentClass) END
+                                                                       ORDER BY r.round)
+                                                       FROM match_rounds r
+                                                                LEFT JOIN users p ON p.id = r.partner_id
+                                                       WHERE r.user_id = m.id)
+                                    )::TEXT AS body
+                             FROM matches m
+                                      LEFT JOIN users d1 ON d1.id = m.day1
+                                      LEFT JOIN users d2 ON d2.id = m.day2) v
+                       """)
+        timer.lap("match_views")
+        version = match_cursor.execute(
+            "UPDATE match_version SET version = version + 1 WHERE id = 1 RETURNING version").fetchone()[0]
+
+        conn.commit()
+        timer.lap("commit")
+        matches_created_total.inc(matches_created)
+        candidates_cache.clear()
+        match_views_cache.clear()
+        for view_user_id, body, etag in match_cursor.execute("SELECT user_id, body, etag FROM match_views").fetchall():
+            match_views_cache.set(view_user_id, (body, etag))
+        match_version.set(version)
+        timer.lap("cache_warmup")
+        logging.info(f"Created {rounds} rounds for {matches_created} users and {candidates_created} candidate entries")
+        result = {"created": matches_created, "rounds": rounds, "candidates": candidates_created,
+                  "scoring": "weighted" if scoring_weights is not None else "count", "mode": mode,
+                  "compatibility": engine["compatibility"], "stats": timer.report()}
+        if approximate:
+            result["approximate"] = approximate
+        if profiler is not None:
+            result["profile"] = profiler_report(profiler)
+        return result
 
     except Exception as e:
+        conn.rollback()
         logging.exception(f"Error creating matches: {e}")
         raise HTTPException(500, f"Error creating matches: {str(e)}")
+    finally:
+        conn.close()
+        db_connections_open.dec()
+        if profiler is not None:
+            profiler.disable()
+
+
+@app.get("/candidates/{user_id}")
+def get_candidates(
+        user_id: str,
+        request: Request,
+        response: Response,
+        x_admin_token: str | None = Header(None),
+        authorization: str | None = Header(None)
+):
+    """Ranked most compatible peers of a user, as computed by /createMatches.
+
+    Readable by admins (X-Admin-Token) or by the user themself (session token).
+    """
+    if x_admin_token or not authorization:
+        require_admin(x_admin_token, request.client.host, "lecture des candidats")
+    elif current_session(authorization)["uid"] != user_id:
+        raise HTTPException(403, "Accès refusé")
+
+    match_version.check()
+    candidates = candidates_cache.get(user_id)
+    if candidates is None:
+        rows = read_query(lambda conn: conn.execute(
+            """SELECT c.rank, c.candidate_id, u.first_name, u.last_name, c.score
+               FROM candidates c
+                        LEFT JOIN users u ON u.id = c.candidate_id
+               WHERE c.user_id = %s
+               ORDER BY c.rank""",
+            (user_id,)
+        ).fetchall())
+        candidates = [
+            {"rank": rank, "id": cid, "first_name": first_name, "last_name": last_name, "score": score_val}
+            for rank, cid, first_name, last_name, score_val in rows
+        ]
+        candidates_cache.set(user_id, candidates)
+
+    response.headers["Cache-Control"] = f"private, max-age={int(candidates_cache.ttl)}"
+    return {"user_id": user_id, "candidates": candidates}
+
+
+@app.get("/matches/{user_id}")
+def get_matches(
+        user_id: str,
+        session: dict = Depends(current_session),
+        if_none_match: str | None = Header(None)
+):
+    """Day-1/day-2 matches of a user, pre-rendered by /createMatches.
+
+    Requires the user's own session token. Served from the per-process cache
+    with a strong ETag: a client that already has the current version gets a
+    304 without any DB query other than the periodic match_version check.
+    """
+    if session["uid"] != user_id:
+        raise HTTPException(403, "Accès refusé")
+
+    match_version.check()
+    view = match_views_cache.get(user_id)
+    if view is None:
+        view = read_query(lambda conn: conn.execute(
+            "SELECT body, etag FROM match_views WHERE user_id = %s",
+            (user_id,)
+        ).fetchone())
+        if not view:
+            raise HTTPException(404, "Aucun match pour cet utilisateur")
+        view = (view[0], view[1])
+        match_views_cache.set(user_id, view)
+
+    body, etag = view
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+EXPORT_COLUMNS = [
+    "id", "first_name", "last_name", "email", "currentClass", "code",
+    "day1_id", "day1_first_name", "day1_last_name",
+    "day2_id", "day2_first_name", "day2_last_name",
+]
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def export_chunks(fmt: str):
+    """Yield the export in ``fmt`` batch by batch from a server-side cursor.
+
+    Runs on its own connection (to a replica when one is usable) so a long
+    export neither holds the shared cursor nor keeps more than
+    EXPORT_BATCH_ROWS rows in memory.
+    """
+    if fmt == "csv":
+        out = io.StringIO()
+        csv.writer(out).writerow(EXPORT_COLUMNS)
+        yield out.getvalue().encode("utf-8")
+
+    replica_dsn = replicas.dsn()
+    # No statement timeout here: the export is one long streaming query
+    conn = get_db_connection(replica_dsn, connect_timeout=REPLICA_CONNECT_TIMEOUT) if replica_dsn else get_db_connection()
+    db_reads.inc(target="replica" if replica_dsn else "primary")
+    try:
+        with conn.cursor(name="export") as export_cursor:
+            export_cursor.execute(
+                """SELECT u.id, u.first_name, u.last_name, u.email, u.currentClass, p.password,
+                          m.day1, d1.first_name, d1.last_name,
+                          m.day2, d2.first_name, d2.last_name
+                   FROM users u
+                            LEFT JOIN passwords p ON p.user_id::TEXT = u.id
+                            LEFT JOIN matches m ON m.id = u.id
+                            LEFT JOIN users d1 ON d1.id = m.day1
+                            LEFT JOIN users d2 ON d2.id = m.day2
+                   ORDER BY u.id"""
+            )
+            while rows := export_cursor.fetchmany(EXPORT_BATCH_ROWS):
+                out = io.StringIO()
+                if fmt == "csv":
+                    csv.writer(out).writerows(rows)
+                else:
+                    for row in rows:
+                        out.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n")
+                export_rows.inc(len(rows), format=fmt)
+                yield out.getvalue().encode("utf-8")
+    finally:
+        conn.close()
+        db_connections_open.dec()
+
+
+@app.get("/admin/users")
+def list_users(
+        request: Request,
+        after: str | None = None,
+        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+        level: str | None = None,
+        class_name: str | None = Query(None, alias="class"),
+        matched: bool | None = None,
+        x_admin_token: str | None = Header(None)
+):
+    """One page of users ordered by ID, with the number of answered questions and their matches.
+
+    Pass the returned ``next_after`` as ``after`` to read the next page.
+    """
+    require_admin(x_admin_token, request.client.host, "liste des utilisateurs")
+    query, params = users_page_query(limit, after, level, class_name, matched)
+    rows = read_query(lambda conn: conn.execute(query, params).fetchall())
+    return page(rows, limit, USER_COLUMNS)
+
+
+@app.get("/admin/matches")
+def list_matches(
+        request: Request,
+        after: str | None = None,
+        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+        level: str | None = None,
+        class_name: str | None = Query(None, alias="class"),
+        x_admin_token: str | None = Header(None)
+):
+    """One page of day-1/day-2 assignments ordered by user ID, with the partners' names."""
+    require_admin(x_admin_token, request.client.host, "liste des matchs")
+    query, params = matches_page_query(limit, after, level, class_name)
+    rows = read_query(lambda conn: conn.execute(query, params).fetchall())
+    return page(rows, limit, MATCH_COLUMNS)
+
+
+@app.get("/export")
+def export_data(
+        request: Request,
+        fmt: str = Query("csv", alias="format"),
+        x_admin_token: str | None = Header(None)
+):
+    """Stream users, access codes and day-1/day-2 matches (with names) as CSV or NDJSON."""
+    require_admin(x_admin_token, request.client.host, "export")
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(400, f"Format inconnu: {fmt} (csv ou ndjson)")
+
+    logging.info(f"Export {fmt} depuis {request.client.host}")
+    filename = f"saintvalentin-{datetime.date.today().isoformat()}.{fmt}"
+    return StreamingResponse(export_chunks(fmt), media_type=EXPORT_MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@app.get("/metrics")
+def get_metrics(authorization: str | None = Header(None)):
+    """Metrics of this worker in the Prometheus text exposition format.
+
+    Protected by METRICS_TOKEN (sent as a Bearer token) when it is set.
+    """
+    expected_token = os.getenv("METRICS_TOKEN")
+    if expected_token and not secrets.compare_digest(authorization or "", f"Bearer {expected_token}"):
+        raise HTTPException(401, "Non autorisé")
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
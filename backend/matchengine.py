@@ -0,0 +1,239 @@
+"""The /createMatches engine, without database, plus a command line to run it on files.
+
+    python matchengine.py input.json [-o matches.csv] [--rounds 2] [--top-k 5] [--mode exact|blocked|lsh]
+
+The input is the converter output (xlsxToJson.py: JSON or NDJSON) or a CSV
+with an ``id`` column, a ``currentClass`` column (or ``level``) and the
+``q3``..``q17`` answers (1-4, empty when unanswered). Users without q3 are
+skipped, like in the API. The output CSV has one line per user with the
+partner of every round (``day1``, ``day2``, ``round3``...); a ``.json``
+output also holds the candidates and stats. Timings, the total
+compatibility of every round and the LSH recall are printed.
+
+Scoring and modes follow the same environment variables as the API
+(SCORING_CONFIG, MATCH_MODE, MATCH_GRAPH_K, SCORE_BLOCK_CELLS, LSH_*).
+"""
+
+from pathlib import Path
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+from answers import ANSWER_COLUMNS, pack_answers
+from lsh import lsh_neighbours, recall_report
+from matching import DenseScores, SparseScores, match_rounds
+from profiling import StageTimer, profiler_report, start_profiler
+from scoring import (LevelScorer, answer_codes, block_top_k, compile_scoring, encode_level, load_scoring_config,
+                     score_matrix, weighted_score_matrix)
+from survey import ParseDiagnostics, entry_to_record, load_entries
+
+MODES = ("exact", "blocked", "lsh")
+
+
+def level_of(current_class: str | None) -> str:
+    """Extract level from currentClass (e.g., "Terminale F" -> "Terminale")."""
+    return current_class.split()[0] if current_class and current_class.strip() else ""
+
+
+def round_compatibility(scorer: LevelScorer, partners: dict) -> tuple[int, float]:
+    """Number of distinct pairs of a round and the sum of their scores (trios count each of their pairs)."""
+    pairs = {(min(i, j), max(i, j)) for i, j in partners.items()}
+    if not pairs:
+        return 0, 0.0
+    i, j = np.array(sorted(pairs)).T
+    return len(pairs), float(scorer.pairs(i, j).sum())
+
+
+def run_matching(users, rounds: int = 2, top_k: int = 5, mode: str = "exact", compiled: np.ndarray | None = None,
+                 timer: StageTimer | None = None, graph_k: int = 20, block_cells: int = 4_000_000,
+                 lsh_min_level: int = 2000, lsh_tables: int = 8, lsh_band: int = 5, lsh_max_bucket: int = 256,
+                 lsh_recall_sample: int = 200) -> dict:
+    """Match ``users``, ``(id, currentClass, answers_packed)`` tuples, inside their level.
+
+    Returns the rows /createMatches stores: ``candidates`` ``(user_id, rank,
+    candidate_id, score)``, ``rounds`` ``(user_id, round, partner_id)`` and
+    ``matches`` ``(id, day1, day2)``, plus ``compatibility`` (pairs and
+    total score per round) and the LSH ``approximate`` stats per level.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode doit être {', '.join(repr(m) for m in MODES)}")
+    timer = timer or StageTimer()
+
+    # Group users by level
+    users_by_level = {}
+    for user_id, current_class, answers_packed in users:
+        users_by_level.setdefault(level_of(current_class), []).append((user_id, answers_packed))
+    timer.lap("group_levels", rows=len(users_by_level))
+
+    candidate_rows = []
+    round_rows = []
+    match_rows = []
+    approximate = {}
+    compatibility = [{"round": r, "pairs": 0, "total": 0.0} for r in range(1, rounds + 1)]
+    for level, level_users in users_by_level.items():
+        ids = [user_id for user_id, _ in level_users]
+        packed = [answers_packed for _, answers_packed in level_users]
+        n = len(level_users)
+        scorer = LevelScorer(packed, compiled)
+
+        # Calculate compatibility scores between all pairs (or the candidate graph)
+        if mode == "lsh" and n > lsh_min_level:
+            # Only pairs sharing an LSH bucket are scored; rows are scored on demand
+            neighbours, neighbour_scores, lsh_stats = lsh_neighbours(
+                scorer, answer_codes(packed), max(graph_k, top_k),
+                tables=lsh_tables, band=lsh_band, max_bucket=lsh_max_bucket)
+            timer.lap("scoring", rows=lsh_stats["pairs_scored"])
+            lsh_stats["recall"] = recall_report(scorer, neighbours, neighbour_scores, sample=lsh_recall_sample)
+            timer.lap("recall_report", rows=lsh_stats["recall"]["sample"])
+            approximate[level] = lsh_stats
+            source = SparseScores(scorer, neighbours, neighbour_scores)
+        elif mode == "blocked":
+            # Exact top-k graph, one block of scores in memory at a time
+            neighbours, neighbour_scores = block_top_k(scorer, max(graph_k, top_k), block_cells)
+            timer.lap("scoring", rows=n * (n - 1) // 2)
+            source = SparseScores(scorer, neighbours, neighbour_scores)
+        else:
+            if compiled is None:
+                # Bit-parallel kernel (scoring.py): one AND + popcount per pair
+                onehot, missing = encode_level(packed)
+                scores = score_matrix(onehot, missing)
+            else:
+                scores = weighted_score_matrix(packed, compiled)
+            timer.lap("scoring", rows=n * (n - 1) // 2)
+            source = DenseScores(scores)
+
+        # Ranked alternatives of every user of the level
+        level_candidates = 0
+        for idx, peers in enumerate(source.top_k(top_k)):
+            for rank, (peer_idx, peer_score) in enumerate(peers, start=1):
+                candidate_rows.append((ids[idx], rank, ids[peer_idx], peer_score))
+                level_candidates += 1
+        timer.lap("candidates", rows=level_candidates)
+
+        # K rounds in one pass over the shared sorted pairs (matching.py)
+        level_rounds = match_rounds(source, rounds, timer)
+        for round_no, partners in enumerate(level_rounds, start=1):
+            for idx, user_id in enumerate(ids):
+                partner_idx = partners.get(idx)
+                round_rows.append((user_id, round_no, ids[partner_idx] if partner_idx is not None else None))
+            pairs, total = round_compatibility(scorer, partners)
+            compatibility[round_no - 1]["pairs"] += pairs
+            compatibility[round_no - 1]["total"] += total
+        for idx, user_id in enumerate(ids):
+            day_ids = [ids[partners[idx]] if idx in partners else None for partners in level_rounds[:2]]
+            match_rows.append((user_id, *day_ids, *[None] * (2 - len(day_ids))))
+        timer.lap("compatibility", rows=n)
+
+    for item in compatibility:
+        item["total"] = round(item["total"], 4)
+        item["mean"] = round(item["total"] / item["pairs"], 4) if item["pairs"] else None
+    return {"candidates": candidate_rows, "rounds": round_rows, "matches": match_rows,
+            "levels": {level: len(level_users) for level, level_users in users_by_level.items()},
+            "compatibility": compatibility, "approximate": approximate}
+
+
+# --------------------
+# COMMAND LINE
+# --------------------
+
+def load_users(path: Path) -> list:
+    """``(id, currentClass, answers_packed)`` of the users with a q3 answer, from JSON/NDJSON or CSV."""
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            rows = [(row.get("id") or row.get("ID"), row.get("currentClass") or row.get("level") or "",
+                     {col: int(row[col]) for col in ANSWER_COLUMNS if (row.get(col) or "").strip()})
+                    for row in csv.DictReader(f)]
+    else:
+        # Same reading as the offline import
+        diagnostics = ParseDiagnostics()
+        records = [entry_to_record(entry, diagnostics) for entry in load_entries(path)]
+        rows = [(record["id"], record["currentClass"], record["answers"]) for record in records if record is not None]
+    return [(str(user_id), current_class, pack_answers(answers))
+            for user_id, current_class, answers in rows if user_id and answers.get("q3") is not None]
+
+
+def write_assignments(path: Path, result: dict, rounds: int):
+    """One line per user with the partner of every round (CSV), or the whole result (``.json``)."""
+    partners = {}
+    for user_id, round_no, partner_id in result["rounds"]:
+        partners.setdefault(user_id, [None] * rounds)[round_no - 1] = partner_id
+    if path.suffix.lower() == ".json":
+        body = {"assignments": [{"id": user_id, "rounds": row} for user_id, row in partners.items()],
+                "candidates": [{"user_id": user_id, "rank": rank, "candidate_id": candidate_id, "score": value}
+                               for user_id, rank, candidate_id, value in result["candidates"]],
+                **{key: result[key] for key in ("levels", "compatibility", "approximate", "stats")}}
+        path.write_text(json.dumps(body, ensure_ascii=False, indent=2), encoding="utf-8")
+        return
+    header = ["id", "day1", "day2"][:1 + rounds] + [f"round{r}" for r in range(3, rounds + 1)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for user_id, row in partners.items():
+            writer.writerow([user_id, *["" if partner_id is None else partner_id for partner_id in row]])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the matching engine on a file, without database.")
+    parser.add_argument("input", help="converter output (JSON/NDJSON) or CSV with id, currentClass, q3..q17")
+    parser.add_argument("-o", "--output", default="matches.csv", help="CSV or .json output (default: matches.csv)")
+    parser.add_argument("--rounds", type=int, default=int(os.getenv("MATCH_ROUNDS", "2")))
+    parser.add_argument("--top-k", type=int, default=5, help="candidates kept per user (default: 5)")
+    parser.add_argument("--mode", choices=MODES, default=os.getenv("MATCH_MODE", "exact"))
+    parser.add_argument("--scoring", default=os.getenv("SCORING_CONFIG"),
+                        help="scoring config, inline JSON or path (default: SCORING_CONFIG)")
+    parser.add_argument("--profile", action="store_true", help="print a cProfile report")
+    args = parser.parse_args(argv)
+
+    path = Path(args.input)
+    if not path.exists():
+        print(f"File not found: {path}")
+        sys.exit(1)
+    if args.rounds < 1:
+        print("--rounds doit être >= 1")
+        sys.exit(1)
+
+    config = load_scoring_config(args.scoring)
+    compiled = compile_scoring(config) if config is not None else None
+    timer = StageTimer()
+    profiler = start_profiler() if args.profile else None
+    users = load_users(path)
+    timer.lap("load_users", rows=len(users))
+    if not users:
+        print("No users with answers found")
+        sys.exit(1)
+    result = run_matching(
+        users, args.rounds, args.top_k, args.mode, compiled, timer,
+        graph_k=int(os.getenv("MATCH_GRAPH_K", "20")),
+        block_cells=int(os.getenv("SCORE_BLOCK_CELLS", "4000000")),
+        lsh_min_level=int(os.getenv("LSH_MIN_LEVEL", "2000")),
+        lsh_tables=int(os.getenv("LSH_TABLES", "8")),
+        lsh_band=int(os.getenv("LSH_BAND", "5")),
+        lsh_max_bucket=int(os.getenv("LSH_MAX_BUCKET", "256")),
+        lsh_recall_sample=int(os.getenv("LSH_RECALL_SAMPLE", "200")))
+    result["stats"] = timer.report()
+    write_assignments(Path(args.output), result, args.rounds)
+    timer.lap("write_output", rows=len(result["rounds"]))
+    report = profiler_report(profiler) if profiler is not None else None
+
+    stats = timer.report()
+    print(f"Matched {len(users)} users in {len(result['levels'])} levels "
+          f"({args.mode}, {'weighted' if compiled is not None else 'count'} scoring) "
+          f"in {stats['total_seconds']:.2f}s -> {args.output}")
+    for name, stage in stats["stages"].items():
+        print(f"  {name:<20} {stage['seconds']:>9.4f}s {stage['rows']:>12}")
+    for item in result["compatibility"]:
+        print(f"  round {item['round']}: {item['pairs']} pairs, total compatibility {item['total']:g}"
+              f" (mean {item['mean']})")
+    for level, lsh_stats in result["approximate"].items():
+        print(f"  {level}: {lsh_stats['pairs_scored']}/{lsh_stats['pairs_exact']} pairs scored, "
+              f"recall@{lsh_stats['k']} {lsh_stats['recall'].get('recall_at_k')}")
+    if report is not None:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
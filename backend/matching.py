@@ -0,0 +1,245 @@
+"""Matching engine: K rounds of pairs inside a level, no partner repeated across rounds.
+
+The engine only needs a score source exposing ``n``, ``sorted_pairs()``
+(two index arrays ``(i, j)`` with ``i < j``, best score first, ties in
+``(i, j)`` order) and ``row(i)`` (scores of ``i`` against every user).
+Pairs are sorted once and shared by all rounds; every round skips the edges
+already used by the previous ones.
+
+Each round is a greedy pass over the sorted pairs followed by leftover
+handling. The pass reads the pairs in growing chunks, drops with numpy the
+pairs of users already matched in the round and stops once nobody is left to
+pair, so the Python loop only sees pairs that can still be taken (see
+:func:`greedy_pass`). With an odd level the last user joins an existing pair
+(a trio), preferring someone who was not in a trio in an earlier round. A repeated
+partner is only accepted when a user has no unused partner left.
+
+:class:`DenseScores` works on the full score matrix. :class:`SparseScores`
+works on a graph of each user's best candidates (exact with
+:func:`scoring.block_top_k`, approximate with lsh.py) and scores rows on
+demand, so it never needs ``n x n`` memory.
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+from profiling import StageTimer
+from scoring import top_k_from_matrix
+
+
+class DenseScores:
+    """Score source over a full ``n x n`` score matrix."""
+
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = matrix
+        self.n = len(matrix)
+
+    def sorted_pairs(self) -> tuple[np.ndarray, np.ndarray]:
+        rows, cols = np.triu_indices(self.n, k=1)
+        order = np.argsort(-self.matrix[rows, cols].astype(np.float64), kind="stable")
+        return rows[order], cols[order]
+
+    def row(self, i: int) -> np.ndarray:
+        return self.matrix[i]
+
+    def top_k(self, k: int) -> list:
+        return top_k_from_matrix(self.matrix, k)
+
+
+class SparseScores:
+    """Score source over a candidate graph.
+
+    ``neighbours[i]`` holds up to ``k`` candidate partners of user ``i``
+    (``-1`` for empty slots) and ``neighbour_scores[i]`` their scores, best
+    first. Only these edges are considered by the greedy passes; ``row`` is
+    computed on demand with ``scorer`` (a :class:`scoring.LevelScorer`) for
+    leftovers.
+    """
+
+    def __init__(self, scorer, neighbours: np.ndarray, neighbour_scores: np.ndarray):
+        self.scorer = scorer
+        self.neighbours = neighbours
+        self.neighbour_scores = neighbour_scores
+        self.n = scorer.n
+
+    def sorted_pairs(self) -> tuple[np.ndarray, np.ndarray]:
+        n, k = self.neighbours.shape
+        i = np.repeat(np.arange(n, dtype=np.int64), k)
+        j = self.neighbours.ravel().astype(np.int64)
+        values = self.neighbour_scores.ravel()
+        valid = j >= 0
+        lo, hi, values = np.minimum(i, j)[valid], np.maximum(i, j)[valid], values[valid]
+        _, first = np.unique(lo * n + hi, return_index=True)
+        lo, hi, values = lo[first], hi[first], values[first]
+        order = np.lexsort((hi, lo, -values.astype(np.float64)))
+        return lo[order], hi[order]
+
+    def row(self, i: int) -> np.ndarray:
+        return self.scorer.row(i)
+
+    def top_k(self, k: int) -> list:
+        return [[(int(j), s.item()) for j, s in zip(js[:k], ss[:k]) if j >= 0]
+                for js, ss in zip(self.neighbours, self.neighbour_scores)]
+
+
+def match_rounds(scores, rounds: int = 2, timer: StageTimer | None = None) -> list:
+    """Compute ``rounds`` rounds of matches; returns one ``{user index: partner index}`` dict per round.
+
+    Users left without any partner (a level of one) are absent from the dicts.
+    """
+    timer = timer or StageTimer()
+    n = scores.n
+    if n == 3:
+        # Circular pattern: 0→1→2→0, then reversed (0→2→1→0), alternating after that
+        return [{i: (i + 1 + r % 2) % 3 for i in range(3)} for r in range(rounds)]
+
+    pair_rows, pair_cols = scores.sorted_pairs()
+    timer.lap("sort_pairs", rows=len(pair_rows))
+
+    met = defaultdict(set)  # user -> partners of earlier rounds
+    trio_members = set()  # users who were in a trio in an earlier round
+    result = []
+    for r in range(1, rounds + 1):
+        partners = {}
+
+        # Greedy pass. When another trio is expected, earlier trio members are
+        # served first so they do not end up as the leftover again.
+        first = None
+        if trio_members and n % 2 == 1:
+            first = np.zeros(n, dtype=bool)
+            first[list(trio_members)] = True
+        greedy_pass(pair_rows, pair_cols, n, partners, met, first)
+        timer.lap(f"round{r}_greedy", rows=n)
+
+        leftovers = [idx for idx in range(n) if idx not in partners]
+        trio_members |= place_leftovers(scores, partners, leftovers, met, trio_members)
+        timer.lap(f"round{r}_leftovers", rows=len(leftovers))
+
+        for i, j in partners.items():
+            met[i].add(j)
+            met[j].add(i)
+        result.append(partners)
+    return result
+
+
+def greedy_pass(rows: np.ndarray, cols: np.ndarray, n: int, partners: dict, met: dict,
+                first: np.ndarray | None = None):
+    """Pair ``rows[p]`` with ``cols[p]``, in order, when both are free and have not met yet.
+
+    With ``first`` (a mask over the ``n`` users), the pairs involving one of
+    them are taken before all the others. Same result as a loop over every
+    pair: each chunk is first filtered on the users matched at the start of
+    the chunk, whose pairs would have been refused anyway.
+    """
+    matched = np.zeros(n, dtype=bool)
+    for involved in ((True, False) if first is not None else (None,)):
+        start, size = 0, max(n, 1024)
+        # With fewer than two free users no pair can be added
+        while start < len(rows) and len(partners) < n - 1:
+            if involved and not (first & ~matched).any():
+                break
+            chunk_rows, chunk_cols = rows[start:start + size], cols[start:start + size]
+            free = ~(matched[chunk_rows] | matched[chunk_cols])
+            if involved is not None:
+                touches = first[chunk_rows] | first[chunk_cols]
+                free &= touches if involved else ~touches
+            for i, j in zip(chunk_rows[free].tolist(), chunk_cols[free].tolist()):
+                if i not in partners and j not in partners and j not in met[i]:
+                    partners[i] = j
+                    partners[j] = i
+                    matched[i] = matched[j] = True
+            start += size
+            size *= 2
+
+
+def place_leftovers(scores, partners: dict, leftovers: list, met: dict, trio_members: set) -> set:
+    """Give a partner to the users the greedy pass left out; returns the new trio members."""
+    n = scores.n
+    new_trio = set()
+    matched = np.zeros(n, dtype=bool)
+    matched[list(partners)] = True
+
+    def best_of(row: np.ndarray, allowed: np.ndarray):
+        """Index of the best score among ``allowed`` (lowest index on ties), or None."""
+        if not allowed.any():
+            return None
+        return int(np.argmax(np.where(allowed, row.astype(np.float64), -np.inf)))
+
+    def not_met(u: int, allowed: np.ndarray) -> np.ndarray:
+        allowed = allowed.copy()
+        allowed[list(met[u])] = False
+        allowed[u] = False
+        return allowed
+
+    def attach(u: int):
+        """Join ``u`` to the best already matched user (forming a trio)."""
+        others = matched.copy()
+        others[u] = False
+        if not others.any():
+            return
+        row = scores.row(u)
+        # Nobody left that u has not met yet: accept a repeat rather than no partner
+        candidates = not_met(u, others)
+        if not candidates.any():
+            candidates = others
+        best = best_of(row, candidates)
+        if u in trio_members:
+            non_trio = candidates.copy()
+            non_trio[list(trio_members)] = False
+            best = best_of(row, non_trio) if non_trio.any() else best
+        partner = partners[best]
+        partners[u] = best
+        matched[u] = True
+        new_trio.update((u, best, partner))
+
+    def pair(a: int, b: int):
+        partners[a] = b
+        partners[b] = a
+        matched[[a, b]] = True
+
+    leftovers = list(leftovers)
+    # Rare with a complete score graph; pair leftovers among themselves first
+    while len(leftovers) > 3:
+        u = leftovers.pop(0)
+        pool = np.zeros(n, dtype=bool)
+        pool[leftovers] = True
+        v = best_of(scores.row(u), not_met(u, pool))
+        if v is not None:
+            leftovers.remove(v)
+            pair(u, v)
+        else:
+            attach(u)
+
+    if len(leftovers) == 2:
+        a, b = leftovers
+        if b not in met[a] or not matched.any():
+            pair(a, b)
+        else:
+            attach(a)
+            attach(b)
+    elif len(leftovers) == 3:
+        rows = {u: scores.row(u) for u in leftovers}
+        trio = [(0, 1), (0, 2), (1, 2)]
+        options = sorted(((x, y) for x, y in trio if leftovers[y] not in met[leftovers[x]]),
+                         key=lambda p: rows[leftovers[p[0]]][leftovers[p[1]]].item(), reverse=True)
+        if options:
+            # Best pair among the three, the third joins them
+            x, y = options[0]
+            a, b = leftovers[x], leftovers[y]
+            third = leftovers[3 - x - y]
+            pair(a, b)
+            for member in (a, b):
+                if member not in met[third]:
+                    partners[third] = member
+                    matched[third] = True
+                    new_trio.update((third, a, b))
+                    break
+            else:
+                attach(third)
+        else:
+            for u in leftovers:
+                attach(u)
+    elif len(leftovers) == 1:
+        attach(leftovers[0])
+    return new_trio
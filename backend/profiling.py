@@ -0,0 +1,49 @@
+"""Per-stage timing and optional cProfile reports for import and matching runs."""
+
+import cProfile
+import io
+import pstats
+import time
+
+
+class StageTimer:
+    """Accumulates wall time and row counts per named stage.
+
+    ``lap(name)`` charges the time elapsed since the previous lap to ``name``,
+    so a loop calling ``lap("parse")`` then ``lap("write")`` for every row ends
+    up with the total time of each stage over all rows.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._started = self._last = time.perf_counter()
+
+    def lap(self, name: str, rows: int = 0):
+        now = time.perf_counter()
+        stage = self.stages.setdefault(name, {"seconds": 0.0, "rows": 0})
+        stage["seconds"] += now - self._last
+        stage["rows"] += rows
+        self._last = now
+
+    def report(self) -> dict:
+        return {
+            "total_seconds": round(time.perf_counter() - self._started, 4),
+            "stages": {
+                name: {"seconds": round(stage["seconds"], 4), "rows": stage["rows"]}
+                for name, stage in self.stages.items()
+            },
+        }
+
+
+def start_profiler() -> cProfile.Profile:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def profiler_report(profiler: cProfile.Profile, limit: int = 40) -> str:
+    """Stop ``profiler`` and return its top functions by cumulative time."""
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,64 @@
+"""In-process sliding-window limiter with bounded memory."""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class SlidingWindowLimiter:
+    """Allow at most ``limit`` recorded events per key within ``window`` seconds.
+
+    Keys are kept in LRU order and at most ``max_keys`` of them are tracked,
+    so a flood of distinct client IPs cannot grow the state without bound
+    (the least recently seen clients are forgotten first).
+    """
+
+    def __init__(self, limit: int, window: float, max_keys: int = 10000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.evicted = 0
+        self._events = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, key, now: float):
+        events = self._events.get(key)
+        if events is None:
+            return None
+        while events and events[0] <= now - self.window:
+            events.popleft()
+        if not events:
+            del self._events[key]
+            return None
+        return events
+
+    def retry_after(self, key, now: float | None = None) -> float:
+        """0 if ``key`` is below the limit, else seconds until it is allowed again."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            events = self._prune(key, now)
+            if events is None or len(events) < self.limit:
+                return 0.0
+            self._events.move_to_end(key)
+            return events[0] + self.window - now
+
+    def record(self, key, now: float | None = None):
+        """Count one event (e.g. a failed login) for ``key``."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            events = self._prune(key, now)
+            if events is None:
+                events = self._events[key] = deque(maxlen=self.limit)
+            events.append(now)
+            self._events.move_to_end(key)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+                self.evicted += 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "window_seconds": self.window,
+            "tracked_clients": len(self._events),
+            "evicted_clients": self.evicted,
+        }
@@ -0,0 +1,133 @@
+"""Routing of read-only queries to PostgreSQL read replicas.
+
+Every replica keeps one autocommit connection. Its replication lag is
+checked at most every ``check_interval`` seconds, by whichever request
+needs it first; a replica lagging more than ``max_lag`` seconds behind the
+primary, or whose connection fails, is skipped until a later check finds
+it healthy again. Healthy replicas are used in turn. When none is usable
+:meth:`ReplicaPool.connection` returns None and the caller uses the primary.
+"""
+
+import logging
+import threading
+import time
+
+# Seconds of replay lag; 0 when everything received has been replayed (an idle
+# primary does not make a caught-up replica look late), NULL when unknown. A
+# standby whose WAL receiver is not streaming has also replayed all it received
+# while falling behind, so it reports NULL (unhealthy). Without pg_read_all_stats
+# the status column is NULL and only the receiver's presence is checked.
+LAG_SQL = """SELECT CASE
+                        WHEN NOT pg_is_in_recovery() THEN 0
+                        WHEN NOT EXISTS (SELECT 1
+                                         FROM pg_stat_wal_receiver
+                                         WHERE status = 'streaming'
+                                            OR status IS NULL) THEN NULL
+                        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                        END"""
+
+
+class Replica:
+    def __init__(self, name: str, dsn: str):
+        self.name = name
+        self.dsn = dsn
+        self.connection = None
+        self.healthy = False
+        self.lag = None
+        self.checked_at = None
+        self.error = None
+
+
+class ReplicaPool:
+    """Read replicas given by their DSNs.
+
+    ``connect(dsn)`` opens an autocommit connection, ``close(connection)``
+    closes one (``connection.close()`` by default).
+    """
+
+    def __init__(self, dsns: list, connect, max_lag: float = 5.0, check_interval: float = 10.0,
+                 close=None, clock=time.monotonic):
+        self.replicas = [Replica(f"replica{i + 1}", dsn) for i, dsn in enumerate(dsns)]
+        self.connect = connect
+        self.close = close or (lambda connection: connection.close())
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.clock = clock
+        self._next = 0
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def _check(self, replica: Replica, now: float):
+        replica.checked_at = now
+        try:
+            if replica.connection is None:
+                replica.connection = self.connect(replica.dsn)
+            lag = replica.connection.execute(LAG_SQL).fetchone()[0]
+        except Exception as e:
+            self._drop(replica, e)
+            return
+        replica.lag = None if lag is None else float(lag)
+        replica.healthy = replica.lag is not None and replica.lag <= self.max_lag
+        replica.error = None if replica.healthy else f"lag {replica.lag}"
+
+    def _drop(self, replica: Replica, error: Exception):
+        logging.warning(f"Réplica {replica.name} indisponible: {error}")
+        replica.healthy = False
+        replica.error = str(error)[:200]
+        if replica.connection is not None:
+            try:
+                self.close(replica.connection)
+            except Exception:
+                pass
+        replica.connection = None
+
+    def _pick(self) -> Replica | None:
+        now = self.clock()
+        due = [replica for replica in self.replicas
+               if replica.checked_at is None or now - replica.checked_at >= self.check_interval]
+        # One request runs the checks; the others keep the last known state meanwhile
+        if due and self._check_lock.acquire(blocking=False):
+            try:
+                for replica in due:
+                    self._check(replica, now)
+            finally:
+                self._check_lock.release()
+        with self._lock:
+            healthy = [replica for replica in self.replicas if replica.healthy]
+            if not healthy:
+                return None
+            self._next = (self._next + 1) % len(healthy)
+            return healthy[self._next]
+
+    def connection(self):
+        """Connection of a usable replica, or None to read from the primary."""
+        replica = self._pick()
+        return replica.connection if replica is not None else None
+
+    def dsn(self) -> str | None:
+        """DSN of a usable replica (for a dedicated connection), or None for the primary."""
+        replica = self._pick()
+        return replica.dsn if replica is not None else None
+
+    def mark_failed(self, connection, error: Exception):
+        """Skip the replica owning ``connection`` until its next check."""
+        with self._check_lock:
+            for replica in self.replicas:
+                if replica.connection is connection:
+                    self._drop(replica, error)
+
+    def close_all(self):
+        with self._check_lock:
+            for replica in self.replicas:
+                if replica.connection is not None:
+                    self.close(replica.connection)
+                    replica.connection = None
+                    replica.healthy = False
+
+    def stats(self) -> list:
+        return [{"name": replica.name, "healthy": replica.healthy, "lag_seconds": replica.lag,
+                 "error": replica.error} for replica in self.replicas]
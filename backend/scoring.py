@@ -0,0 +1,274 @@
+"""Compatibility scoring between users.
+
+``score`` is the reference implementation working on answer dicts. The
+bit-parallel kernel below gives the same results on integers: every answer
+is one-hot encoded in a 4-bit lane (60 bits for q3-q17), so the number of
+identical answers between two users is ``popcount(a & b)``. Unanswered
+questions are tracked in a separate 15-bit mask because ``score`` counts two
+missing answers (``None == None``) as an agreement.
+
+Weighted scoring (per-question weights and partial credit between choices)
+is compiled into one block-diagonal matrix ``W`` over one-hot encoded
+answers, so the whole level is scored by a single ``X @ W @ X.T``. The
+default configuration gives exactly the same scores as ``score``.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from answers import ANSWER_COLUMNS, LANE_BITS, LANE_MASK
+
+CHOICES = 4
+N_QUESTIONS = len(ANSWER_COLUMNS)
+
+if hasattr(np, "bitwise_count"):
+    def popcount(values: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(values)
+else:
+    _POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def popcount(values: np.ndarray) -> np.ndarray:
+        values = np.ascontiguousarray(values, dtype=np.uint64)
+        per_byte = _POPCOUNT8[values.view(np.uint8)].reshape(values.shape + (8,))
+        return per_byte.sum(axis=-1, dtype=np.uint8)
+
+
+def score(a: dict, b: dict) -> int:
+    s = 0
+    for k in a:
+        if k in b and a[k] == b[k]:
+            s += 1
+    return s
+
+
+def encode_packed(packed: int | None) -> tuple[int, int]:
+    """Turn a packed answer vector (see answers.py) into ``(onehot, missing)`` masks."""
+    packed = packed or 0
+    onehot = 0
+    missing = 0
+    for lane in range(N_QUESTIONS):
+        value = (packed >> (lane * LANE_BITS)) & LANE_MASK
+        if 1 <= value <= CHOICES:
+            onehot |= 1 << (lane * CHOICES + value - 1)
+        else:
+            missing |= 1 << lane
+    return onehot, missing
+
+
+def encode_answers(answers: dict) -> tuple[int, int]:
+    """Same as :func:`encode_packed` for a ``{"q3": 1, ...}`` dict."""
+    onehot = 0
+    missing = 0
+    for lane, column in enumerate(ANSWER_COLUMNS):
+        value = answers.get(column)
+        if value is not None and 1 <= value <= CHOICES:
+            onehot |= 1 << (lane * CHOICES + value - 1)
+        else:
+            missing |= 1 << lane
+    return onehot, missing
+
+
+def score_masks(a: tuple[int, int], b: tuple[int, int]) -> int:
+    """Kernel equivalent of ``score`` for two encoded users."""
+    return (a[0] & b[0]).bit_count() + (a[1] & b[1]).bit_count()
+
+
+def encode_level(packed_values) -> tuple[np.ndarray, np.ndarray]:
+    """Encode every user of a level into two ``uint64`` arrays (onehot, missing)."""
+    encoded = [encode_packed(p) for p in packed_values]
+    onehot = np.fromiter((e[0] for e in encoded), dtype=np.uint64, count=len(encoded))
+    missing = np.fromiter((e[1] for e in encoded), dtype=np.uint64, count=len(encoded))
+    return onehot, missing
+
+
+def score_one_to_many(onehot: np.ndarray, missing: np.ndarray, i: int) -> np.ndarray:
+    """Scores of user ``i`` against every user of the level (itself included)."""
+    return popcount(onehot & onehot[i]) + popcount(missing & missing[i])
+
+
+def score_matrix(onehot: np.ndarray, missing: np.ndarray) -> np.ndarray:
+    """Full ``n x n`` score matrix (``uint8``, scores never exceed 15)."""
+    n = len(onehot)
+    matrix = np.empty((n, n), dtype=np.uint8)
+    for i in range(n):
+        matrix[i] = score_one_to_many(onehot, missing, i)
+    return matrix
+
+
+def load_scoring_config(value: str | None) -> dict | None:
+    """Parse SCORING_CONFIG: inline JSON, a path to a JSON file, or empty (plain count).
+
+    Format::
+
+        {"weights": {"q16": 2, "q9": 0.5},
+         "similarity": {"q4": [[1, 0.5, 0, 0], [0.5, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]},
+         "both_missing": 1}
+
+    ``weights`` default to 1, ``similarity`` to the identity (exact match
+    only) and ``both_missing`` (credit when neither user answered) to 1.
+    Similarity tables must be symmetric.
+    """
+    if not value or not value.strip():
+        return None
+    if value.lstrip().startswith("{"):
+        return json.loads(value)
+    with open(os.path.expanduser(value), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compile_scoring(config: dict) -> np.ndarray:
+    """Compile a scoring config into the ``(15 * 5, 15 * 5)`` matrix used by :func:`weighted_score_matrix`.
+
+    Slot 0 of each question is "no answer", slots 1-4 the choices.
+    """
+    unknown = set(config) - {"weights", "similarity", "both_missing"}
+    if unknown:
+        raise ValueError(f"Unknown scoring config keys: {sorted(unknown)}")
+    weights = config.get("weights", {})
+    similarity = config.get("similarity", {})
+    for column in set(weights) | set(similarity):
+        if column not in ANSWER_COLUMNS:
+            raise ValueError(f"Unknown question column {column!r}")
+    both_missing = float(config.get("both_missing", 1))
+
+    slots = CHOICES + 1
+    matrix = np.zeros((N_QUESTIONS * slots, N_QUESTIONS * slots), dtype=np.float32)
+    for lane, column in enumerate(ANSWER_COLUMNS):
+        weight = float(weights.get(column, 1))
+        table = np.asarray(similarity.get(column, np.eye(CHOICES)), dtype=np.float32)
+        if table.shape != (CHOICES, CHOICES):
+            raise ValueError(f"Similarity table of {column} must be {CHOICES}x{CHOICES}")
+        if weight < 0 or both_missing < 0 or (table < 0).any():
+            raise ValueError("Scoring weights and similarities must be non-negative")
+        if not np.allclose(table, table.T):
+            # score(a, b) must equal score(b, a): pair order, top-k and leftovers read different halves
+            raise ValueError(f"Similarity table of {column} must be symmetric")
+        start = lane * slots
+        matrix[start, start] = weight * both_missing
+        matrix[start + 1:start + slots, start + 1:start + slots] = weight * table
+    return matrix
+
+
+def answer_codes(packed_values) -> np.ndarray:
+    """``(n, 15)`` array of answer values (0 = no answer) from packed answers."""
+    packed = np.fromiter((p or 0 for p in packed_values), dtype=np.int64)
+    shifts = np.arange(N_QUESTIONS, dtype=np.int64) * LANE_BITS
+    codes = (packed[:, None] >> shifts) & LANE_MASK
+    codes[codes > CHOICES] = 0
+    return codes.astype(np.uint8)
+
+
+def answer_features(packed_values) -> np.ndarray:
+    """``(n, 15 * 5)`` one-hot ``float32`` rows (slot 0 of each question = no answer)."""
+    codes = answer_codes(packed_values)
+    n = len(codes)
+    slots = CHOICES + 1
+    features = np.zeros((n, N_QUESTIONS * slots), dtype=np.float32)
+    features[np.arange(n)[:, None], np.arange(N_QUESTIONS) * slots + codes] = 1
+    return features
+
+
+def weighted_score_matrix(packed_values, compiled: np.ndarray) -> np.ndarray:
+    """Full ``n x n`` weighted score matrix (``float32``) for a compiled config."""
+    features = answer_features(packed_values)
+    return features @ compiled @ features.T
+
+
+class LevelScorer:
+    """Scores between any users of a level without materializing the ``n x n`` matrix.
+
+    Uses the popcount kernel, or the weighted one when ``compiled`` (see
+    :func:`compile_scoring`) is given; values are the same as
+    :func:`score_matrix` / :func:`weighted_score_matrix`.
+    """
+
+    def __init__(self, packed_values, compiled: np.ndarray | None = None):
+        packed_values = list(packed_values)
+        self.n = len(packed_values)
+        self.compiled = compiled
+        if compiled is None:
+            self.onehot, self.missing = encode_level(packed_values)
+        else:
+            self.features = answer_features(packed_values)
+            self.projected = self.features @ compiled
+
+    def block(self, rows, cols=None) -> np.ndarray:
+        """``len(rows) x len(cols)`` scores (every user when ``cols`` is None)."""
+        rows = np.asarray(rows)
+        if self.compiled is None:
+            onehot = self.onehot if cols is None else self.onehot[cols]
+            missing = self.missing if cols is None else self.missing[cols]
+            return (popcount(self.onehot[rows, None] & onehot[None, :])
+                    + popcount(self.missing[rows, None] & missing[None, :]))
+        features = self.features if cols is None else self.features[cols]
+        return self.projected[rows] @ features.T
+
+    def row(self, i: int) -> np.ndarray:
+        return self.block([i])[0]
+
+    def pairs(self, i, j) -> np.ndarray:
+        """Scores of the pairs ``(i[t], j[t])``."""
+        if self.compiled is None:
+            return popcount(self.onehot[i] & self.onehot[j]) + popcount(self.missing[i] & self.missing[j])
+        return np.einsum("ij,ij->i", self.projected[i], self.features[j])
+
+
+def sorted_pairs_from_matrix(matrix: np.ndarray) -> list:
+    """All ``((i, j), score)`` pairs with ``i < j``, best score first.
+
+    Ties keep the ``(i, j)`` lexicographic order, like
+    ``sorted(scores.items(), key=..., reverse=True)`` on a dict filled row by row.
+    """
+    rows, cols = np.triu_indices(len(matrix), k=1)
+    values = matrix[rows, cols]
+    order = np.argsort(-values.astype(np.float64), kind="stable")
+    return [((int(rows[k]), int(cols[k])), values[k].item()) for k in order]
+
+
+def top_k_from_matrix(matrix: np.ndarray, k: int) -> list:
+    """For every user, the ``k`` best ``(j, score)`` partners (self excluded).
+
+    Ties are broken by index so the result is deterministic.
+    """
+    n = len(matrix)
+    k = max(0, min(k, n - 1))
+    result = []
+    for i in range(n):
+        row = matrix[i].astype(np.float64)
+        row[i] = -np.inf
+        order = np.argsort(-row, kind="stable")[:k]
+        result.append([(int(j), matrix[i, j].item()) for j in order])
+    return result
+
+
+def block_top_k(scorer: LevelScorer, k: int, block_cells: int = 4_000_000) -> tuple[np.ndarray, np.ndarray]:
+    """Exact top-``k`` partners of every user, scored ``block_cells`` scores at a time.
+
+    Same layout as :func:`lsh.lsh_neighbours` (rows best first, ties by index,
+    ``-1`` / ``-inf`` in empty slots), so memory stays ``O(n * k)`` plus one block.
+    With ``k >= n - 1`` the graph holds every pair.
+    """
+    n = scorer.n
+    k = max(0, min(k, n - 1))
+    neighbours = np.full((n, k), -1, dtype=np.int64)
+    neighbour_scores = np.full((n, k), -np.inf)
+    if k == 0:
+        return neighbours, neighbour_scores
+    step = max(1, block_cells // n)
+    for start in range(0, n, step):
+        rows = np.arange(start, min(start + step, n))
+        block = scorer.block(rows).astype(np.float64)
+        block[np.arange(len(rows)), rows] = -np.inf
+        # Keep everything tied with the k-th best, then order by (score, index)
+        kth = -np.partition(-block, k - 1, axis=1)[:, k - 1]
+        r, j = np.nonzero(block >= kth[:, None])
+        values = block[r, j]
+        order = np.lexsort((j, -values, r))
+        r, j, values = r[order], j[order], values[order]
+        rank = np.arange(len(r)) - np.searchsorted(r, r, side="left")
+        keep = rank < k
+        neighbours[rows[r[keep]], rank[keep]] = j[keep]
+        neighbour_scores[rows[r[keep]], rank[keep]] = values[keep]
+    return neighbours, neighbour_scores
@@ -0,0 +1,58 @@
+"""Stateless signed session tokens.
+
+A token is ``<payload>.<signature>``, both base64url without padding. The
+payload is a compact JSON object ``{"uid": ..., "lvl": ..., "exp": ...}`` and
+the signature is HMAC-SHA256 of the encoded payload. Verifying a token only
+needs the secret, so authenticated endpoints never go back to the database.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+
+class InvalidToken(Exception):
+    """Raised when a token is malformed, tampered with or expired."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(secret: bytes, body: str) -> str:
+    return _b64encode(hmac.new(secret, body.encode("utf-8"), hashlib.sha256).digest())
+
+
+def issue_token(secret: bytes, user_id: str, level: str, ttl: int, now: float | None = None) -> str:
+    """Create a token for ``user_id`` valid for ``ttl`` seconds."""
+    now = time.time() if now is None else now
+    payload = {"uid": str(user_id), "lvl": level, "exp": int(now) + ttl}
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return f"{body}.{_sign(secret, body)}"
+
+
+def verify_token(secret: bytes, token: str, now: float | None = None) -> dict:
+    """Return the payload of a valid token, raise :class:`InvalidToken` otherwise."""
+    try:
+        body, signature = token.split(".")
+    except (AttributeError, ValueError):
+        raise InvalidToken("malformed token")
+
+    if not hmac.compare_digest(signature.encode("utf-8"), _sign(secret, body).encode("ascii")):
+        raise InvalidToken("bad signature")
+
+    try:
+        payload = json.loads(_b64decode(body))
+    except ValueError:
+        raise InvalidToken("malformed payload")
+
+    now = time.time() if now is None else now
+    if not isinstance(payload, dict) or payload.get("exp", 0) < now:
+        raise InvalidToken("expired token")
+    return payload
@@ -0,0 +1,544 @@
+"""Survey export parsing: column cleanup, names, answers and user records.
+
+Kept free of any DB access so rows can be parsed in worker processes.
+"""
+
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from answers import ANSWER_COLUMNS
+from profiling import StageTimer
+
+SURVEY_FORMATS = ("xlsx", "csv", "ndjson", "parquet")
+
+
+def detect_format(data: bytes) -> str:
+    """Guess the format of an export from its first bytes."""
+    if data.startswith(b"PK\x03\x04"):
+        return "xlsx"
+    if data.startswith(b"PAR1"):
+        return "parquet"
+    if data.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"{"):
+        return "ndjson"
+    return "csv"
+
+
+def csv_delimiter(data: bytes) -> str:
+    """Most frequent of , ; and tab in the header line (Excel FR exports use ;)."""
+    header = data.split(b"\n", 1)[0]
+    return max(",;\t", key=lambda sep: header.count(sep.encode()))
+
+
+def read_survey_file(source, fmt: str | None = None) -> tuple[pd.DataFrame, str]:
+    """Read an export given as bytes or a path; returns ``(df_raw, format)``.
+
+    The format is detected from the content unless ``fmt`` is given. Values
+    are kept as objects, like ``pd.read_excel(..., dtype=object)``. Parquet
+    is read with pyarrow.
+    """
+    if not isinstance(source, bytes):
+        with open(source, "rb") as f:
+            source = f.read()
+    fmt = fmt or detect_format(source)
+    buffer = io.BytesIO(source)
+    if fmt == "xlsx":
+        df = pd.read_excel(buffer, dtype=object)
+    elif fmt == "csv":
+        df = pd.read_csv(buffer, dtype=object, sep=csv_delimiter(source), encoding="utf-8-sig")
+    elif fmt == "ndjson":
+        df = pd.read_json(buffer, lines=True, dtype=False, convert_dates=False)
+    elif fmt == "parquet":
+        df = pd.read_parquet(buffer)
+    else:
+        raise ValueError(f"Unsupported format {fmt!r}, expected one of {', '.join(SURVEY_FORMATS)}")
+    return df.astype(object), fmt
+
+
+# Answer mapping: Maps question text answers to integer values (1-4)
+ANSWER_MAPPINGS = {
+    "Quel est ton style de musique préféré ?": {
+        "Rap": 1,
+        "Pop": 2,
+        "Rock": 3,
+        "Autre": 4,
+    },
+    "Quel est pour toi le voyage idéal ?": {
+        "Voyage en famille": 1,
+        "Voyage entre amis": 2,
+        "Voyage en couple": 3,
+        "Voyage solo": 4,
+    },
+    "Quelle est ta destination de rêve ?": {
+        "Londres": 1,
+        "Séoul": 2,
+        "Marrakech": 3,
+        "Rio de Janeiro": 4,
+    },
+    "Quel est ton genre de film/série préféré ?": {
+        "Science-Fiction": 1,
+        "Drame": 2,
+        "Comédie": 3,
+        "Action": 4,
+    },
+    "Tu passes le plus de temps sur :": {
+        "Instagram": 1,
+        "Snapchat": 2,
+        "TikTok": 3,
+        "Je ne suis pas vraiment sur les réseaux": 4,
+    },
+    "A l'école tu préfères :": {
+        "Histoire-Géographie": 1,
+        "Anglais": 2,
+        "Sport": 3,
+        "Français/Philosophie": 4,
+    },
+    "Au petit-déjeuner c'est plutôt :": {
+        "Café/Thé": 1,
+        "Jus de fruit": 2,
+        "Eau": 3,
+        "Soda": 4,
+    },
+    "Au petit-déjeuner c'est plutôt :\xa0": {  # With non-breaking space
+        "Café/Thé": 1,
+        "Jus de fruit": 2,
+        "Eau": 3,
+        "Soda": 4,
+    },
+    "A Passy, le midi tu préfères être :": {
+        "Dehors": 1,
+        "Dans l'atrium": 2,
+        "Dans la cour": 3,
+        "En salle Verte/Bleue": 4,
+    },
+    "Avec 1.000.000 d'euros tu ferais plutôt :": {
+        "Un don à un association": 1,
+        "L'achat d'une maison dans le Sud": 2,
+        "Un investissement boursier": 3,
+        "Du shopping sur les Champs": 4,
+    },
+    "Comme super pouvoir, tu préfèrerais pouvoir :": {
+        "Voler": 1,
+        "Etre invisible": 2,
+        "Lire dans les pensée": 3,
+        "Remonter le temps": 4,
+    },
+    "Quelle est ta saison préférée :": {
+        "Été": 1,
+        "Automne": 2,
+        "Hiver": 3,
+        "Printemps": 4,
+    },
+    "Tu préfères lire :": {
+        "Des romans": 1,
+        "Des BD/mangas": 2,
+        "Les journaux": 3,
+        "Lire ?": 4,
+    },
+    "Tu préfères pratiquer quel sport :": {
+        "Sport de raquette": 1,
+        "Sport collectif": 2,
+        "Sport de performance (athlétisme, natation...)": 3,
+        "Sport de combat": 4,
+    },
+    "Tu préfères pratiquer quel sport :\xa0": {  # With non-breaking space
+        "Sport de raquette": 1,
+        "Sport collectif": 2,
+        "Sport de performance (athlétisme, natation...)": 3,
+        "Sport de combat": 4,
+    },
+    "Quelle est ta soirée idéale ?": {
+        "Soirée cinéma": 1,
+        "Soirée entre amis": 2,
+        "Soirée dodo": 3,
+        "Soirée gaming": 4,
+    },
+    "Si tu pouvais dîner avec une personne historique ce serait :": {
+        "Michael Jackson": 1,
+        "Jules César": 2,
+        "Pelé": 3,
+        "Pythagore (même si t'as oublié son théorème)": 4,
+    },
+}
+
+# Map question text to column names
+QUESTION_TO_COLUMN = {
+    "Quel est ton style de musique préféré ?": "q3",
+    "Quel est pour toi le voyage idéal ?": "q4",
+    "Quelle est ta destination de rêve ?": "q5",
+    "Quel est ton genre de film/série préféré ?": "q6",
+    "Tu passes le plus de temps sur :": "q7",
+    "A l'école tu préfères :": "q8",
+    "Au petit-déjeuner c'est plutôt :": "q9",
+    "Au petit-déjeuner c'est plutôt :\xa0": "q9",  # With non-breaking space
+    "A Passy, le midi tu préfères être :": "q10",
+    "Avec 1.000.000 d'euros tu ferais plutôt :": "q11",
+    "Comme super pouvoir, tu préfèrerais pouvoir :": "q12",
+    "Quelle est ta saison préférée :": "q13",
+    "Tu préfères lire :": "q14",
+    "Tu préfères pratiquer quel sport :": "q15",
+    "Tu préfères pratiquer quel sport :\xa0": "q15",  # With non-breaking space
+    "Quelle est ta soirée idéale ?": "q16",
+    "Si tu pouvais dîner avec une personne historique ce serait :": "q17",
+}
+
+
+@functools.lru_cache(maxsize=256)
+def mapping_for_question(question: str) -> dict | None:
+    """Answer mapping of a question, ignoring non-breaking and doubled spaces."""
+    # Normalize the question (remove non-breaking spaces, extra spaces)
+    question_normalized = question.replace('\xa0', ' ').replace('  ', ' ').strip()
+
+    # Try to find the mapping for this question (try variations)
+    for q_key in ANSWER_MAPPINGS.keys():
+        q_key_normalized = q_key.replace('\xa0', ' ').replace('  ', ' ').strip()
+        if q_key_normalized == question_normalized or q_key == question:
+            return ANSWER_MAPPINGS[q_key]
+    return None
+
+
+def parse_answer(question: str, answer: str) -> int | None:
+    """Parse a text answer and convert it to integer (1-4).
+
+    Args:
+        question: The question text
+        answer: The answer text
+
+    Returns:
+        Integer value (1-4) or None if answer cannot be mapped
+    """
+    if not answer or pd.isna(answer):
+        return None
+
+    # Clean up the answer (remove extra spaces, normalize)
+    answer = str(answer).strip()
+
+    mapping = mapping_for_question(question)
+    if mapping is None:
+        return None
+
+    # Try exact match first
+    if answer in mapping:
+        return mapping[answer]
+
+    # Try case-insensitive match
+    for key, value in mapping.items():
+        if key.lower() == answer.lower():
+            return value
+
+    # Try partial match (for typos or extra spaces)
+    for key, value in mapping.items():
+        if key.lower() in answer.lower() or answer.lower() in key.lower():
+            return value
+
+    # Unmapped answers are reported by the caller (see ParseDiagnostics)
+    return None
+
+
+def parse_name(full_name: str) -> dict:
+    if not full_name or pd.isna(full_name):
+        return {"first_name": "", "last_name": ""}
+
+    parts = full_name.strip().split()
+
+    # Trouver où commence le nom (les parties en MAJUSCULES)
+    last_name_parts = []
+    first_name_parts = []
+
+    # On parcourt depuis la fin pour catcher le nom en majuscules
+    i = len(parts) - 1
+    while i >= 0 and parts[i].isupper():
+        last_name_parts.insert(0, parts[i])
+        i -= 1
+
+    # Le reste c'est le prénom
+    first_name_parts = parts[: i + 1]
+
+    first_name = " ".join(first_name_parts).strip()
+    # Capitaliser proprement le nom
+    last_name = " ".join(p.capitalize() for p in last_name_parts).strip()
+
+    # Si on a rien trouvé en majuscules, on fait un split simple (moitié/moitié)
+    if not last_name and len(parts) >= 2:
+        first_name = parts[0]
+        last_name = " ".join(parts[1:]).capitalize()
+    elif not first_name and last_name:
+        # Tout était en majuscules, on garde juste le dernier comme nom
+        first_name = " ".join(last_name_parts[:-1])
+        last_name = last_name_parts[-1].capitalize() if last_name_parts else ""
+
+    return {"first_name": first_name, "last_name": last_name}
+
+
+def prepare_survey_frame(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """Copy of the raw export without the Forms bookkeeping columns."""
+    df = df_raw.copy()
+
+    drop_exact = [
+        "Heure de début",
+        "Heure de fin",
+        "Heure de la dernière modification",
+        "Total points",
+        "Quiz feedback",
+        "Nom",
+    ]
+    drop_pattern = df.columns[
+        df.columns.str.startswith("Points - ")
+        | df.columns.str.startswith("Feedback - ")
+        ].tolist()
+    all_to_drop = drop_exact + drop_pattern
+    return df.drop(columns=[c for c in all_to_drop if c in df.columns])
+
+
+class ParseDiagnostics:
+    """What an import could not parse, in a compact form.
+
+    Unmapped answers are counted per ``(column, raw value)`` and skipped
+    rows per error message, each with the first ``samples`` row ids, so a
+    messy export costs a dict update per bad cell instead of a log line.
+    """
+
+    def __init__(self, samples: int = 5):
+        self.samples = samples
+        self.unmapped = {}  # (column, value) -> [count, sample user ids]
+        self.skipped = {}  # message -> [count, sample row indexes]
+
+    def __eq__(self, other):
+        return (isinstance(other, ParseDiagnostics)
+                and (self.unmapped, self.skipped) == (other.unmapped, other.skipped))
+
+    def _add(self, table: dict, key, row_id, count: int = 1, samples: list | None = None):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = [0, []]
+        entry[0] += count
+        for sample in (samples if samples is not None else [row_id]):
+            if len(entry[1]) >= self.samples:
+                break
+            entry[1].append(sample)
+
+    def add_unmapped(self, column: str, value: str, row_id):
+        self._add(self.unmapped, (column, value), row_id)
+
+    def add_skipped(self, message: str, row_index):
+        self._add(self.skipped, message, row_index)
+
+    def merge(self, other: "ParseDiagnostics"):
+        """Add the counts of ``other`` (parsed after this one: samples keep row order)."""
+        for key, (count, samples) in other.unmapped.items():
+            self._add(self.unmapped, key, None, count, samples)
+        for key, (count, samples) in other.skipped.items():
+            self._add(self.skipped, key, None, count, samples)
+
+    @property
+    def unmapped_count(self) -> int:
+        return sum(count for count, _ in self.unmapped.values())
+
+    @property
+    def skipped_count(self) -> int:
+        return sum(count for count, _ in self.skipped.values())
+
+    def by_column(self) -> dict:
+        """Number of unmapped answers per column."""
+        counts = {}
+        for (column, _), (count, _) in self.unmapped.items():
+            counts[column] = counts.get(column, 0) + count
+        return counts
+
+    def summary(self, limit: int = 20) -> dict:
+        """JSON-friendly report, most frequent first, ``limit`` entries per list."""
+        unmapped = sorted(self.unmapped.items(), key=lambda item: -item[1][0])[:limit]
+        skipped = sorted(self.skipped.items(), key=lambda item: -item[1][0])[:limit]
+        return {
+            "unmapped_answers": self.unmapped_count,
+            "skipped_rows": self.skipped_count,
+            "unmapped_by_column": self.by_column(),
+            "unmapped": [{"column": column, "value": value, "count": count, "sample_ids": ids}
+                         for (column, value), (count, ids) in unmapped],
+            "skipped": [{"error": message, "count": count, "sample_rows": rows}
+                        for message, (count, rows) in skipped],
+        }
+
+
+def parse_survey_row(row, raw_name, columns, timer: StageTimer | None = None,
+                     diagnostics: ParseDiagnostics | None = None) -> dict:
+    """Turn one survey row into a user record (without touching the DB).
+
+    The record carries a ``source_hash`` of its content, used by incremental
+    imports to skip rows that did not change since the previous import.
+    Answers that could not be mapped are counted in ``diagnostics``.
+    """
+    timer = timer or StageTimer()
+    diagnostics = ParseDiagnostics() if diagnostics is None else diagnostics
+    name = parse_name(raw_name)
+    timer.lap("parse_names", rows=1)
+
+    if pd.isna(row.get("ID")):
+        raise ValueError("missing ID")
+    user_id = int(row["ID"])
+    email = row.get("Email")
+
+    # Build answers dict from remaining columns
+    skip_cols = ["ID", "Adresse de messagerie"]
+    answers = {}
+    for col in columns:
+        if col not in skip_cols:
+            value = row[col]
+            clean_col = str(col).replace("\xa0", " ").strip()
+            answers[clean_col] = str(value) if pd.notna(value) else None
+
+    currentClass, parsed_answers = parse_answer_texts(answers, user_id, diagnostics)
+    timer.lap("parse_answers", rows=1)
+
+    record = {
+        "id": str(user_id),
+        "first_name": name.get("first_name"),
+        "last_name": name.get("last_name"),
+        "email": None if pd.isna(email) else str(email),
+        "currentClass": currentClass,
+        "answers": parsed_answers,
+    }
+    record["source_hash"] = record_hash(record)
+    return record
+
+
+def parse_answer_texts(answers: dict, user_id, diagnostics: ParseDiagnostics) -> tuple[str, dict]:
+    """``(currentClass, {q3..q17: 1-4})`` from answers keyed by question text.
+
+    Answers that could not be mapped are counted in ``diagnostics``.
+    """
+    # Try to construct currentClass from answers if possible
+    unit = answers.get("Dans quel unité es-tu ?") or answers.get("Dans quelle unité es-tu ?") or ""
+    classe = answers.get("Dans quelle classe es-tu ?") or answers.get("Dans quelle classe es-tu ?") or ""
+    currentClass = f"{unit} {classe}".strip()
+
+    # Parse answers for questions 3-17 and convert to integers
+    parsed_answers = {}
+    compact = None  # answers keyed without spaces, lower case (first key wins), built on first use
+    for question_text, column_name in QUESTION_TO_COLUMN.items():
+        # Try to find the question in the answers dict (with possible variations)
+        answer_text = answers.get(question_text)
+        if answer_text is None:
+            # Try variations with spaces/special chars
+            if compact is None:
+                compact = {}
+                for key, value in answers.items():
+                    if key:
+                        compact.setdefault(key.replace(" ", "").lower(), value)
+            answer_text = compact.get(question_text.replace(" ", "").lower())
+
+        # Convert text answer to integer
+        if answer_text:
+            parsed_value = parse_answer(question_text, answer_text)
+            if parsed_value is not None:
+                parsed_answers[column_name] = parsed_value
+            else:
+                diagnostics.add_unmapped(column_name, answer_text, str(user_id))
+    return currentClass, parsed_answers
+
+
+def load_entries(path: Path) -> list:
+    """User entries from a JSON document or an NDJSON file."""
+    text = path.read_text(encoding="utf-8-sig")
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        # NDJSON: one object per line
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        # common shapes: { "users": [...] } or single user object
+        return data.get("users") or data.get("data") or [data]
+    if isinstance(data, list):
+        return data
+    raise ValueError("Unsupported JSON format")
+
+
+def entry_to_record(entry: dict, diagnostics: ParseDiagnostics) -> dict | None:
+    """Record in the shape of survey.parse_survey_row, or None for an entry without ID."""
+    uid = entry.get("id") or entry.get("ID") or entry.get("user_id") or entry.get("uid")
+    if not uid:
+        return None
+    answers = entry.get("answers") or {}
+    if any(col in answers for col in ANSWER_COLUMNS):
+        # Already parsed (q3..q17 -> 1-4)
+        parsed = {col: int(answers[col]) for col in ANSWER_COLUMNS if answers.get(col) is not None}
+        current_class = entry.get("currentClass") or entry.get("current_class") or ""
+    else:
+        current_class, parsed = parse_answer_texts(answers, uid, diagnostics)
+        current_class = entry.get("currentClass") or entry.get("current_class") or current_class
+    record = {
+        "id": str(uid),
+        "first_name": entry.get("first_name") or entry.get("firstName") or entry.get("firstname") or "",
+        "last_name": entry.get("last_name") or entry.get("lastName") or entry.get("lastname") or "",
+        "email": entry.get("email") or None,
+        "currentClass": current_class,
+        "answers": parsed,
+    }
+    record["source_hash"] = record_hash(record)
+    return record
+
+
+def record_hash(record: dict) -> str:
+    """Stable digest of a parsed user record."""
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def parse_chunk(frame: pd.DataFrame, names: list, timer: StageTimer | None = None) -> dict:
+    """Parse the rows of ``frame`` (``names`` holds the raw "Name" of each row, in order).
+
+    Returns ``{"records", "errors", "diagnostics"}``: the parsed records in
+    row order, ``(row index, message)`` for rows that were skipped, and the
+    :class:`ParseDiagnostics` of unmapped answers and skipped rows.
+    """
+    timer = timer or StageTimer()
+    records, errors, diagnostics = [], [], ParseDiagnostics()
+    for (idx, row), raw_name in zip(frame.iterrows(), names):
+        try:
+            records.append(parse_survey_row(row, raw_name, frame.columns, timer, diagnostics))
+        except Exception as e:
+            message = f"{type(e).__name__}: {e}"
+            errors.append((idx, message))
+            diagnostics.add_skipped(message, idx)
+            timer.lap("skipped_rows", rows=1)
+    return {"records": records, "errors": errors, "diagnostics": diagnostics}
+
+
+def _parse_chunk_task(args) -> dict:
+    return parse_chunk(*args)
+
+
+def parse_survey_frame(df_raw: pd.DataFrame, workers: int = 1, chunk_size: int = 2000,
+                       timer: StageTimer | None = None) -> dict:
+    """Parse a raw survey export into user records, see :func:`parse_chunk`.
+
+    With ``workers > 1`` the rows are split into chunks of ``chunk_size``
+    parsed in a process pool; results are merged in row order, so the output
+    is identical to the serial path.
+    """
+    timer = timer or StageTimer()
+    df = prepare_survey_frame(df_raw)
+    names = df_raw["Name"].tolist() if "Name" in df_raw.columns else [None] * len(df)
+    timer.lap("prepare_columns")
+
+    if workers <= 1 or len(df) <= chunk_size:
+        return parse_chunk(df, names, timer)
+
+    chunks = [(df.iloc[start:start + chunk_size], names[start:start + chunk_size])
+              for start in range(0, len(df), chunk_size)]
+    # spawn: do not fork the server process (open DB connection, threads)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(_parse_chunk_task, chunks))
+    merged = {"records": [], "errors": [], "diagnostics": ParseDiagnostics()}
+    for result in results:
+        merged["records"].extend(result["records"])
+        merged["errors"].extend(result["errors"])
+        merged["diagnostics"].merge(result["diagnostics"])
+    timer.lap("parse_parallel", rows=len(df))
+    return merged
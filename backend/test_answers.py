@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Tests for the packed answer storage (no DB connection needed)."""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from answers import ANSWER_COLUMNS, pack_answers, unpack_answers, packed_sql_expression
+
+
+def test_roundtrip():
+    print("Testing pack/unpack roundtrip...")
+
+    full = {col: (i % 4) + 1 for i, col in enumerate(ANSWER_COLUMNS)}
+    partial = {"q3": 2, "q9": 4, "q17": 1}
+
+    assert unpack_answers(pack_answers(full)) == full
+    assert unpack_answers(pack_answers(partial)) == {col: partial.get(col) for col in ANSWER_COLUMNS}
+    assert pack_answers({}) == 0
+    assert unpack_answers(None) == {col: None for col in ANSWER_COLUMNS}
+    # Out-of-range values are treated as missing
+    assert pack_answers({"q3": 7, "q4": 0}) == 0
+    # The whole response fits in a signed BIGINT
+    assert pack_answers({col: 4 for col in ANSWER_COLUMNS}) < 2 ** 63
+    print("✓ roundtrip")
+
+
+def test_sql_expression():
+    print("Testing backfill SQL expression...")
+
+    expr = packed_sql_expression()
+    for col in ANSWER_COLUMNS:
+        assert f"COALESCE({col}, 0)" in expr
+    assert "<< 42" in expr
+    print("✓ sql expression")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Packed Answers Test")
+    print("=" * 60 + "\n")
+
+    test_roundtrip()
+    test_sql_expression()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
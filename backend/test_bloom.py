@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Tests for the login code Bloom filter (no DB connection needed)."""
+
+import sys
+import os
+import random
+import string
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bloom import BloomFilter
+
+
+def random_codes(rng: random.Random, count: int) -> list:
+    chars = string.ascii_lowercase + string.digits
+    return [''.join(rng.choice(chars) for _ in range(8)) for _ in range(count)]
+
+
+def test_no_false_negatives():
+    print("Testing issued codes are always accepted...")
+    codes = random_codes(random.Random(1), 5000)
+    bloom = BloomFilter.from_items(codes, fp_rate=0.01)
+    assert all(code in bloom for code in codes)
+    print(f"✓ {bloom.stats()}")
+
+
+def test_false_positive_rate():
+    print("Testing false-positive rate...")
+    rng = random.Random(2)
+    codes = set(random_codes(rng, 5000))
+    bloom = BloomFilter.from_items(codes, fp_rate=0.01)
+
+    guesses = [c for c in random_codes(rng, 20000) if c not in codes]
+    rate = sum(g in bloom for g in guesses) / len(guesses)
+    assert rate < 0.02, rate
+    print(f"✓ measured {rate:.4f} (target 0.01)")
+
+
+def test_explicit_size():
+    print("Testing explicit size...")
+    bloom = BloomFilter(1000, bits=4096)
+    assert bloom.bits == 4096 and bloom.stats()["size_bytes"] == 512
+    empty = BloomFilter.from_items([])
+    assert BloomFilter(10, bits=1 << 20).hashes == 16  # oversized filter: hash rounds are capped
+    assert "abcd1234" not in empty
+    print("✓ explicit size")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Login Filter Test")
+    print("=" * 60 + "\n")
+
+    test_no_false_negatives()
+    test_false_positive_rate()
+    test_explicit_size()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
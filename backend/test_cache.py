@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Tests for the per-process caches and ETag matching (no DB connection needed)."""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from cache import TTLCache, VersionCheck, etag_matches
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache():
+    print("Testing TTL expiry and LRU eviction...")
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, maxsize=2, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now the most recent
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    clock.now = 10.5
+    assert cache.get("a", "gone") == "gone" and len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0
+    print("✓ expiry and eviction")
+
+
+def test_version_check():
+    print("Testing caches are dropped when the DB version changes...")
+    clock = FakeClock()
+    db_version = {"value": 1}
+    reads = []
+
+    def read_version():
+        reads.append(clock.now)
+        return db_version["value"]
+
+    cache = TTLCache(ttl=300, clock=clock)
+    check = VersionCheck(read_version, [cache], interval=2, clock=clock)
+    assert check.check() == 1
+    cache.set("u1", "old view")
+    # Another worker re-runs /createMatches
+    db_version["value"] = 2
+    clock.now = 1
+    assert check.check() == 1 and cache.get("u1") == "old view"  # within the interval: no DB read
+    clock.now = 2.5
+    assert check.check() == 2 and cache.get("u1") is None
+    assert reads == [0, 2.5]
+
+    # Versions written by this worker do not clear its freshly warmed cache
+    cache.set("u1", "new view")
+    check.set(3)
+    db_version["value"] = 3
+    clock.now = 10
+    assert check.check() == 3 and cache.get("u1") == "new view"
+    print("✓ stale views dropped")
+
+
+def test_etag_matches():
+    print("Testing If-None-Match parsing...")
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", "abc"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+    assert not etag_matches(None, '"abc"') and not etag_matches("", '"abc"')
+    print("✓ ETags")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Cache Test")
+    print("=" * 60 + "\n")
+
+    test_ttl_cache()
+    test_version_check()
+    test_etag_matches()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
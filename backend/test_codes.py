@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Tests for access code generation and the import plan (no DB connection needed)."""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from codes import CODE_CHARS, generate_codes, plan_import
+
+
+def record(user_id: str, source_hash: str) -> dict:
+    return {"id": user_id, "first_name": f"F{user_id}", "source_hash": source_hash}
+
+
+def test_generate_codes():
+    print("Testing generated codes are unique and avoid taken ones...")
+    taken = {"aaaa", "bbbb"}
+    codes = generate_codes(500, 4, taken)
+    assert len(set(codes)) == 500 and not {"aaaa", "bbbb"} & set(codes)
+    assert all(len(code) == 4 and set(code) <= set(CODE_CHARS) for code in codes)
+    assert taken >= set(codes) and len(taken) == 502
+    try:
+        generate_codes(2, 1, set(CODE_CHARS[:-1]))
+        assert False, "more codes than the alphabet allows"
+    except RuntimeError:
+        pass
+    print("✓ unique codes")
+
+
+def test_full_import_plan():
+    print("Testing a full import writes every user and gives each a code...")
+    records = {user_id: record(user_id, "h") for user_id in ("1", "2", "3")}
+    plan = plan_import(records, {}, [], 8)
+    assert [r["id"] for r in plan["changed"]] == ["1", "2", "3"]
+    assert plan["new"] == 3 and plan["unchanged"] == 0
+    assert [user_id for _, user_id in plan["codes"]] == [1, 2, 3]
+    assert len({code for code, _ in plan["codes"]}) == 3
+    print("✓ 3 users, 3 codes")
+
+
+def test_incremental_plan():
+    print("Testing an incremental import only writes new or changed users...")
+    existing_hashes = {"1": "h1", "2": "h2", "9": "h9"}
+    issued = [("code0001", 1), ("code0002", 2), ("code0009", 9)]
+    records = {
+        "1": record("1", "h1"),        # unchanged
+        "2": record("2", "h2-edited"),  # answers changed
+        "4": record("4", "h4"),        # new user
+    }
+    plan = plan_import(records, existing_hashes, issued, 8)
+    assert [r["id"] for r in plan["changed"]] == ["2", "4"]
+    assert plan["new"] == 1 and plan["unchanged"] == 1
+    # Existing codes are kept: only the new user gets one, never an issued code
+    assert [user_id for _, user_id in plan["codes"]] == [4]
+    assert plan["codes"][0][0] not in {code for code, _ in issued}
+    # User 9 is missing from the export: neither rewritten nor given a code (so kept)
+    assert all(r["id"] != "9" for r in plan["changed"]) and all(user_id != 9 for _, user_id in plan["codes"])
+
+    # A user left without a code (e.g. code deleted by hand) gets a new one even if unchanged
+    plan = plan_import({"1": record("1", "h1")}, {"1": "h1"}, [], 8)
+    assert plan["changed"] == [] and plan["unchanged"] == 1 and [user_id for _, user_id in plan["codes"]] == [1]
+
+    # Re-running the same export writes nothing
+    plan = plan_import({"1": record("1", "h1")}, existing_hashes, issued, 8)
+    assert plan["changed"] == [] and plan["codes"] == [] and plan["new"] == 0
+    print("✓ 1 new, 1 updated, 1 unchanged")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Codes Test")
+    print("=" * 60 + "\n")
+
+    test_generate_codes()
+    test_full_import_plan()
+    test_incremental_plan()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Tests for the offline code-issuing CLI (SQLite, no PostgreSQL needed)."""
+
+import sys
+import os
+import json
+import random
+import tempfile
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from codes import IMPORT_LOCK_KEY
+from GeneratePasswords import connect_sqlite, issue_codes
+from survey import ANSWER_MAPPINGS, ParseDiagnostics, entry_to_record, load_entries
+
+
+def converter_entries(count: int, seed: int = 0) -> list:
+    """Entries shaped like the xlsxToJson.py output."""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        answers = {"Dans quel unité es-tu ?": "Terminale", "Dans quelle classe es-tu ?": rng.choice("ABCDEF")}
+        for question, mapping in ANSWER_MAPPINGS.items():
+            answers[question.replace("\xa0", " ").strip()] = rng.choice(list(mapping))
+        entries.append({"id": i + 1, "first_name": "Alice", "last_name": "MARTIN",
+                        "email": f"user{i}@example.com", "answers": answers})
+    return entries
+
+
+def test_json_and_ndjson():
+    print("Testing JSON and NDJSON inputs give the same records...")
+    entries = converter_entries(30)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path, ndjson_path = Path(tmp) / "input.json", Path(tmp) / "input.ndjson"
+        json_path.write_text(json.dumps(entries, ensure_ascii=False, indent=2), encoding="utf-8")
+        ndjson_path.write_text("\n".join(json.dumps(e, ensure_ascii=False) for e in entries), encoding="utf-8")
+        assert load_entries(json_path) == load_entries(ndjson_path) == entries
+    diagnostics = ParseDiagnostics()
+    record = entry_to_record(entries[0], diagnostics)
+    assert record["currentClass"].startswith("Terminale ") and len(record["answers"]) == 15
+    assert diagnostics.unmapped_count == 0
+    assert entry_to_record({"first_name": "no id"}, diagnostics) is None
+    print("✓ identical")
+
+
+def test_issue_codes():
+    print("Testing bulk code issuing into SQLite...")
+    entries = converter_entries(1200, seed=1)
+    records = [entry_to_record(e, ParseDiagnostics()) for e in entries]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = connect_sqlite(str(Path(tmp) / "codes.db"))
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        first = issue_codes(db, records[:1000], passwd_len=6, batch=300, placeholder="?")
+        assert first["codes_generated"] == 1000
+        # Existing users keep their code, only new ones get one
+        second = issue_codes(db, records, passwd_len=6, batch=300, placeholder="?")
+        assert second == {"users": 1200, "codes_generated": 200, "password_length": 6}
+        codes = db.execute("SELECT password, user_id FROM passwords").fetchall()
+        assert len(codes) == len({c for c, _ in codes}) == len({u for _, u in codes}) == 1200
+        assert all(len(c) == 6 for c, _ in codes)
+        assert db.execute("SELECT count(*) FROM users WHERE answers_packed IS NOT NULL").fetchone()[0] == 1200
+        replaced = issue_codes(db, records[:10], passwd_len=6, replace=True, placeholder="?")
+        assert replaced["codes_generated"] == 10
+        assert db.execute("SELECT count(*) FROM users").fetchone()[0] == 10
+        db.close()
+    print(f"✓ {len(codes)} unique codes")
+
+
+class CountingConnection:
+    """SQLite connection counting commits."""
+
+    def __init__(self, db):
+        self.db = db
+        self.commits = 0
+
+    def cursor(self):
+        return self.db.cursor()
+
+    def commit(self):
+        self.commits += 1
+        self.db.commit()
+
+
+def test_locked_single_transaction():
+    print("Testing --replace runs in one transaction under the import lock (PostgreSQL path)...")
+    records = [entry_to_record(e, ParseDiagnostics()) for e in converter_entries(50, seed=2)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = connect_sqlite(str(Path(tmp) / "codes.db"))
+        locks = []
+        db.create_function("pg_advisory_xact_lock", 1, lambda key: locks.append(key))
+        issue_codes(db, records, passwd_len=6, batch=10, placeholder="?")
+        reader = connect_sqlite(str(Path(tmp) / "codes.db"))
+
+        conn = CountingConnection(db)
+        result = issue_codes(conn, records[:20], passwd_len=6, batch=7, replace=True, placeholder="?",
+                             lock_key=IMPORT_LOCK_KEY)
+        assert result["codes_generated"] == 20
+        assert locks == [IMPORT_LOCK_KEY] and conn.commits == 1
+        assert reader.execute("SELECT count(*) FROM passwords").fetchone()[0] == 20
+        reader.close()
+        db.close()
+    print("✓ one commit")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Offline Code Issuing Test")
+    print("=" * 60 + "\n")
+
+    test_json_and_ndjson()
+    test_issue_codes()
+    test_locked_single_transaction()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Tests for the keyset-paginated admin listings (SQLite stands in for PostgreSQL)."""
+
+import sys
+import os
+import random
+import sqlite3
+sys.path.insert(0, os.path.dirname(__file__))
+
+from answers import ANSWER_COLUMNS
+from listings import MATCH_COLUMNS, USER_COLUMNS, matches_page_query, page, users_page_query
+
+CLASSES = ["2nde 1", "2nde 2", "1ere 3", "Terminale 1", "Terminale 2"]
+
+
+def sample_db(n: int = 137):
+    db = sqlite3.connect(":memory:")
+    # PostgreSQL functions used by the listing queries
+    db.create_function("split_part", 3, lambda text, sep, index: (text.split(sep) + [""] * index)[index - 1])
+    db.create_function("btrim", 1, lambda text: text.strip())
+    db.create_function("num_nonnulls", -1, lambda *values: sum(value is not None for value in values))
+    db.execute(f"CREATE TABLE users (id TEXT PRIMARY KEY, first_name TEXT, last_name TEXT, email TEXT, "
+               f"currentClass TEXT, {', '.join(f'{col} INTEGER' for col in ANSWER_COLUMNS)})")
+    db.execute("CREATE TABLE matches (id TEXT PRIMARY KEY, day1 TEXT, day2 TEXT)")
+    rng = random.Random(7)
+    users = []
+    for i in range(n):
+        answers = [rng.choice([None, 1, 2, 3, 4]) for _ in ANSWER_COLUMNS]
+        users.append((f"{i:04d}", f"F{i}", f"L{i}", f"u{i}@x", rng.choice(CLASSES), *answers))
+    db.executemany(f"INSERT INTO users VALUES ({', '.join(['?'] * len(users[0]))})", users)
+    db.executemany("INSERT INTO matches VALUES (?, ?, ?)",
+                   [(user[0], users[(i + 1) % n][0], users[(i + 2) % n][0]) for i, user in enumerate(users) if i % 3])
+    return db
+
+
+def read_all(db, build, limit, columns, **filters) -> list:
+    items, after = [], None
+    while True:
+        sql, params = build(limit, after, **filters)
+        assert "OFFSET" not in sql.upper()
+        result = page(db.execute(sql.replace("%s", "?"), params).fetchall(), limit, columns)
+        assert len(result["items"]) <= limit
+        items += result["items"]
+        after = result["next_after"]
+        if after is None:
+            return items
+
+
+def test_users_pages():
+    print("Testing user pages cover every user once, in ID order...")
+    db = sample_db()
+    everyone = read_all(db, users_page_query, 20, USER_COLUMNS)
+    assert [item["id"] for item in everyone] == sorted(row[0] for row in db.execute("SELECT id FROM users"))
+    assert all(0 <= item["answered"] <= len(ANSWER_COLUMNS) for item in everyone)
+    # Exactly full last page: no empty page after it
+    assert len(read_all(db, users_page_query, len(everyone), USER_COLUMNS)) == len(everyone)
+    print(f"✓ {len(everyone)} users")
+
+
+def test_filters():
+    print("Testing level, class and matched filters...")
+    db = sample_db()
+    everyone = read_all(db, users_page_query, 1000, USER_COLUMNS)
+    terminale = read_all(db, users_page_query, 7, USER_COLUMNS, level="Terminale")
+    assert terminale == [item for item in everyone if item["currentClass"].startswith("Terminale")]
+    one_class = read_all(db, users_page_query, 7, USER_COLUMNS, class_name="2nde 1", matched=False)
+    assert one_class == [item for item in everyone if item["currentClass"] == "2nde 1" and item["day1"] is None]
+    matched = read_all(db, users_page_query, 9, USER_COLUMNS, matched=True)
+    assert matched and all(item["day1"] is not None for item in matched)
+    assert len(matched) + len(read_all(db, users_page_query, 9, USER_COLUMNS, matched=False)) == len(everyone)
+    print(f"✓ {len(terminale)} in Terminale, {len(matched)} matched")
+
+
+def test_matches_pages():
+    print("Testing match pages carry both partners' names...")
+    db = sample_db()
+    names = {row[0]: row[1] for row in db.execute("SELECT id, first_name FROM users")}
+    matches = read_all(db, matches_page_query, 11, MATCH_COLUMNS, level="2nde")
+    assert len(matches) == db.execute(
+        "SELECT count(*) FROM matches m JOIN users u ON u.id = m.id WHERE u.currentClass LIKE '2nde %'").fetchone()[0]
+    assert all(item["day1_first_name"] == names[item["day1"]] and item["day2_first_name"] == names[item["day2"]]
+               for item in matches)
+    # Keyset on users so the level/class filters are (level, id) / (currentClass, id) range scans
+    assert "u.id > %s" in matches_page_query(11, "0001", class_name="2nde 1")[0]
+    one_class = read_all(db, matches_page_query, 4, MATCH_COLUMNS, class_name="2nde 1")
+    assert [item["id"] for item in one_class] == [row[0] for row in db.execute(
+        "SELECT m.id FROM matches m JOIN users u ON u.id = m.id WHERE u.currentClass = '2nde 1' ORDER BY m.id")]
+    print(f"✓ {len(matches)} assignments")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Admin Listings Test")
+    print("=" * 60 + "\n")
+
+    test_users_pages()
+    test_filters()
+    test_matches_pages()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Tests for the mmap login index (no DB connection needed)."""
+
+import sys
+import os
+import tempfile
+sys.path.insert(0, os.path.dirname(__file__))
+
+from login_index import LoginIndex, write_index
+
+
+def profile(i: int) -> dict:
+    return {"id": str(i), "first_name": f"Prénom{i}", "last_name": "Nom", "email": f"{i}@ecole.fr",
+            "currentClass": "Terminale F"}
+
+
+def test_lookup():
+    print("Testing lookups...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "login_index.bin")
+        entries = [(f"code{i:04d}", profile(i)) for i in range(500)]
+        stats = write_index(path, reversed(entries))
+        assert stats["entries"] == 500
+
+        index = LoginIndex(path)
+        for code, expected in entries:
+            assert index.lookup(code) == expected
+        for missing in ("", "code", "code9999", "code00000", "zzzz"):
+            assert index.lookup(missing) is None
+    print("✓ lookups")
+
+
+def test_atomic_replace():
+    print("Testing re-import replaces the index...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "login_index.bin")
+        index = LoginIndex(path, check_interval=0)
+        assert index.lookup("abc") is None  # no file yet
+
+        write_index(path, [("abc", profile(1))])
+        assert index.lookup("abc") == profile(1)
+
+        write_index(path, [("xyz", profile(2)), ("abcdefghij", profile(3))])
+        assert index.lookup("abc") is None
+        assert index.lookup("xyz") == profile(2)
+        assert index.lookup("abcdefghij") == profile(3)
+        assert sorted(os.listdir(tmp)) == ["login_index.bin"]  # no temporary files left
+    print("✓ atomic replace")
+
+
+def test_stamp():
+    print("Testing the index stamp...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "login_index.bin")
+        index = LoginIndex(path, check_interval=0)
+        assert index.find("abc") == (None, None) and index.stamp() is None
+        write_index(path, [("abc", profile(1))], stamp=41)
+        assert index.find("abc") == (profile(1), 41)
+        assert index.find("zzz") == (None, 41) and index.stamp() == 41
+    print("✓ stamp")
+
+
+def test_unreadable_file():
+    print("Testing a bad or truncated file is ignored...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "login_index.bin")
+        index = LoginIndex(path, check_interval=0)
+        write_index(path, [(f"code{i}", profile(i)) for i in range(50)], stamp=3)
+        assert index.lookup("code7") == profile(7)
+
+        with open(path, "rb") as f:
+            data = f.read()
+        for broken in (data[:10], data[:len(data) // 3], b"NOPE" + data[4:]):
+            with open(path + ".tmp", "wb") as f:
+                f.write(broken)
+            os.replace(path + ".tmp", path)
+            assert index.lookup("code7") is None and index.stamp() is None
+            assert index.stats()["loaded"] is False
+
+        # Records intact, profiles cut short
+        with open(path + ".tmp", "wb") as f:
+            f.write(data[:-200])
+        os.replace(path + ".tmp", path)
+        assert index.lookup("code9") is None  # last record in code order
+
+        write_index(path, [("abc", profile(1))], stamp=4)
+        assert index.lookup("abc") == profile(1)
+    print("✓ falls back to the DB")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Login Index Test")
+    print("=" * 60 + "\n")
+
+    test_lookup()
+    test_atomic_replace()
+    test_stamp()
+    test_unreadable_file()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
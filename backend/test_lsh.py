@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Tests for the LSH candidate graph and sparse matching (no DB connection needed)."""
+
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from answers import ANSWER_COLUMNS, pack_answers
+from lsh import lsh_neighbours, merge_top_k, recall_report
+from matching import SparseScores, match_rounds
+from scoring import LevelScorer, answer_codes, compile_scoring, top_k_from_matrix
+
+
+def random_packed(rng: random.Random, n: int) -> list:
+    return [pack_answers({col: rng.randint(1, 4) for col in ANSWER_COLUMNS}) for _ in range(n)]
+
+
+def test_merge_top_k():
+    print("Testing top-k merging against a sort of all edges...")
+    rng = np.random.default_rng(3)
+    n, k = 30, 4
+    neighbours = np.full((n, k), -1, dtype=np.int64)
+    neighbour_scores = np.full((n, k), -np.inf)
+    best = {}
+    for _ in range(5):
+        i, j = rng.integers(0, n, 200), rng.integers(0, n, 200)
+        keep = i != j
+        i, j = i[keep], j[keep]
+        values = ((i * 7 + j * 13) % 10).astype(np.float64)  # same edge, same score
+        merge_top_k(neighbours, neighbour_scores, i, j, values)
+        for a, b, s in zip(i.tolist(), j.tolist(), values.tolist()):
+            best.setdefault(a, {})[b] = s
+    for a in range(n):
+        expected = sorted(best.get(a, {}).items(), key=lambda e: (-e[1], e[0]))[:k]
+        found = [(int(b), s) for b, s in zip(neighbours[a], neighbour_scores[a]) if b >= 0]
+        assert found == expected, a
+    print("✓ identical")
+
+
+def test_lsh_scores_and_recall():
+    print("Testing LSH candidates are correctly scored and recall grows with tables...")
+    packed = random_packed(random.Random(4), 600)
+    codes = answer_codes(packed)
+    for compiled in (None, compile_scoring({"weights": {"q16": 2, "q9": 0.5}})):
+        scorer = LevelScorer(packed, compiled)
+        recalls = []
+        for tables in (2, 16):
+            neighbours, neighbour_scores, stats = lsh_neighbours(scorer, codes, 10, tables=tables, band=3)
+            valid = neighbours >= 0
+            rows = np.nonzero(valid)[0]
+            assert np.allclose(neighbour_scores[valid], scorer.pairs(rows, neighbours[valid]), atol=1e-4)
+            assert not (neighbours == np.arange(len(packed))[:, None]).any()
+            assert stats["pairs_scored"] < stats["pairs_exact"]
+            recalls.append(recall_report(scorer, neighbours, neighbour_scores, sample=100)["recall_at_k"])
+        assert recalls[1] > recalls[0] and recalls[1] > 0.8, recalls
+        print(f"✓ {'weighted' if compiled is not None else 'count'}: recall {recalls[0]} -> {recalls[1]}")
+
+
+def test_sparse_matching():
+    print("Testing K rounds on a sparse candidate graph...")
+    for n in (41, 300):
+        packed = random_packed(random.Random(n), n)
+        scorer = LevelScorer(packed)
+        neighbours, neighbour_scores, _ = lsh_neighbours(scorer, answer_codes(packed), 8)
+        source = SparseScores(scorer, neighbours, neighbour_scores)
+        result = match_rounds(source, 3)
+        assert all(set(partners) == set(range(n)) for partners in result)
+        assert all(partners[i] != i for partners in result for i in partners)
+        expected = [(int(j), s.item()) for j, s in zip(neighbours[n - 1][:3], neighbour_scores[n - 1][:3]) if j >= 0]
+        assert source.top_k(3)[n - 1] == expected
+    # One bucket holding the whole level: the candidates are the exact ones
+    packed = random_packed(random.Random(5), 20)
+    scorer = LevelScorer(packed)
+    neighbours, neighbour_scores, _ = lsh_neighbours(scorer, np.zeros((20, 15), dtype=np.uint8), 5, tables=1)
+    full = scorer.block(np.arange(20))
+    assert SparseScores(scorer, neighbours, neighbour_scores).top_k(5) == top_k_from_matrix(full, 5)
+    print("✓ everyone matched every round")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("LSH Candidate Graph Test")
+    print("=" * 60 + "\n")
+
+    test_merge_top_k()
+    test_lsh_scores_and_recall()
+    test_sparse_matching()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Tests for the reveal notification helpers of mail.py (no DB or SMTP connection needed)."""
+
+import sys
+import os
+import datetime
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mail import Pacer, parse_reveal_time, render_reveal, send_offsets
+
+
+def test_send_offsets():
+    print("Testing sends are spread over the window...")
+    assert send_offsets(0, 3600, 30) == []
+    assert send_offsets(1, 3600, 30) == [0.0]
+    assert send_offsets(5, 100, 30) == [0.0, 25.0, 50.0, 75.0, 100.0]
+    # 301 sends at 30/min need 10 minutes, more than the configured window
+    offsets = send_offsets(301, 60, 30)
+    assert offsets[-1] == 600 and all(b - a >= 2 for a, b in zip(offsets, offsets[1:]))
+    print("✓ offsets")
+
+
+def test_pacer():
+    print("Testing the pacer keeps sends under the rate limit...")
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    pacer = Pacer(30, clock=lambda: now[0], sleep=sleep)
+    pacer.wait()
+    now[0] += 0.5
+    pacer.wait()
+    now[0] += 5
+    pacer.wait()
+    assert slept == [1.5]
+    print("✓ pacer")
+
+
+def test_render_reveal():
+    print("Testing reveal messages...")
+    subject, body = render_reveal("Alice", 1, ("Bob", "Martin", "T3"))
+    assert "jour 1" in subject
+    assert body.startswith("Bonjour Alice,") and "Bob Martin (T3)" in body
+    _, body = render_reveal(None, 2, (None, None, None))
+    assert body.startswith("Bonjour,") and "jour 2 t'attend" in body
+    assert parse_reveal_time("2026-02-14T08:00:00+01:00").utcoffset() == datetime.timedelta(hours=1)
+    assert parse_reveal_time("2026-02-14 08:00").tzinfo is not None
+    print("✓ messages")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Reveal Notifications Test")
+    print("=" * 60 + "\n")
+
+    test_send_offsets()
+    test_pacer()
+    test_render_reveal()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Tests for the DB-free matching engine and its command line."""
+
+import sys
+import os
+import csv
+import json
+import random
+import tempfile
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from answers import ANSWER_COLUMNS, pack_answers, unpack_answers
+from matchengine import level_of, load_users, main, run_matching
+from matching import DenseScores, match_rounds
+from scoring import compile_scoring, weighted_score_matrix
+
+
+def random_users(rng: random.Random, sizes: dict) -> list:
+    return [(f"{level[0]}{i}", f"{level} {rng.choice('ABC')}",
+             pack_answers({col: rng.randint(1, 4) for col in ANSWER_COLUMNS if rng.random() > 0.1}))
+            for level, n in sizes.items() for i in range(n)]
+
+
+def test_level_of():
+    print("Testing level extraction...")
+    assert level_of("Terminale F") == "Terminale"
+    assert level_of("  1ere   3 ") == "1ere"
+    assert level_of(None) == "" and level_of(" ") == ""
+    print("✓ levels")
+
+
+def test_run_matching():
+    print("Testing the engine against match_rounds on each level...")
+    users = random_users(random.Random(2), {"Terminale": 41, "Premiere": 3, "Seconde": 20, "X": 1})
+    compiled = compile_scoring({"weights": {"q16": 2, "q9": 0.5}})
+    result = run_matching(users, rounds=3, top_k=4, compiled=compiled)
+    assert result["levels"] == {"Terminale": 41, "Premiere": 3, "Seconde": 20, "X": 1}
+    assert len(result["matches"]) == len(users) and len(result["rounds"]) == 3 * len(users)
+
+    by_round = {(user_id, round_no): partner_id for user_id, round_no, partner_id in result["rounds"]}
+    total = 0.0
+    for level in ("Terminale", "Seconde"):
+        level_users = [user for user in users if user[1].startswith(level)]
+        ids = [user_id for user_id, _, _ in level_users]
+        scores = weighted_score_matrix([packed for _, _, packed in level_users], compiled)
+        for round_no, partners in enumerate(match_rounds(DenseScores(scores), 3), start=1):
+            assert all(by_round[(ids[i], round_no)] == ids[j] for i, j in partners.items())
+            if round_no == 1:
+                total += sum(scores[i, j] for i, j in {(min(i, j), max(i, j)) for i, j in partners.items()})
+    assert by_round[("X0", 1)] is None
+    matches = {user_id: (day1, day2) for user_id, day1, day2 in result["matches"]}
+    assert all(matches[user_id][round_no - 1] == partner_id
+               for (user_id, round_no), partner_id in by_round.items() if round_no <= 2)
+    premiere = [row for row in result["candidates"] if row[0] == "P0"]
+    assert [rank for _, rank, _, _ in premiere] == [1, 2]
+    # Round 1 of the two large levels plus the trio of Premiere (3 pairs)
+    premiere_users = [packed for _, current_class, packed in users if current_class.startswith("Premiere")]
+    trio = weighted_score_matrix(premiere_users, compiled)
+    total += trio[0, 1] + trio[1, 2] + trio[0, 2]
+    assert abs(result["compatibility"][0]["total"] - round(total, 4)) < 1e-3
+    print(f"✓ round 1 total compatibility {result['compatibility'][0]['total']}")
+
+
+def test_modes_agree():
+    print("Testing blocked mode finds the same matches as exact mode...")
+    users = random_users(random.Random(3), {"Terminale": 30, "Seconde": 17})
+    exact = run_matching(users, rounds=2, top_k=3)
+    blocked = run_matching(users, rounds=2, top_k=3, mode="blocked", graph_k=40, block_cells=100)
+    assert exact["rounds"] == blocked["rounds"] and exact["compatibility"] == blocked["compatibility"]
+    lsh = run_matching(users, rounds=2, mode="lsh", lsh_min_level=20, graph_k=8)
+    assert set(lsh["approximate"]) == {"Terminale"}
+    try:
+        run_matching(users, mode="fast")
+        assert False, "unknown mode accepted"
+    except ValueError:
+        pass
+    print("✓ same rounds")
+
+
+def test_cli():
+    print("Testing the command line on a CSV and on converter JSON...")
+    users = random_users(random.Random(4), {"Terminale": 9, "Seconde": 6})
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "answers.csv"
+        with open(source, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "currentClass", *ANSWER_COLUMNS])
+            for user_id, current_class, packed in users:
+                answers = unpack_answers(packed)
+                writer.writerow([user_id, current_class, *["" if answers[col] is None else answers[col]
+                                                           for col in ANSWER_COLUMNS]])
+            writer.writerow(["skipped", "Terminale A", *[""] * len(ANSWER_COLUMNS)])
+        # Like the API, users without q3 are left out
+        answered = [user for user in users if unpack_answers(user[2])["q3"] is not None]
+        assert load_users(source) == answered
+
+        output = Path(tmp) / "matches.csv"
+        main([str(source), "-o", str(output), "--rounds", "3"])
+        with open(output, newline="", encoding="utf-8") as f:
+            lines = list(csv.reader(f))
+        assert lines[0] == ["id", "day1", "day2", "round3"] and len(lines) == len(answered) + 1
+
+        converter = Path(tmp) / "input.json"
+        converter.write_text(json.dumps([
+            {"id": 1, "currentClass": "Terminale F", "answers": {col: 1 for col in ANSWER_COLUMNS}},
+            {"id": 2, "currentClass": "Terminale G", "answers": {col: 2 for col in ANSWER_COLUMNS}},
+        ]), encoding="utf-8")
+        main([str(converter), "-o", str(Path(tmp) / "out.json")])
+        body = json.loads((Path(tmp) / "out.json").read_text(encoding="utf-8"))
+        assert body["assignments"] == [{"id": "1", "rounds": ["2", "2"]}, {"id": "2", "rounds": ["1", "1"]}]
+        assert body["compatibility"][0]["pairs"] == 1
+    print("✓ assignments written")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Matching Engine Test")
+    print("=" * 60 + "\n")
+
+    test_level_of()
+    test_run_matching()
+    test_modes_agree()
+    test_cli()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Tests for the K-round matching engine (no DB connection needed)."""
+
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+
+from answers import ANSWER_COLUMNS, pack_answers
+from matching import DenseScores, SparseScores, greedy_pass, match_rounds
+from scoring import (LevelScorer, block_top_k, compile_scoring, encode_level, score_matrix, sorted_pairs_from_matrix,
+                     top_k_from_matrix)
+
+
+def random_level(rng: random.Random, n: int):
+    packed = [pack_answers({col: rng.randint(1, 4) for col in ANSWER_COLUMNS}) for _ in range(n)]
+    return score_matrix(*encode_level(packed))
+
+
+def reference_two_days(scores) -> tuple:
+    """The former day-1/day-2 algorithm of /createMatches."""
+    n = len(scores)
+    if n == 3:
+        return {0: 1, 1: 2, 2: 0}, {0: 2, 2: 1, 1: 0}
+    sorted_pairs = sorted_pairs_from_matrix(scores)
+    day1, day2, trio = {}, {}, set()
+
+    used = set()
+    for (i, j), _ in sorted_pairs:
+        if i not in used and j not in used:
+            day1[i], day1[j] = j, i
+            used.update((i, j))
+    unmatched = [idx for idx in range(n) if idx not in used]
+    if len(unmatched) == 1 and day1:
+        best, best_score = None, -1
+        for idx in range(n):
+            if idx in used and scores[unmatched[0], idx] > best_score:
+                best, best_score = idx, scores[unmatched[0], idx]
+        day1[unmatched[0]] = best
+        used.add(unmatched[0])
+        trio.update((unmatched[0], best, day1[best]))
+
+    used2 = set()
+    allowed = [((i, j), s) for (i, j), s in sorted_pairs if day1.get(i) != j and day1.get(j) != i]
+    if trio and n % 2 == 1:
+        allowed = ([p for p in allowed if p[0][0] in trio or p[0][1] in trio]
+                   + [p for p in allowed if p[0][0] not in trio and p[0][1] not in trio])
+    for (i, j), _ in allowed:
+        if i not in used2 and j not in used2:
+            day2[i], day2[j] = j, i
+            used2.update((i, j))
+    unmatched2 = [idx for idx in range(n) if idx not in used2]
+    if len(unmatched2) == 1 and day2:
+        u = unmatched2[0]
+        best, best_score, best_non_trio, best_non_trio_score = None, -1, None, -1
+        for idx in range(n):
+            if idx in used2:
+                if scores[u, idx] > best_score:
+                    best, best_score = idx, scores[u, idx]
+                if idx not in trio and scores[u, idx] > best_non_trio_score:
+                    best_non_trio, best_non_trio_score = idx, scores[u, idx]
+        day2[u] = best_non_trio if u in trio and best_non_trio is not None else best
+    elif len(unmatched2) == 2:
+        day2[unmatched2[0]], day2[unmatched2[1]] = unmatched2[1], unmatched2[0]
+    elif len(unmatched2) == 3:
+        options = sorted([(0, 1, scores[unmatched2[0], unmatched2[1]]), (0, 2, scores[unmatched2[0], unmatched2[2]]),
+                          (1, 2, scores[unmatched2[1], unmatched2[2]])], key=lambda x: x[2], reverse=True)
+        a, b, _ = options[0]
+        day2[unmatched2[a]], day2[unmatched2[b]] = unmatched2[b], unmatched2[a]
+        day2[unmatched2[3 - a - b]] = unmatched2[a]
+    return day1, day2
+
+
+def met_twice(rounds: list) -> int:
+    seen, repeats = set(), 0
+    for partners in rounds:
+        edges = {tuple(sorted(e)) for e in partners.items()}
+        repeats += len(edges & seen)
+        seen |= edges
+    return repeats
+
+
+def test_two_rounds_match_reference():
+    print("Testing 2 rounds against the former day-1/day-2 algorithm...")
+    rng = random.Random(8)
+    same, fixed = 0, 0
+    for _ in range(150):
+        scores = random_level(rng, rng.randint(1, 25))
+        expected = list(reference_two_days(scores))
+        result = match_rounds(DenseScores(scores), 2)
+        if met_twice(expected):
+            # The former code could give the same partner twice; the engine must not
+            assert met_twice(result) == 0 or len(scores) <= 3
+            assert all(set(partners) == set(range(len(scores))) for partners in result)
+            fixed += 1
+        else:
+            assert result == expected
+            same += 1
+    print(f"✓ {same} levels identical, {fixed} repeated partners avoided")
+
+
+def test_k_rounds_no_repeats():
+    print("Testing K rounds give everyone a new partner each round...")
+    rng = random.Random(9)
+    # Enough users that K rounds exist without repeats (a trio uses one more edge per round)
+    for n, rounds in ((4, 3), (7, 2), (10, 5), (11, 4), (24, 8), (25, 8)):
+        scores = random_level(rng, n)
+        result = match_rounds(DenseScores(scores), rounds)
+        assert len(result) == rounds
+        assert all(set(partners) == set(range(n)) for partners in result)
+        assert met_twice(result) == 0, n
+        assert all(partners[i] != i for partners in result for i in partners)
+    print("✓ no repeated partners")
+
+
+def test_blocked_graph_matches_dense():
+    print("Testing the blocked top-k graph against the full score matrix...")
+    rng = random.Random(10)
+    for n in (2, 5, 24, 61):
+        packed = [pack_answers({col: rng.randint(1, 4) for col in ANSWER_COLUMNS}) for _ in range(n)]
+        for compiled in (None, compile_scoring({"weights": {"q16": 2, "q9": 0.5}})):
+            scorer = LevelScorer(packed, compiled)
+            full = scorer.block(range(n))
+            dense = DenseScores(full)
+            # Tiny blocks so several of them are needed
+            sparse = SparseScores(scorer, *block_top_k(scorer, n - 1, block_cells=3 * n))
+            assert sparse.top_k(5) == top_k_from_matrix(full, 5)
+            assert match_rounds(sparse, 3) == match_rounds(dense, 3)
+            small = SparseScores(scorer, *block_top_k(scorer, 4, block_cells=3 * n))
+            assert small.top_k(4) == top_k_from_matrix(full, 4)
+    print("✓ identical candidates and rounds")
+
+
+def test_greedy_pass_chunks():
+    print("Testing the chunked greedy pass against a loop over every pair...")
+    rng = random.Random(11)
+    for n in (6, 301, 400):
+        rows, cols = (array.astype(np.int64) for array in np.triu_indices(n, k=1))
+        order = np.array(rng.sample(range(len(rows)), len(rows)))
+        rows, cols = rows[order], cols[order]
+        met = {i: set() for i in range(n)}
+        for _ in range(2 * n):
+            i, j = rng.sample(range(n), 2)
+            met[i].add(j)
+            met[j].add(i)
+        first = np.zeros(n, dtype=bool)
+        first[rng.sample(range(n), n // 10)] = True
+        for mask in (None, first):
+            expected = {}
+            ordered = list(zip(rows.tolist(), cols.tolist()))
+            if mask is not None:
+                ordered = ([(i, j) for i, j in ordered if mask[i] or mask[j]]
+                           + [(i, j) for i, j in ordered if not (mask[i] or mask[j])])
+            for i, j in ordered:
+                if i not in expected and j not in expected and j not in met[i]:
+                    expected[i], expected[j] = j, i
+            partners = {}
+            greedy_pass(rows, cols, n, partners, met, mask)
+            assert partners == expected, n
+    print("✓ same pairs")
+
+
+def test_small_levels():
+    print("Testing levels of 1, 2 and 3 users...")
+    assert match_rounds(DenseScores(random_level(random.Random(1), 1)), 2) == [{}, {}]
+    # Two users can only meet each other
+    assert match_rounds(DenseScores(random_level(random.Random(1), 2)), 2) == [{0: 1, 1: 0}] * 2
+    assert match_rounds(DenseScores(random_level(random.Random(1), 3)), 2) == [{0: 1, 1: 2, 2: 0}, {0: 2, 1: 0, 2: 1}]
+    print("✓ small levels")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Matching Engine Test")
+    print("=" * 60 + "\n")
+
+    test_two_rounds_match_reference()
+    test_k_rounds_no_repeats()
+    test_blocked_graph_matches_dense()
+    test_greedy_pass_chunks()
+    test_small_levels()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Tests for the text exposition of metrics (no DB connection needed)."""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from metrics import Registry
+
+
+def test_exposition():
+    print("Testing text exposition...")
+    registry = Registry()
+    requests_seconds = registry.histogram("req_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    logins = registry.counter("logins_total", "Logins.", ("outcome",))
+    in_flight = registry.gauge("in_flight", "In flight.")
+
+    requests_seconds.observe(0.05, route="/login")
+    requests_seconds.observe(0.5, route="/login")
+    requests_seconds.observe(5, route="/login")
+    logins.inc(outcome="ok")
+    logins.inc(2, outcome='we"ird')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    lines = registry.render().splitlines()
+    assert "# TYPE req_seconds histogram" in lines
+    assert 'req_seconds_bucket{route="/login",le="0.1"} 1' in lines
+    assert 'req_seconds_bucket{route="/login",le="1"} 2' in lines
+    assert 'req_seconds_bucket{route="/login",le="+Inf"} 3' in lines
+    assert 'req_seconds_sum{route="/login"} 5.55' in lines
+    assert 'req_seconds_count{route="/login"} 3' in lines
+    assert 'logins_total{outcome="ok"} 1' in lines
+    assert 'logins_total{outcome="we\\"ird"} 2' in lines
+    assert "in_flight 1" in lines
+    assert logins.value(outcome="ok") == 1
+    print("✓ exposition")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Metrics Test")
+    print("=" * 60 + "\n")
+
+    test_exposition()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
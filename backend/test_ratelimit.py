@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Tests for the /login sliding-window limiter (no DB connection needed)."""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from ratelimit import SlidingWindowLimiter
+
+
+def test_sliding_window():
+    print("Testing sliding window...")
+    limiter = SlidingWindowLimiter(limit=3, window=10)
+
+    for t in (0, 1, 2):
+        assert limiter.retry_after("1.2.3.4", now=t) == 0
+        limiter.record("1.2.3.4", now=t)
+
+    assert limiter.retry_after("1.2.3.4", now=5) == 5      # oldest failure expires at t=10
+    assert limiter.retry_after("5.6.7.8", now=5) == 0      # other clients unaffected
+    assert limiter.retry_after("1.2.3.4", now=10.5) == 0   # window slid past the first failure
+    print("✓ sliding window")
+
+
+def test_bounded_memory():
+    print("Testing LRU bound...")
+    limiter = SlidingWindowLimiter(limit=1, window=60, max_keys=100)
+
+    for i in range(1000):
+        limiter.record(f"10.0.{i // 256}.{i % 256}", now=0)
+
+    stats = limiter.stats()
+    assert stats["tracked_clients"] == 100
+    assert stats["evicted_clients"] == 900
+    # The most recent clients are still limited, the oldest were forgotten
+    assert limiter.retry_after("10.0.3.231", now=1) > 0
+    assert limiter.retry_after("10.0.0.0", now=1) == 0
+    print("✓ bounded memory")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Login Limiter Test")
+    print("=" * 60 + "\n")
+
+    test_sliding_window()
+    test_bounded_memory()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Tests for read-replica routing with fake connections (no DB connection needed)."""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from replicas import ReplicaPool
+
+
+class FakeReplica:
+    """Connection answering the lag query with ``lags[dsn]`` (an exception is raised)."""
+
+    def __init__(self, dsn: str, lags: dict):
+        self.dsn = dsn
+        self.lags = lags
+        self.closed = False
+
+    def execute(self, query, params=None):
+        lag = self.lags[self.dsn]
+        if isinstance(lag, Exception):
+            raise lag
+        self.row = (lag,)
+        return self
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(lags: dict, now: list) -> ReplicaPool:
+    return ReplicaPool(list(lags), lambda dsn: FakeReplica(dsn, lags), max_lag=5, check_interval=10,
+                       clock=lambda: now[0])
+
+
+def test_routing_and_lag():
+    print("Testing replicas are used in turn and skipped when lagging...")
+    lags = {"a": 0, "b": 1.5}
+    now = [0.0]
+    pool = make_pool(lags, now)
+    assert {pool.connection().dsn for _ in range(4)} == {"a", "b"}
+    lags["b"] = 30
+    # Still healthy until the next check
+    assert {pool.connection().dsn for _ in range(4)} == {"a", "b"}
+    now[0] = 10
+    assert {pool.connection().dsn for _ in range(4)} == {"a"}
+    assert pool.stats()[1] == {"name": "replica2", "healthy": False, "lag_seconds": 30.0, "error": "lag 30.0"}
+    lags["a"] = None  # lag unknown
+    now[0] = 20
+    assert pool.connection() is None and pool.dsn() is None
+    lags["a"] = lags["b"] = 0
+    now[0] = 30
+    assert pool.dsn() in ("a", "b")
+    print("✓ routing")
+
+
+def test_failures_fall_back():
+    print("Testing failing replicas are dropped and reconnected...")
+    lags = {"a": ConnectionError("down")}
+    now = [0.0]
+    pool = make_pool(lags, now)
+    assert pool.connection() is None
+    assert "down" in pool.stats()[0]["error"]
+    lags["a"] = 0
+    now[0] = 10
+    conn = pool.connection()
+    assert conn is not None
+    pool.mark_failed(conn, RuntimeError("query failed"))
+    assert conn.closed and pool.connection() is None
+    now[0] = 20
+    assert pool.connection() is not None and pool.connection() is not conn
+    assert not ReplicaPool([], None) and ReplicaPool([], None).connection() is None
+    print("✓ fallback")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Read Replica Routing Test")
+    print("=" * 60 + "\n")
+
+    test_routing_and_lag()
+    test_failures_fall_back()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
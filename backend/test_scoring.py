@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Equivalence tests for the scoring kernels (no DB connection needed)."""
+
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(__file__))
+
+from answers import ANSWER_COLUMNS, pack_answers, unpack_answers
+from scoring import (score, encode_packed, encode_answers, score_masks, encode_level,
+                     score_one_to_many, score_matrix, sorted_pairs_from_matrix,
+                     compile_scoring, weighted_score_matrix)
+
+
+def random_packed(rng: random.Random, missing_rate: float = 0.2) -> int:
+    answers = {col: (None if rng.random() < missing_rate else rng.randint(1, 4)) for col in ANSWER_COLUMNS}
+    return pack_answers(answers)
+
+
+def test_pairwise_equivalence():
+    print("Testing kernel against score() on random users...")
+    rng = random.Random(42)
+    users = [random_packed(rng) for _ in range(200)]
+    # Edge cases: nobody answered anything, everybody answered everything
+    users += [0, pack_answers({col: 1 for col in ANSWER_COLUMNS})]
+
+    for a in users:
+        for b in users[:50]:
+            expected = score(unpack_answers(a), unpack_answers(b))
+            assert score_masks(encode_packed(a), encode_packed(b)) == expected
+            assert score_masks(encode_answers(unpack_answers(a)), encode_packed(b)) == expected
+    print("✓ pairwise")
+
+
+def test_bulk_equivalence():
+    print("Testing bulk scoring against score()...")
+    rng = random.Random(7)
+    users = [random_packed(rng, missing_rate=0.5) for _ in range(60)]
+    onehot, missing = encode_level(users)
+    matrix = score_matrix(onehot, missing)
+
+    for i, a in enumerate(users):
+        row = score_one_to_many(onehot, missing, i)
+        for j, b in enumerate(users):
+            expected = score(unpack_answers(a), unpack_answers(b))
+            assert int(row[j]) == expected
+            assert int(matrix[i, j]) == expected
+    print("✓ bulk")
+
+
+def test_sorted_pairs_order():
+    print("Testing sorted pair order matches the dict-based sort...")
+    rng = random.Random(3)
+    users = [random_packed(rng) for _ in range(40)]
+    answers = [unpack_answers(p) for p in users]
+
+    scores = {}
+    for i in range(len(users)):
+        for j in range(i + 1, len(users)):
+            scores[(i, j)] = score(answers[i], answers[j])
+    expected = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+    assert sorted_pairs_from_matrix(score_matrix(*encode_level(users))) == expected
+    print("✓ order")
+
+
+def weighted_score(a: dict, b: dict, config: dict) -> float:
+    """Straightforward per-question version of the weighted kernel."""
+    total = 0.0
+    for column in ANSWER_COLUMNS:
+        weight = config.get("weights", {}).get(column, 1)
+        x, y = a[column], b[column]
+        if x is None and y is None:
+            total += weight * config.get("both_missing", 1)
+        elif x is not None and y is not None:
+            table = config.get("similarity", {}).get(column)
+            total += weight * (table[x - 1][y - 1] if table else x == y)
+    return total
+
+
+def test_weighted_default_equals_count():
+    print("Testing the default weighted config against the plain count...")
+    rng = random.Random(11)
+    users = [random_packed(rng, missing_rate=0.3) for _ in range(80)]
+    matrix = score_matrix(*encode_level(users))
+    weighted = weighted_score_matrix(users, compile_scoring({}))
+    assert (weighted == matrix).all()
+    assert sorted_pairs_from_matrix(weighted) == sorted_pairs_from_matrix(matrix)
+    print("✓ default config")
+
+
+def test_weighted_config():
+    print("Testing weights and similarity tables...")
+    config = {
+        "weights": {"q16": 2, "q9": 0.5, "q3": 0},
+        "similarity": {"q4": [[1, 0.5, 0, 0], [0.5, 1, 0, 0], [0, 0, 1, 0.25], [0, 0, 0.25, 1]]},
+        "both_missing": 0.5,
+    }
+    rng = random.Random(5)
+    users = [random_packed(rng) for _ in range(50)]
+    answers = [unpack_answers(p) for p in users]
+    matrix = weighted_score_matrix(users, compile_scoring(config))
+    for i in range(len(users)):
+        for j in range(len(users)):
+            assert abs(matrix[i, j] - weighted_score(answers[i], answers[j], config)) < 1e-4
+
+    for bad in ({"weights": {"q99": 1}}, {"similarity": {"q4": [[1, 0], [0, 1]]}}, {"weights": {"q3": -1}}, {"q3": 1},
+                {"similarity": {"q4": [[1, 0.5, 0, 0], [0, 1, 0, 0], [0, 0, 1, 0], [0, 0, 0, 1]]}}):
+        try:
+            compile_scoring(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted {bad}")
+    print("✓ weighted config")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Scoring Kernel Test")
+    print("=" * 60 + "\n")
+
+    test_pairwise_equivalence()
+    test_bulk_equivalence()
+    test_sorted_pairs_order()
+    test_weighted_default_equals_count()
+    test_weighted_config()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
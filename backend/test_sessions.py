@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Tests for the signed session tokens (no DB connection needed)."""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from sessions import InvalidToken, issue_token, verify_token
+
+SECRET = b"test-secret"
+
+
+def expect_invalid(token: str, secret: bytes = SECRET, now: float | None = None):
+    try:
+        verify_token(secret, token, now=now)
+    except InvalidToken:
+        return
+    raise AssertionError(f"token should have been rejected: {token!r}")
+
+
+def test_roundtrip():
+    print("Testing issue/verify roundtrip...")
+    token = issue_token(SECRET, "42", "Terminale", ttl=60, now=1000)
+    payload = verify_token(SECRET, token, now=1030)
+    assert payload == {"uid": "42", "lvl": "Terminale", "exp": 1060}
+    print(f"✓ {token}")
+
+
+def test_rejections():
+    print("Testing rejected tokens...")
+    token = issue_token(SECRET, "42", "Terminale", ttl=60, now=1000)
+    body, signature = token.split(".")
+
+    expect_invalid(token, now=1061)                        # expired
+    expect_invalid(token, secret=b"other-secret", now=1000)  # wrong secret
+    expect_invalid(issue_token(SECRET, "43", "Terminale", ttl=60, now=1000).split(".")[0] + "." + signature, now=1000)
+    expect_invalid(body, now=1000)                         # no signature
+    expect_invalid("", now=1000)
+    expect_invalid("é.é", now=1000)
+    print("✓ rejections")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Session Token Test")
+    print("=" * 60 + "\n")
+
+    test_roundtrip()
+    test_rejections()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)
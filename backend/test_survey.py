@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Tests for survey export reading and row parsing (no DB connection needed)."""
+
+import sys
+import os
+import io
+import random
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pandas as pd
+
+from survey import ANSWER_MAPPINGS, QUESTION_TO_COLUMN, detect_format, parse_survey_frame, read_survey_file
+
+
+def make_export(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Synthetic Forms export with a few malformed rows mixed in."""
+    rng = random.Random(seed)
+    questions = list(dict.fromkeys(q.replace("\xa0", "").strip() for q in QUESTION_TO_COLUMN))
+    data = []
+    for i in range(rows):
+        row = {
+            "ID": i + 1,
+            "Heure de début": "2026-02-01 10:00",
+            "Name": rng.choice(["Alice MARTIN", "jean dupont", "Marie Claire DE LA TOUR", "", None]),
+            "Email": f"user{i}@example.com" if i % 9 else None,
+            "Dans quelle unité es-tu ?": rng.choice(["Terminale", "Première", "Seconde"]),
+            "Dans quelle classe es-tu ?": str(rng.randint(1, 10)),
+            "Points - Quel est ton style de musique préféré ?": 0,
+        }
+        for question in questions:
+            row[question] = rng.choice(list(ANSWER_MAPPINGS[question]) + [None, "Réponse inconnue"])
+        data.append(row)
+    data[5]["ID"] = None  # skipped row
+    data[11]["ID"] = data[3]["ID"]  # duplicate ID
+    return pd.DataFrame(data, dtype=object)
+
+
+def test_parse_row():
+    print("Testing a parsed record...")
+    parsed = parse_survey_frame(make_export(20))
+    record = parsed["records"][0]
+    assert set(record) == {"id", "first_name", "last_name", "email", "currentClass", "answers", "source_hash"}
+    assert record["id"] == "1"
+    assert all(1 <= value <= 4 for value in record["answers"].values())
+    assert len(parsed["records"]) == 19 and parsed["errors"][0][0] == 5
+    print(f"✓ {record['currentClass']!r}, {len(record['answers'])} answers, "
+          f"{parsed['diagnostics'].unmapped_count} unmapped")
+
+
+def test_parallel_matches_serial():
+    print("Testing chunked parallel parsing against the serial path...")
+    df = make_export(300, seed=1)
+    serial = parse_survey_frame(df)
+    parallel = parse_survey_frame(df, workers=3, chunk_size=40)
+    assert parallel == serial
+    print(f"✓ {len(serial['records'])} records, {len(serial['errors'])} skipped, identical")
+
+
+def test_diagnostics():
+    print("Testing unmapped answers and skipped rows are aggregated...")
+    df = make_export(200, seed=3)
+    parsed = parse_survey_frame(df)
+    diagnostics = parsed["diagnostics"]
+    # Row 5 has no ID: skipped before its answers are parsed
+    unknown = sum(1 for col in df.columns for value in df[col].drop(index=5) if value == "Réponse inconnue")
+    assert diagnostics.unmapped_count == unknown
+    assert set(value for _, value in diagnostics.unmapped) == {"Réponse inconnue"}
+    assert all(len(ids) <= diagnostics.samples for _, ids in diagnostics.unmapped.values())
+    report = diagnostics.summary(limit=3)
+    assert len(report["unmapped"]) == 3 and sum(report["unmapped_by_column"].values()) == unknown
+    assert report["skipped"] == [{"error": "ValueError: missing ID", "count": 1, "sample_rows": [5]}]
+    # Chunked parsing merges to the same counts and samples
+    assert parse_survey_frame(df, workers=2, chunk_size=60)["diagnostics"] == diagnostics
+    print(f"✓ {unknown} unmapped answers in {len(diagnostics.unmapped)} entries")
+
+
+def export_bytes(df: pd.DataFrame, fmt: str) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "xlsx":
+        df.to_excel(buffer, index=False)
+    elif fmt == "csv":
+        df.to_csv(buffer, index=False, sep=";", encoding="utf-8-sig")
+    elif fmt == "ndjson":
+        df.to_json(buffer, orient="records", lines=True, force_ascii=False)
+    else:
+        df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_formats_match():
+    print("Testing XLSX, CSV, NDJSON and Parquet give the same records...")
+    df = make_export(60, seed=2)
+    expected = parse_survey_frame(read_survey_file(export_bytes(df, "xlsx"))[0])
+    for fmt in ["csv", "ndjson", "parquet"]:
+        data = export_bytes(df, fmt)
+        assert detect_format(data) == fmt
+        raw, detected = read_survey_file(data)
+        assert detected == fmt
+        assert parse_survey_frame(raw) == expected, fmt
+        print(f"✓ {fmt}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Survey Parsing Test")
+    print("=" * 60 + "\n")
+
+    test_parse_row()
+    test_parallel_matches_serial()
+    test_diagnostics()
+    test_formats_match()
+
+    print("\n" + "=" * 60)
+    print("✓ All tests passed!")
+    print("=" * 60)